@@ -0,0 +1,141 @@
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from utils.ttl_cache import TTLCache
+
+# Attribute on the Django HttpRequest holding the (auth_result, error) of the single JWT pass
+AUTH_CACHE_ATTR = '_jwt_auth'
+
+# Claims LoginSerializer adds to the access token and that must agree with a cached user
+TRUSTED_CLAIMS = ('business_id', 'user_role')
+# Columns re-read to confirm a cached user is still current (revocation, deactivation, claims)
+REVALIDATED_FIELDS = ('token_version', 'is_active') + TRUSTED_CLAIMS
+
+
+def _config():
+    config = {'TTL': 300, 'MAX_ENTRIES': 1024, 'REVALIDATE': 30}
+    config.update(getattr(settings, 'JWT_USER_CACHE', {}))
+    return config
+
+
+_users = TTLCache(ttl=_config()['TTL'], max_entries=_config()['MAX_ENTRIES'])
+
+
+class SharedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that decodes the token at most once per request and
+    serves users from a bounded in-process cache.
+
+    AttachBusinessIDMiddleware authenticates first and stores its outcome on the
+    Django request; when DRF runs its authentication classes later it reuses that
+    outcome instead of verifying the signature a second time.
+
+    Tokens carrying ``token_version`` (see LoginSerializer) are resolved from the
+    cache while the version, business_id and user_role claims agree with the
+    cached user. A token whose version is behind the user's current
+    token_version is rejected.
+
+    Within JWT_USER_CACHE['REVALIDATE'] seconds (default 30) of being loaded
+    or confirmed, a cached user costs no query. Saves only drop cache entries
+    in the process that made them, so after that window the user is confirmed
+    against the database with a primary key read of REVALIDATED_FIELDS: a
+    revocation or deactivation made in another worker takes effect there after
+    at most REVALIDATE seconds. The full user row is only loaded on a miss or
+    a mismatch, and each request gets its own copy of the cached instance.
+
+    Tokens without ``token_version`` (issued before versioning) bypass the
+    cache and load the user on every request.
+    """
+
+    @staticmethod
+    def _django_request(request):
+        return getattr(request, '_request', request)
+
+    def authenticate_once(self, request):
+        """Authenticate ``request`` and remember the result (or the error) on the Django request"""
+        django_request = self._django_request(request)
+        cached = getattr(django_request, AUTH_CACHE_ATTR, None)
+        if cached is None:
+            try:
+                cached = (super().authenticate(request), None)
+            except APIException as e:
+                cached = (None, e)
+            setattr(django_request, AUTH_CACHE_ATTR, cached)
+        return cached
+
+    def authenticate(self, request):
+        auth_result, error = self.authenticate_once(request)
+        if error is not None:
+            raise error
+        return auth_result
+
+    def get_user(self, validated_token):
+        version = validated_token.get('token_version')
+        if version is None:
+            # Token issued before versioning; fall back to the database lookup
+            return super().get_user(validated_token)
+
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        entry = _users.get(user_id)
+        if entry is None or not self._matches(entry[0], validated_token) or not self._current(user_id, entry):
+            user = super().get_user(validated_token)
+            entry = (user, time.monotonic())
+            _users.set(user_id, entry)
+        user = copy.copy(entry[0])
+
+        if user.token_version != version:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return user
+
+    @staticmethod
+    def _current(user_id, entry):
+        """Whether the cached user still agrees with the database (or was confirmed recently enough)"""
+        user, checked_at = entry
+        if time.monotonic() - checked_at < _config()['REVALIDATE']:
+            return True
+        row = (get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+               .values_list(*REVALIDATED_FIELDS).first())
+        if row != tuple(getattr(user, name) for name in REVALIDATED_FIELDS):
+            return False
+        _users.set(user_id, (user, time.monotonic()))
+        return True
+
+    @staticmethod
+    def _matches(user, validated_token):
+        if user.token_version != validated_token.get('token_version'):
+            return False
+        return all(
+            getattr(user, claim) == validated_token[claim]
+            for claim in TRUSTED_CLAIMS if claim in validated_token
+        )
+
+
+def token_business_id(user, token):
+    """business_id carried in the access token, falling back to the user row"""
+    if token is not None and token.get('business_id') is not None:
+        return token['business_id']
+    return getattr(user, 'business_id', None)
+
+
+def invalidate_user(user_id=None):
+    """Forget one cached user, or all of them when ``user_id`` is None"""
+    if user_id is None:
+        _users.clear()
+    else:
+        _users.pop(str(user_id))
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_user(getattr(instance, api_settings.USER_ID_FIELD))
@@ -0,0 +1,195 @@
+"""
+Per-request instrumentation for the /api/ views (see RequestMetricsMiddleware).
+
+Every instrumented request gets a RequestMetrics recording its SQL statements
+(via connection.execute_wrapper), the time spent producing serializer data
+and the response size. Finished requests are folded into a process-local
+registry, keyed by method and URL route, which the /metrics view renders in
+the Prometheus text format. Each worker process keeps its own registry.
+"""
+import contextvars
+import hmac
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def config():
+    options = {
+        'ENABLED': False,
+        'PATH_PREFIX': '/api/',
+        'SLOW_REQUEST_MS': 1000,
+        'MAX_QUERIES': 50,
+        'SLOW_SQL_COUNT': 5,
+        'HEADERS': False,
+        'TOKEN': None,
+    }
+    options.update(getattr(settings, 'REQUEST_METRICS', {}))
+    return options
+
+
+class RequestMetrics:
+    """What one request did: SQL statements with their durations, serializer time and response size"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = []
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.response_bytes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_time += elapsed
+            self.queries.append((elapsed, sql))
+
+    def slowest(self, count):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+
+current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def _timed_data(data_property):
+    """Wrap a serializer ``data`` property so the outermost access is timed into the current request"""
+    def data(self):
+        metrics = current.get()
+        if metrics is None:
+            return data_property.fget(self)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data_property.fget(self)
+        finally:
+            metrics.serializer_depth -= 1
+            if not metrics.serializer_depth:
+                metrics.serializer_time += time.perf_counter() - started
+    return property(data)
+
+
+_patched = False
+_patch_lock = threading.Lock()
+
+
+def instrument_serializers():
+    """Time Serializer.data / ListSerializer.data; done once, when the middleware is enabled"""
+    global _patched
+    from rest_framework import serializers
+
+    with _patch_lock:
+        if _patched:
+            return
+        for cls in (serializers.Serializer, serializers.ListSerializer):
+            cls.data = _timed_data(cls.__dict__['data'])
+        _patched = True
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class MetricsRegistry:
+    """Aggregates of finished requests, per (method, route, status)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.durations = defaultdict(lambda: _Histogram(DURATION_BUCKETS))
+            self.query_counts = defaultdict(lambda: _Histogram(QUERY_BUCKETS))
+            self.sql_seconds = defaultdict(float)
+            self.serializer_seconds = defaultdict(float)
+            self.response_bytes = defaultdict(int)
+            self.slow_requests = defaultdict(int)
+
+    def record(self, method, route, status, metrics, slow):
+        key = (method, route)
+        with self._lock:
+            self.requests[key + (str(status),)] += 1
+            self.durations[key].observe(metrics.duration)
+            self.query_counts[key].observe(len(metrics.queries))
+            self.sql_seconds[key] += metrics.sql_time
+            self.serializer_seconds[key] += metrics.serializer_time
+            self.response_bytes[key] += metrics.response_bytes
+            if slow:
+                self.slow_requests[key] += 1
+
+    def render(self):
+        """The registry in the Prometheus text exposition format"""
+        lines = []
+
+        def labels(key, **extra):
+            names = dict(zip(('method', 'route', 'status'), key), **extra)
+            return ",".join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                            for name, value in names.items())
+
+        def counter(name, help_text, values, kind='counter'):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{{{labels(key)}}} {value}")
+
+        def histogram(name, help_text, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram_ in sorted(values.items()):
+                for bound, count in zip(histogram_.buckets, histogram_.counts):
+                    lines.append(f"{name}_bucket{{{labels(key, le=bound)}}} {count}")
+                lines.append(f"{name}_bucket{{{labels(key, le='+Inf')}}} {histogram_.count}")
+                lines.append(f"{name}_sum{{{labels(key)}}} {histogram_.sum}")
+                lines.append(f"{name}_count{{{labels(key)}}} {histogram_.count}")
+
+        with self._lock:
+            counter('croptrack_requests_total', "API requests handled", self.requests)
+            histogram('croptrack_request_duration_seconds', "API request latency", self.durations)
+            histogram('croptrack_request_db_queries', "Database queries per API request", self.query_counts)
+            counter('croptrack_db_seconds_total', "Time spent in SQL", self.sql_seconds)
+            counter('croptrack_serializer_seconds_total', "Time spent producing serializer data",
+                    self.serializer_seconds)
+            counter('croptrack_response_bytes_total', "API response bytes", self.response_bytes)
+            counter('croptrack_slow_requests_total', "Requests over the REQUEST_METRICS thresholds",
+                    self.slow_requests)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; 404 unless REQUEST_METRICS is enabled"""
+    options = config()
+    if not options['ENABLED']:
+        raise Http404
+    token = options['TOKEN']
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponse("Unauthorized\n", status=401, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,28 +1,26 @@
 from django.utils.deprecation import MiddlewareMixin
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth.models import AnonymousUser
 
+from CropTrack.authentication import SharedJWTAuthentication, token_business_id
+from masterdata.company_cache import get_company_profile
+from masterdata.models import CompanyProfile
+
 
 class AttachBusinessIDMiddleware(MiddlewareMixin):
     def process_view(self, request, view_func, view_args, view_kwargs):
         # Check if this is an API request
         if request.path.startswith('/api/'):  # Adjust path as needed
-            jwt_authenticator = JWTAuthentication()
-            try:
-                # Try to authenticate with JWT
-                auth_result = jwt_authenticator.authenticate(request)
-                if auth_result is not None:
-                    user, token = auth_result
-                    request.user = user  # Set the authenticated user
-                    # print(f"✅ JWT User authenticated: {user}")
-                else:
-                    # print("❌ No JWT token found")
-                    request.business_id = None
-                    return
-            except (InvalidToken, TokenError) as e:
-                # print(f"❌ JWT authentication failed: {e}")
+            # Authenticate once; DRF's SharedJWTAuthentication reuses this result (or error)
+            auth_result, error = SharedJWTAuthentication().authenticate_once(request)
+            if auth_result is not None:
+                user, token = auth_result
+                request.user = user  # Set the authenticated user
+                request.business_id = token_business_id(user, token)
+                # print(f"✅ JWT User authenticated: {user}")
+            else:
+                # print(f"❌ No JWT token found or authentication failed: {error}")
                 request.business_id = None
+                request.business = None
                 return
 
         # Now check for business_id
@@ -32,8 +30,15 @@ class AttachBusinessIDMiddleware(MiddlewareMixin):
         # print(f"Is authenticated: {getattr(user, 'is_authenticated', False)}")
 
         if user and user.is_authenticated and hasattr(user, 'business_id'):
-            request.business_id = user.business_id
+            if getattr(request, 'business_id', None) is None:
+                request.business_id = user.business_id
             # print(f"✅ Business ID attached: {request.business_id}")
+            # Resolve the CompanyProfile once; views and serializers reuse request.business
+            try:
+                request.business = get_company_profile(request.business_id)
+            except CompanyProfile.DoesNotExist:
+                request.business = None
         else:
             request.business_id = None
+            request.business = None
             # print("❌ No business ID attached")
\ No newline at end of file
@@ -0,0 +1,73 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from CropTrack.metrics import RequestMetrics, config, current, instrument_serializers, registry
+
+logger = logging.getLogger('CropTrack.metrics')
+
+
+class RequestMetricsMiddleware:
+    """
+    Opt-in (REQUEST_METRICS['ENABLED']) instrumentation of the /api/ views.
+
+    Records query count, SQL time, serializer time and response size per
+    request into CropTrack.metrics.registry, and logs requests over the
+    SLOW_REQUEST_MS / MAX_QUERIES thresholds with their slowest statements.
+    """
+
+    def __init__(self, get_response):
+        options = config()
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = options['PATH_PREFIX']
+        self.slow_ms = options['SLOW_REQUEST_MS']
+        self.max_queries = options['MAX_QUERIES']
+        self.slow_sql_count = options['SLOW_SQL_COUNT']
+        self.headers = options['HEADERS']
+        instrument_serializers()
+
+    def __call__(self, request):
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        metrics.duration = time.perf_counter() - metrics.started
+
+        if not getattr(response, 'streaming', False):
+            metrics.response_bytes = len(response.content)
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+
+        slow = metrics.duration * 1000 > self.slow_ms or len(metrics.queries) > self.max_queries
+        registry.record(request.method, route, response.status_code, metrics, slow)
+        if slow:
+            self._log_slow(request, response, metrics)
+        if self.headers:
+            response['X-DB-Queries'] = str(len(metrics.queries))
+            response['X-DB-Time-ms'] = f"{metrics.sql_time * 1000:.1f}"
+        return response
+
+    def _log_slow(self, request, response, metrics):
+        statements = "\n".join(
+            f"  {elapsed * 1000:8.1f} ms  {sql[:500]}" for elapsed, sql in metrics.slowest(self.slow_sql_count)
+        )
+        logger.warning(
+            "Slow API request %s %s -> %s: %.1f ms, %d queries (%.1f ms SQL), serializer %.1f ms, %d bytes, "
+            "business %s\n%s",
+            request.method, request.get_full_path(), response.status_code, metrics.duration * 1000,
+            len(metrics.queries), metrics.sql_time * 1000, metrics.serializer_time * 1000,
+            metrics.response_bytes, getattr(request, 'business_id', None), statements,
+        )
@@ -81,6 +81,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # per-request query/latency metrics, only active when REQUEST_METRICS['ENABLED']
+    'CropTrack.middleware.metrics_middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -134,7 +136,7 @@ DATABASES = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT
+        'CropTrack.authentication.SharedJWTAuthentication',  # JWT, decoded once per request with the middleware
         'rest_framework.authentication.SessionAuthentication',        # Optional for browsable API
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -228,4 +230,69 @@ SIMPLE_JWT = {
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
-}
\ No newline at end of file
+}
+
+# Document numbering for booking/token/challan/transfer numbers and customer codes
+# (see masterdata/numbering.py). BACKEND is 'counter' or 'sequence' (PostgreSQL only);
+# BLOCK_SIZE > 1 lets each worker reserve numbers in blocks at the cost of gaps.
+DOCUMENT_NUMBERING = {
+    'BACKEND': 'counter',
+    'BLOCK_SIZE': 1,
+}
+
+# Process-local CompanyProfile cache (masterdata.company_cache); TTL in seconds
+COMPANY_PROFILE_CACHE = {
+    'TTL': 300,
+    'MAX_ENTRIES': 256,
+}
+
+# In-process cache of users authenticated by CropTrack.authentication.SharedJWTAuthentication;
+# TTL in seconds. A user's cache entry is dropped on save in this process only, so cached users
+# are confirmed with a primary key read of token_version/is_active/claims once older than
+# REVALIDATE seconds: a revocation or deactivation reaches other workers within that delay
+# (0: confirm on every request, at one query each).
+JWT_USER_CACHE = {
+    'TTL': 300,
+    'MAX_ENTRIES': 1024,
+    'REVALIDATE': 30,
+}
+
+# Process-local geo hierarchy cache (masterdata.geo); TTL in seconds
+GEO_TREE_CACHE = {
+    'TTL': 3600,
+    'MAX_ENTRIES': 64,
+}
+
+# Process-local mobile number directory per business (masterdata.mobile_directory); TTL in
+# seconds. Saves in this process are written through, other processes catch up after the TTL.
+MOBILE_DIRECTORY_CACHE = {
+    'TTL': 600,
+    'MAX_ENTRIES': 16,
+}
+
+# Keyset pagination for CustomListAPIView lists (utils/pagination.py); clients may
+# ask for up to MAX_PAGE_SIZE rows with ?page_size=
+KEYSET_PAGINATION = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+}
+
+# Warehouse pocket capacity (inventory.occupancy): sacks per pocket for pockets without a
+# pocket_capacity row; None leaves their capacity unknown, so they are never suggested
+WAREHOUSE_CAPACITY = {
+    'DEFAULT_POCKET_CAPACITY': None,
+}
+
+# Request instrumentation (CropTrack.metrics). When enabled, /api/ requests are measured and
+# /metrics serves the aggregates in Prometheus text format (per worker process). Requests over
+# SLOW_REQUEST_MS or MAX_QUERIES are logged to 'CropTrack.metrics' with their slowest SQL.
+# TOKEN, if set, is required as "Authorization: Bearer <TOKEN>" on /metrics.
+REQUEST_METRICS = {
+    'ENABLED': False,
+    'PATH_PREFIX': '/api/',
+    'SLOW_REQUEST_MS': 1000,
+    'MAX_QUERIES': 50,
+    'SLOW_SQL_COUNT': 5,
+    'HEADERS': False,
+    'TOKEN': None,
+}
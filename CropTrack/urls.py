@@ -19,6 +19,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from CropTrack.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
@@ -26,5 +28,6 @@ urlpatterns = [
     path('api/ops/', include('ops.urls')),
     path('api/inventory/', include('inventory.urls')),
     path('api/accounts/', include('accounts.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
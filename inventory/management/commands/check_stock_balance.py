@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.services import rebuild_stock_balance, stock_balance_drift
+
+
+class Command(BaseCommand):
+    help = "Compare stock_balance with the imtrn ledger and report rows that disagree"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help="only check this business_id")
+        parser.add_argument('--limit', type=int, default=50, help="number of mismatches to print")
+        parser.add_argument('--fix', action='store_true', help="rebuild stock_balance when drift is found")
+
+    def handle(self, *args, **options):
+        business_id = options.get('business')
+        drift = stock_balance_drift(business_id)
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("stock_balance matches imtrn"))
+            return
+
+        for key, expected, actual in drift[:options['limit']]:
+            business, token_no, xitem, xunit, xfloor, xpocket = key
+            self.stdout.write(
+                f"business={business} token={token_no} item={xitem} unit={xunit} floor={xfloor} "
+                f"pocket={xpocket}: imtrn={expected} stock_balance={actual}"
+            )
+
+        if options['fix']:
+            written = rebuild_stock_balance(business_id)
+            self.stdout.write(self.style.WARNING(f"{len(drift)} mismatches found; rebuilt {written} rows"))
+            return
+
+        raise CommandError(f"{len(drift)} stock_balance rows disagree with imtrn")
@@ -0,0 +1,52 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Imtrn
+from inventory.snapshots import close_period, closeable_periods
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot closing stock balances for every ended, not yet closed ledger period (imtrn xyear/xper), "
+        "oldest first"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help="only close this business_id")
+        parser.add_argument('--through', type=datetime.date.fromisoformat,
+                            help="close periods up to the one containing this date (YYYY-MM-DD)")
+        parser.add_argument('--period', help="(re)close only this period, as YEAR/PER (e.g. 2026/03)")
+
+    def handle(self, *args, **options):
+        if options['business'] is not None:
+            businesses = [options['business']]
+        else:
+            businesses = list(Imtrn.objects.order_by('business_id_id')
+                              .values_list('business_id_id', flat=True).distinct())
+
+        if options['period']:
+            try:
+                year, per = (int(part) for part in options['period'].split('/'))
+            except ValueError:
+                raise CommandError("--period must be YEAR/PER, e.g. 2026/03")
+            periods = {business_id: [(year, per)] for business_id in businesses}
+        else:
+            periods = {business_id: closeable_periods(business_id, options['through'])
+                       for business_id in businesses}
+
+        for business_id, business_periods in periods.items():
+            for year, per in business_periods:
+                started = time.perf_counter()
+                try:
+                    close = close_period(business_id, year, per)
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(
+                    f"business={business_id} period={year}/{per:02d}: {close.row_count} balances "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {sum(len(business_periods) for business_periods in periods.values())} periods"
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.services import rebuild_stock_balance
+
+
+class Command(BaseCommand):
+    help = "Recompute stock_balance from imtrn in one grouped, streaming pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help="only rebuild this business_id")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_stock_balance(options.get('business'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stock_balance: {written} rows in {time.perf_counter() - started:.2f}s"
+        ))
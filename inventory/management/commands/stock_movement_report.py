@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.reports import LEVELS, StockMovementReport
+from utils.streaming import CONTENT_TYPES, encode
+
+
+class Command(BaseCommand):
+    help = "Write the stock movement report (opening, receipts, transfers, deliveries, closing) as CSV or JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, required=True, help="business_id to report on")
+        parser.add_argument('--from', dest='date_from', type=datetime.date.fromisoformat, required=True,
+                            help="first day of the range (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='date_to', type=datetime.date.fromisoformat, required=True,
+                            help="last day of the range (YYYY-MM-DD)")
+        parser.add_argument('--output', choices=list(CONTENT_TYPES), default='csv')
+        parser.add_argument('--level', choices=LEVELS, default=LEVELS[0])
+        parser.add_argument('--token', help="only this token_no")
+        parser.add_argument('--chunk-size', type=int, default=500, help="tokens per aggregate query")
+        parser.add_argument('--file', help="write here instead of stdout")
+
+    def handle(self, *args, **options):
+        try:
+            report = StockMovementReport(options['business'], options['date_from'], options['date_to'],
+                                         token_no=options['token'], level=options['level'],
+                                         chunk_size=options['chunk_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output'] == 'xlsx' and not options['file']:
+            raise CommandError("--file is required for xlsx output")
+
+        lines = encode(options['output'], report.columns, report)
+        if options['file']:
+            with open(options['file'], 'wb') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line.decode('utf-8'), ending='')
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_receipt_tokens(apps, schema_editor):
+    """
+    Certificate receipts (ADRE) posted before inventory.services.CertificatePosting
+    left imtrn.token_no empty and carried the token in xdocnum only; copy it
+    over so stock_balance and everything else keyed on token_no sees them.
+    """
+    connection = schema_editor.connection
+    if 'imtrn' not in connection.introspection.table_names():
+        return
+    qn = connection.ops.quote_name
+    schema_editor.execute(
+        f"UPDATE {qn('imtrn')} SET token_no = xdocnum "
+        f"WHERE xdoctype = 'ADRE' AND (token_no = '' OR token_no IS NULL)"
+    )
+
+
+def fill_stock_balance(apps, schema_editor):
+    """
+    Sum the existing imtrn ledger into stock_balance, with the customer of each
+    token from its certificate. imtrn and certificate are unmanaged tables, so
+    either may be missing (e.g. a fresh test database); without imtrn there is
+    nothing to fill.
+    """
+    connection = schema_editor.connection
+    tables = connection.introspection.table_names()
+    if 'imtrn' not in tables:
+        return
+    qn = connection.ops.quote_name
+    if 'certificate' in tables:
+        customer = "c.customer_code, c.customer_name, c.xmobile"
+        join = (f"LEFT JOIN {qn('certificate')} c "
+                f"ON c.business_id_id = t.business_id_id AND c.token_no = t.token_no")
+    else:
+        customer, join = "NULL, NULL, NULL", ""
+    location = ("t.business_id_id, t.token_no, COALESCE(t.xitem, ''), COALESCE(t.xunit, ''), "
+                "COALESCE(t.xfloor, ''), COALESCE(t.xpocket, '')")
+    schema_editor.execute(
+        f"INSERT INTO {qn('stock_balance')} (business_id_id, token_no, xitem, xunit, xfloor, xpocket, "
+        f"customer_code, customer_name, xmobile, number_of_sacks, updated_at) "
+        f"SELECT {location}, {customer}, CAST(SUM(t.xqty * t.xsign) AS INTEGER), %s "
+        f"FROM {qn('imtrn')} t {join} "
+        f"GROUP BY {location}{', c.customer_code, c.customer_name, c.xmobile' if join else ''} "
+        f"HAVING CAST(SUM(t.xqty * t.xsign) AS INTEGER) <> 0",
+        params=[connection.ops.adapt_datetimefield_value(timezone.now())],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_alter_imtor_options_alter_imtor_table'),
+        ('masterdata', '0006_documentcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('pk', models.CompositePrimaryKey('business_id', 'token_no', 'xitem', 'xunit', 'xfloor', 'xpocket', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('token_no', models.CharField(max_length=10)),
+                ('xitem', models.CharField(blank=True, default='', max_length=100)),
+                ('xunit', models.CharField(blank=True, default='', max_length=100)),
+                ('xfloor', models.CharField(blank=True, default='', max_length=100)),
+                ('xpocket', models.CharField(blank=True, default='', max_length=100)),
+                ('customer_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('customer_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('xmobile', models.CharField(blank=True, max_length=20, null=True)),
+                ('number_of_sacks', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='masterdata.companyprofile')),
+            ],
+            options={
+                'verbose_name': 'Stock Balance',
+                'verbose_name_plural': 'Stock Balances',
+                'db_table': 'stock_balance',
+            },
+        ),
+        migrations.RunPython(fill_receipt_tokens, migrations.RunPython.noop),
+        migrations.RunPython(fill_stock_balance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+from django.db import migrations
+
+from utils.db_indexes import UnmanagedIndex, create_indexes, drop_indexes
+
+# Frozen copy of the inventory.models.UNMANAGED_INDEXES entries this migration adds
+INDEXES = [
+    UnmanagedIndex('imtrn_stock_location_idx', 'imtrn',
+                   ['business_id_id', 'token_no', 'xitem', 'xunit', 'xfloor', 'xpocket'],
+                   include=['xqty', 'xsign']),
+]
+
+
+def create_unmanaged_indexes(apps, schema_editor):
+    create_indexes(schema_editor, INDEXES)
+
+
+def drop_unmanaged_indexes(apps, schema_editor):
+    drop_indexes(schema_editor, INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stockbalance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_unmanaged_indexes, drop_unmanaged_indexes),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from utils.db_indexes import UnmanagedIndex, create_indexes, drop_indexes
+
+# Frozen copy of the inventory.models.UNMANAGED_INDEXES entry this migration adds
+INDEXES = [
+    UnmanagedIndex('imtrn_period_idx', 'imtrn', ['business_id_id', 'xyear', 'xper']),
+]
+
+
+def create_period_index(apps, schema_editor):
+    create_indexes(schema_editor, INDEXES)
+
+
+def drop_period_index(apps, schema_editor):
+    drop_indexes(schema_editor, INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_imtrn_indexes'),
+        ('masterdata', '0006_documentcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPeriodClose',
+            fields=[
+                ('pk', models.CompositePrimaryKey('business_id', 'xyear', 'xper', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('xyear', models.IntegerField()),
+                ('xper', models.IntegerField()),
+                ('period_start', models.DateField()),
+                ('row_count', models.IntegerField(default=0)),
+                ('closed_at', models.DateTimeField(auto_now=True)),
+                ('business_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='masterdata.companyprofile')),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Period Close',
+                'verbose_name_plural': 'Stock Period Closes',
+                'db_table': 'stock_period_close',
+                'indexes': [models.Index(fields=['business_id', 'period_start'], name='stock_period_close_start_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('pk', models.CompositePrimaryKey('business_id', 'xyear', 'xper', 'token_no', 'xitem', 'xunit', 'xfloor', 'xpocket', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('xyear', models.IntegerField()),
+                ('xper', models.IntegerField()),
+                ('token_no', models.CharField(max_length=10)),
+                ('xitem', models.CharField(blank=True, default='', max_length=100)),
+                ('xunit', models.CharField(blank=True, default='', max_length=100)),
+                ('xfloor', models.CharField(blank=True, default='', max_length=100)),
+                ('xpocket', models.CharField(blank=True, default='', max_length=100)),
+                ('number_of_sacks', models.IntegerField(default=0)),
+                ('business_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='masterdata.companyprofile')),
+            ],
+            options={
+                'verbose_name': 'Stock Snapshot',
+                'verbose_name_plural': 'Stock Snapshots',
+                'db_table': 'stock_snapshot',
+            },
+        ),
+        migrations.RunPython(create_period_index, drop_period_index),
+    ]
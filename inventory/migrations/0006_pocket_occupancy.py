@@ -0,0 +1,73 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_occupancy(apps, schema_editor):
+    """
+    Sum the existing imtrn ledger per pocket. Reads imtrn rather than
+    stock_balance so the result does not depend on how stock_balance was
+    filled; imtrn is unmanaged and may be missing, then there is nothing to fill.
+    """
+    connection = schema_editor.connection
+    if 'imtrn' not in connection.introspection.table_names():
+        return
+    qn = connection.ops.quote_name
+    pocket = "t.business_id_id, COALESCE(t.xunit, ''), COALESCE(t.xfloor, ''), COALESCE(t.xpocket, '')"
+    schema_editor.execute(
+        f"INSERT INTO {qn('pocket_occupancy')} (business_id_id, xunit, xfloor, xpocket, number_of_sacks, updated_at) "
+        f"SELECT {pocket}, CAST(SUM(t.xqty * t.xsign) AS INTEGER), %s "
+        f"FROM {qn('imtrn')} t "
+        f"GROUP BY {pocket} "
+        f"HAVING CAST(SUM(t.xqty * t.xsign) AS INTEGER) <> 0",
+        params=[connection.ops.adapt_datetimefield_value(timezone.now())],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_snapshots'),
+        ('masterdata', '0006_documentcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PocketCapacity',
+            fields=[
+                ('pk', models.CompositePrimaryKey('business_id', 'xunit', 'xfloor', 'xpocket', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('xunit', models.CharField(max_length=100)),
+                ('xfloor', models.CharField(max_length=100)),
+                ('xpocket', models.CharField(max_length=100)),
+                ('capacity', models.IntegerField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='masterdata.companyprofile')),
+            ],
+            options={
+                'verbose_name': 'Pocket Capacity',
+                'verbose_name_plural': 'Pocket Capacities',
+                'db_table': 'pocket_capacity',
+            },
+        ),
+        migrations.CreateModel(
+            name='PocketOccupancy',
+            fields=[
+                ('pk', models.CompositePrimaryKey('business_id', 'xunit', 'xfloor', 'xpocket', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('xunit', models.CharField(blank=True, default='', max_length=100)),
+                ('xfloor', models.CharField(blank=True, default='', max_length=100)),
+                ('xpocket', models.CharField(blank=True, default='', max_length=100)),
+                ('number_of_sacks', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='masterdata.companyprofile')),
+            ],
+            options={
+                'verbose_name': 'Pocket Occupancy',
+                'verbose_name_plural': 'Pocket Occupancies',
+                'db_table': 'pocket_occupancy',
+            },
+        ),
+        migrations.RunPython(fill_occupancy, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,21 @@
-from datetime import date
-from django.db import models, transaction
+from django.db import models
 
 from masterdata.models import AuditModel, CompanyProfile
+from masterdata.numbering import DocumentSeries
+from utils.db_indexes import UnmanagedIndex
+
+TRANSFER_SERIES = DocumentSeries('TRANSFER', 'TO-{yy}-', 6, model='inventory.Imtor', field='ximtor')
+
+# Indexes on the unmanaged tables below, created by migrations 0004_imtrn_indexes and 0005_stock_snapshots
+UNMANAGED_INDEXES = [
+    # Per-location ledger lookups and the grouped stock_balance rebuild; xqty/xsign
+    # are carried in the index on PostgreSQL so the rebuild can scan it alone
+    UnmanagedIndex('imtrn_stock_location_idx', 'imtrn',
+                   ['business_id_id', 'token_no', 'xitem', 'xunit', 'xfloor', 'xpocket'],
+                   include=['xqty', 'xsign']),
+    # Rows of the periods after a stock snapshot (inventory.snapshots)
+    UnmanagedIndex('imtrn_period_idx', 'imtrn', ['business_id_id', 'xyear', 'xper']),
+]
 
 
 # Create your models here.
@@ -56,32 +70,123 @@ class Stock(models.Model):
         db_table = 'stock'
 
 
+class StockBalance(models.Model):
+    """Running stock per token and location, maintained from imtrn postings (see inventory.services)"""
+    pk = models.CompositePrimaryKey('business_id', 'token_no', 'xitem', 'xunit', 'xfloor', 'xpocket')
+    business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
+    token_no = models.CharField(max_length=10)
+    xitem = models.CharField(max_length=100, blank=True, default='')
+    xunit = models.CharField(max_length=100, blank=True, default='')
+    xfloor = models.CharField(max_length=100, blank=True, default='')
+    xpocket = models.CharField(max_length=100, blank=True, default='')
+    customer_code = models.CharField(max_length=50, blank=True, null=True)
+    customer_name = models.CharField(max_length=255, blank=True, null=True)
+    xmobile = models.CharField(max_length=20, blank=True, null=True)
+    number_of_sacks = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'stock_balance'
+        verbose_name = 'Stock Balance'
+        verbose_name_plural = 'Stock Balances'
+
+    def __str__(self):
+        return f"{self.token_no} {self.xunit}/{self.xfloor}/{self.xpocket}: {self.number_of_sacks}"
+
+
+class StockPeriodClose(models.Model):
+    """A closed ledger period (imtrn xyear/xper) whose closing balances are stored in StockSnapshot"""
+    pk = models.CompositePrimaryKey('business_id', 'xyear', 'xper')
+    business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
+    xyear = models.IntegerField()
+    xper = models.IntegerField()
+    # First day of the calendar month the period covers; orders periods chronologically
+    period_start = models.DateField()
+    row_count = models.IntegerField(default=0)
+    closed_at = models.DateTimeField(auto_now=True)
+    closed_by = models.ForeignKey('user.CustomUser', on_delete=models.DO_NOTHING, blank=True, null=True)
+
+    class Meta:
+        db_table = 'stock_period_close'
+        verbose_name = 'Stock Period Close'
+        verbose_name_plural = 'Stock Period Closes'
+        indexes = [
+            models.Index(fields=['business_id', 'period_start'], name='stock_period_close_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.xyear}/{self.xper:02d}: {self.row_count} balances"
+
+
+class StockSnapshot(models.Model):
+    """Stock per token and location at the end of a closed period (see inventory.snapshots)"""
+    pk = models.CompositePrimaryKey('business_id', 'xyear', 'xper', 'token_no', 'xitem', 'xunit', 'xfloor',
+                                    'xpocket')
+    business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
+    xyear = models.IntegerField()
+    xper = models.IntegerField()
+    token_no = models.CharField(max_length=10)
+    xitem = models.CharField(max_length=100, blank=True, default='')
+    xunit = models.CharField(max_length=100, blank=True, default='')
+    xfloor = models.CharField(max_length=100, blank=True, default='')
+    xpocket = models.CharField(max_length=100, blank=True, default='')
+    number_of_sacks = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'stock_snapshot'
+        verbose_name = 'Stock Snapshot'
+        verbose_name_plural = 'Stock Snapshots'
+
+    def __str__(self):
+        return (f"{self.xyear}/{self.xper:02d} {self.token_no} {self.xunit}/{self.xfloor}/{self.xpocket}: "
+                f"{self.number_of_sacks}")
+
+
+class PocketCapacity(models.Model):
+    """Sack capacity of a storage pocket (unit/floor/pocket); see inventory.occupancy"""
+    pk = models.CompositePrimaryKey('business_id', 'xunit', 'xfloor', 'xpocket')
+    business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
+    xunit = models.CharField(max_length=100)
+    xfloor = models.CharField(max_length=100)
+    xpocket = models.CharField(max_length=100)
+    capacity = models.IntegerField()
+    # Inactive pockets stay on the heatmap but are never suggested
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'pocket_capacity'
+        verbose_name = 'Pocket Capacity'
+        verbose_name_plural = 'Pocket Capacities'
+
+    def __str__(self):
+        return f"{self.xunit}/{self.xfloor}/{self.xpocket}: {self.capacity}"
+
+
+class PocketOccupancy(models.Model):
+    """Sacks stored per pocket over all tokens, maintained from imtrn postings with stock_balance"""
+    pk = models.CompositePrimaryKey('business_id', 'xunit', 'xfloor', 'xpocket')
+    business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
+    xunit = models.CharField(max_length=100, blank=True, default='')
+    xfloor = models.CharField(max_length=100, blank=True, default='')
+    xpocket = models.CharField(max_length=100, blank=True, default='')
+    number_of_sacks = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'pocket_occupancy'
+        verbose_name = 'Pocket Occupancy'
+        verbose_name_plural = 'Pocket Occupancies'
+
+    def __str__(self):
+        return f"{self.xunit}/{self.xfloor}/{self.xpocket}: {self.number_of_sacks}"
+
+
 class Imtor(AuditModel):
     @staticmethod
     def generate_transfer_number():
-        """Generate unique transfer order number with format TO-YY-XXXXXX"""
-        with transaction.atomic():
-            year_str = date.today().strftime('%y')
-            prefix = f"TO-{year_str}-"
-
-            # Use select_for_update to prevent race conditions
-            last_entry = (Imtor.objects
-                          .filter(ximtor__startswith=prefix)
-                          .select_for_update()
-                          .order_by('-ximtor')
-                          .first())
-
-            if last_entry:
-                try:
-                    last_code = int(last_entry.ximtor.split('-')[-1])
-                    next_number = f"{last_code + 1:06d}"
-                except (ValueError, IndexError):
-                    # Fallback if parsing fails
-                    next_number = "000001"
-            else:
-                next_number = "000001"
-
-            return prefix + next_number
+        """Field default kept for migration history; save() allocates from TRANSFER_SERIES"""
+        return ''
 
     pk = models.CompositePrimaryKey('business_id_id', 'ximtor')
     business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
@@ -102,4 +207,9 @@ class Imtor(AuditModel):
     class Meta:
         db_table = 'imtor'
         verbose_name = 'Transfer Order'
-        verbose_name_plural = 'Transfer Orders'
\ No newline at end of file
+        verbose_name_plural = 'Transfer Orders'
+
+    def save(self, *args, **kwargs):
+        if not self.ximtor:
+            self.ximtor = TRANSFER_SERIES.next(self.business_id_id)
+        super().save(*args, **kwargs)
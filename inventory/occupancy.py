@@ -0,0 +1,157 @@
+"""
+Warehouse pocket occupancy and capacity.
+
+Every storage location is a pocket addressed by (xunit, xfloor, xpocket).
+``pocket_occupancy`` holds the sacks stored per pocket over all tokens; it is
+updated by StockLedgerService.apply in the same transaction as stock_balance,
+so reading it is one small indexed scan per business instead of a grouped
+query over stock_balance. ``pocket_capacity`` holds the configured sack
+capacity per pocket; pockets without a row use
+WAREHOUSE_CAPACITY['DEFAULT_POCKET_CAPACITY'] (None: capacity unknown).
+
+``warehouse_heatmap`` merges both into one unit → floor → pocket document,
+and ``suggest_pockets`` places N sacks with a best-fit allocator: the pocket
+with the least free room that still takes all remaining sacks, otherwise the
+pocket with the most free room, repeated until everything is placed.
+"""
+from bisect import bisect_left
+
+from django.conf import settings
+
+from inventory.models import PocketCapacity, PocketOccupancy
+
+POCKET = ('xunit', 'xfloor', 'xpocket')
+
+
+def _config():
+    config = {'DEFAULT_POCKET_CAPACITY': None}
+    config.update(getattr(settings, 'WAREHOUSE_CAPACITY', {}))
+    return config
+
+
+def _utilisation(sacks, capacity):
+    return round(sacks * 100 / capacity, 1) if capacity else None
+
+
+def pockets(business_id, xunit=None, xfloor=None):
+    """
+    {(xunit, xfloor, xpocket): (capacity, is_active, number_of_sacks)} for every
+    pocket with a capacity row or stock; capacity is None when unknown
+    """
+    capacities = PocketCapacity.objects.filter(business_id=business_id)
+    occupancy = PocketOccupancy.objects.filter(business_id=business_id)
+    if xunit is not None:
+        capacities, occupancy = capacities.filter(xunit=xunit), occupancy.filter(xunit=xunit)
+    if xfloor is not None:
+        capacities, occupancy = capacities.filter(xfloor=xfloor), occupancy.filter(xfloor=xfloor)
+
+    sacks = {row[:-1]: row[-1] for row in occupancy.values_list(*POCKET, 'number_of_sacks')}
+    result = {}
+    for unit, floor, pocket, capacity, is_active in capacities.values_list(*POCKET, 'capacity', 'is_active'):
+        result[(unit, floor, pocket)] = (capacity, is_active, sacks.pop((unit, floor, pocket), 0))
+    default = _config()['DEFAULT_POCKET_CAPACITY']
+    for key, qty in sacks.items():
+        if qty:
+            result[key] = (default, True, qty)
+    return result
+
+
+def pocket_room(business_id, xunit, xfloor, xpocket):
+    """Free sacks in one pocket: 0 when it is inactive, None when its capacity is unknown"""
+    row = (PocketCapacity.objects.filter(business_id=business_id, xunit=xunit, xfloor=xfloor, xpocket=xpocket)
+           .values_list('capacity', 'is_active').first())
+    if row is not None and not row[1]:
+        return 0
+    capacity = row[0] if row is not None else None
+    if capacity is None:
+        capacity = _config()['DEFAULT_POCKET_CAPACITY']
+        if capacity is None:
+            return None
+    sacks = (PocketOccupancy.objects.filter(business_id=business_id, xunit=xunit, xfloor=xfloor, xpocket=xpocket)
+             .values_list('number_of_sacks', flat=True).first()) or 0
+    return max(capacity - sacks, 0)
+
+
+def _totals(node, capacity, sacks):
+    node['number_of_sacks'] += sacks
+    if capacity is not None:
+        node['capacity'] += capacity
+        node['sacks_in_capacity'] += sacks
+        node['free'] += max(capacity - sacks, 0)
+
+
+def warehouse_heatmap(business_id):
+    """
+    Capacity, sacks, free room and utilisation (%) per unit, floor and pocket.
+    Totals of a unit or floor count the sacks of every pocket in
+    number_of_sacks; capacity, free room and utilisation only cover pockets
+    with a known capacity, whose sacks are sacks_in_capacity.
+    """
+    def node(**key):
+        return dict(key, capacity=0, number_of_sacks=0, sacks_in_capacity=0, free=0)
+
+    warehouse = node()
+    units = {}
+    for (unit, floor, pocket), (capacity, is_active, sacks) in sorted(pockets(business_id).items()):
+        unit_node = units.setdefault(unit, node(xunit=unit, floors={}))
+        floor_node = unit_node['floors'].setdefault(floor, node(xfloor=floor, pockets=[]))
+        floor_node['pockets'].append({
+            'xpocket': pocket,
+            'capacity': capacity,
+            'number_of_sacks': sacks,
+            'free': max(capacity - sacks, 0) if capacity is not None else None,
+            'utilisation': _utilisation(sacks, capacity),
+            'is_active': is_active,
+        })
+        for total in (warehouse, unit_node, floor_node):
+            _totals(total, capacity, sacks)
+
+    floors = [floor_node for unit_node in units.values() for floor_node in unit_node['floors'].values()]
+    for total in [warehouse, *units.values(), *floors]:
+        total['utilisation'] = _utilisation(total['sacks_in_capacity'], total['capacity'])
+    for unit_node in units.values():
+        unit_node['floors'] = list(unit_node['floors'].values())
+    warehouse['units'] = list(units.values())
+    return warehouse
+
+
+def best_fit(free_pockets, sacks):
+    """
+    Allocate ``sacks`` over ``free_pockets`` ({pocket: free room > 0}); returns
+    ([(pocket, sacks placed)], shortfall).
+
+    While some pocket can take all remaining sacks the tightest such pocket is
+    used, so large gaps stay free for large lots; otherwise the roomiest pocket
+    is filled and the rest placed the same way, which keeps the number of
+    pockets per lot low.
+    """
+    available = sorted((free, pocket) for pocket, free in free_pockets.items() if free > 0)
+    allocation = []
+    remaining = sacks
+    while remaining and available:
+        index = bisect_left(available, (remaining,))
+        if index < len(available):
+            allocation.append((available[index][1], remaining))
+            remaining = 0
+        else:
+            free, pocket = available.pop()
+            allocation.append((pocket, free))
+            remaining -= free
+    return allocation, remaining
+
+
+def suggest_pockets(business_id, sacks, xunit=None, xfloor=None):
+    """Best-fit placement of ``sacks`` over the active pockets with known capacity, optionally in one unit/floor"""
+    candidates = pockets(business_id, xunit=xunit, xfloor=xfloor)
+    free = {key: capacity - qty for key, (capacity, is_active, qty) in candidates.items()
+            if capacity is not None and is_active}
+    allocation, shortfall = best_fit(free, sacks)
+    return {
+        'sacks': sacks,
+        'allocated': sacks - shortfall,
+        'shortfall': shortfall,
+        'pockets': [
+            dict(zip(POCKET, key), sacks=placed, free=free[key], capacity=candidates[key][0])
+            for key, placed in allocation
+        ],
+    }
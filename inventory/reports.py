@@ -0,0 +1,157 @@
+"""
+Stock movement report over the imtrn ledger.
+
+For a date range the report gives, per token and location (or per token),
+the opening balance, receipts (ADRE), transfers in and out (TO), deliveries
+(CHL), any other movements as adjustments, and the closing balance.
+
+Tokens are processed in keyset chunks. Each chunk costs one read of the
+period snapshot the opening balance starts from (see inventory.snapshots),
+one grouped, conditional aggregate over its imtrn rows streamed from a
+server-side cursor, and one certificate lookup for the customer columns,
+so memory stays bounded by the chunk size whatever the ledger size.
+"""
+import datetime
+
+from django.db.models import Case, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from inventory.models import Imtrn, StockSnapshot
+from inventory.snapshots import LOCATION, latest_close, period_of, period_start, posted_after
+from ops.models import Certificate
+
+MOVEMENTS = ('receipts', 'transfers_in', 'transfers_out', 'deliveries', 'adjustments')
+COLUMNS = ('token_no', 'customer_code', 'customer_name', 'xmobile', 'xitem', 'xunit', 'xfloor', 'xpocket',
+           'opening') + MOVEMENTS + ('closing',)
+TOKEN_COLUMNS = ('token_no', 'customer_code', 'customer_name', 'xmobile', 'opening') + MOVEMENTS + ('closing',)
+LEVELS = ('location', 'token')
+
+RECEIPT, TRANSFER, DELIVERY = 'ADRE', 'TO', 'CHL'
+
+
+def _sum(condition):
+    return Cast(Sum(Case(When(condition, then=F('xqty') * F('xsign')), output_field=DecimalField())),
+                IntegerField())
+
+
+class StockMovementReport:
+    """
+    Opening, movements and closing stock of ``business_id`` from ``date_from``
+    to ``date_to`` (dates, both inclusive) at ``level`` 'location' or 'token'.
+    Iterating the report yields one dict per row, ordered by token and location,
+    skipping rows with no opening stock and no movement.
+    """
+
+    def __init__(self, business_id, date_from, date_to, token_no=None, level='location', chunk_size=500):
+        if date_from > date_to:
+            raise ValueError("date_from must not be after date_to")
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        self.business_id = business_id
+        self.date_from = date_from
+        self.date_to = date_to
+        self.token_no = token_no
+        self.level = level
+        self.chunk_size = chunk_size
+        self.start = timezone.make_aware(datetime.datetime.combine(date_from, datetime.time.min))
+        self.end = timezone.make_aware(datetime.datetime.combine(date_to + datetime.timedelta(days=1),
+                                                                 datetime.time.min))
+        # Snapshot the opening balance starts from: the last period closed before date_from's period
+        self.base = latest_close(business_id, before=period_start(*period_of(date_from)))
+
+    @property
+    def columns(self):
+        return COLUMNS if self.level == 'location' else TOKEN_COLUMNS
+
+    def __iter__(self):
+        last = None
+        while True:
+            tokens = self._tokens(last)
+            if not tokens:
+                return
+            yield from self._chunk(tokens[0], tokens[-1])
+            last = tokens[-1]
+
+    def _ledger(self):
+        rows = Imtrn.objects.filter(business_id=self.business_id)
+        if self.token_no is not None:
+            rows = rows.filter(token_no=self.token_no)
+        return rows
+
+    def _tokens(self, after):
+        """The next chunk of tokens with ledger rows (an index-only scan of imtrn_stock_location_idx)"""
+        rows = self._ledger()
+        if after is not None:
+            rows = rows.filter(token_no__gt=after)
+        return list(rows.order_by('token_no').values_list('token_no', flat=True).distinct()[:self.chunk_size])
+
+    def _openings(self, first, last):
+        """Snapshot balances of tokens first..last from the base period"""
+        if self.base is None:
+            return {}
+        rows = StockSnapshot.objects.filter(business_id=self.business_id, xyear=self.base.xyear,
+                                            xper=self.base.xper, token_no__gte=first, token_no__lte=last)
+        return {row[:-1]: row[-1] for row in rows.values_list(*LOCATION, 'number_of_sacks')}
+
+    def _movements(self, first, last):
+        """One grouped aggregate: opening delta since the snapshot and each movement within the range"""
+        condition = Q(xdate__lt=self.end, token_no__gte=first, token_no__lte=last)
+        if self.base is not None:
+            condition &= posted_after(self.base.xyear, self.base.xper)
+        in_range = Q(xdate__gte=self.start)
+        return (self._ledger().filter(condition)
+                .values('token_no', item=Coalesce('xitem', Value('')), unit=Coalesce('xunit', Value('')),
+                        floor=Coalesce('xfloor', Value('')), pocket=Coalesce('xpocket', Value('')))
+                .annotate(
+                    opening=_sum(Q(xdate__lt=self.start)),
+                    receipts=_sum(in_range & Q(xdoctype=RECEIPT)),
+                    transfers_in=_sum(in_range & Q(xdoctype=TRANSFER, xsign__gt=0)),
+                    transfers_out=_sum(in_range & Q(xdoctype=TRANSFER, xsign__lt=0)),
+                    deliveries=_sum(in_range & Q(xdoctype=DELIVERY)),
+                    adjustments=_sum(in_range & ~Q(xdoctype__in=[RECEIPT, TRANSFER, DELIVERY])),
+                )
+                .order_by()
+                .iterator(chunk_size=2000))
+
+    def _customers(self, first, last):
+        return {
+            row[0]: row[1:]
+            for row in Certificate.objects.filter(business_id=self.business_id, token_no__gte=first,
+                                                  token_no__lte=last)
+            .values_list('token_no', 'customer_code', 'customer_name', 'xmobile')
+        }
+
+    def _chunk(self, first, last):
+        rows = {}
+        for key, qty in self._openings(first, last).items():
+            rows[key] = dict.fromkeys(('opening',) + MOVEMENTS, 0)
+            rows[key]['opening'] = qty
+        for movement in self._movements(first, last):
+            key = (movement['token_no'], movement['item'], movement['unit'], movement['floor'], movement['pocket'])
+            row = rows.setdefault(key, dict.fromkeys(('opening',) + MOVEMENTS, 0))
+            row['opening'] += movement['opening'] or 0
+            for name in MOVEMENTS:
+                row[name] += movement[name] or 0
+
+        if self.level == 'token':
+            tokens = {}
+            for key, row in rows.items():
+                total = tokens.setdefault(key[:1], dict.fromkeys(('opening',) + MOVEMENTS, 0))
+                for name, qty in row.items():
+                    total[name] += qty
+            rows = tokens
+
+        customers = self._customers(first, last)
+        for key in sorted(rows):
+            row = rows[key]
+            if not any(row.values()):
+                continue
+            # Outgoing movements are stored with xsign -1; report them as positive quantities
+            row['transfers_out'] = -row['transfers_out']
+            row['deliveries'] = -row['deliveries']
+            row['closing'] = (row['opening'] + row['receipts'] + row['transfers_in'] - row['transfers_out']
+                              - row['deliveries'] + row['adjustments'])
+            customer_code, customer_name, xmobile = customers.get(key[0], (None, None, None))
+            yield dict(zip(LOCATION, key), customer_code=customer_code, customer_name=customer_name,
+                       xmobile=xmobile, **row)
@@ -1,16 +1,65 @@
 from rest_framework import serializers
 
-from inventory.models import Stock, Imtrn, Imtor
+from inventory.models import Imtrn, Imtor, PocketCapacity, StockBalance
 
 
 class CurrentStockSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Stock
-        fields = '__all__'
+        model = StockBalance
+        fields = ['token_no', 'customer_code', 'customer_name', 'xmobile', 'xitem', 'xunit', 'xfloor', 'xpocket',
+                  'number_of_sacks']
 
 
 class ImtorSerializer(serializers.ModelSerializer):
     class Meta:
         model= Imtor
         exclude = ['pk']
-        read_only_fields = ['business_id', 'booking_no', 'updated_by', 'created_at', 'updated_at','xtype']
\ No newline at end of file
+        read_only_fields = ['business_id', 'booking_no', 'updated_by', 'created_at', 'updated_at','xtype']
+
+class CertificateBatchPostSerializer(serializers.Serializer):
+    """Selects the certificates to post: an explicit token list or a create_date range"""
+    token_nos = serializers.ListField(child=serializers.CharField(max_length=10), required=False,
+                                      allow_empty=False, max_length=5000)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    chunk_size = serializers.IntegerField(required=False, default=200, min_value=1, max_value=1000)
+
+    def validate(self, data):
+        if not data.get('token_nos') and not (data.get('date_from') or data.get('date_to')):
+            raise serializers.ValidationError("Provide token_nos or a date_from/date_to range")
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({'date_to': "date_to must not be before date_from"})
+        return data
+
+
+class PocketCapacityListSerializer(serializers.ListSerializer):
+    """Rows are upserted in one statement, which cannot touch the same pocket twice"""
+
+    def validate(self, rows):
+        seen = set()
+        duplicates = []
+        for row in rows:
+            key = (row['xunit'], row['xfloor'], row['xpocket'])
+            if key in seen and key not in duplicates:
+                duplicates.append(key)
+            seen.add(key)
+        if duplicates:
+            raise serializers.ValidationError(
+                f"Pockets listed more than once: {', '.join('/'.join(key) for key in duplicates)}")
+        return rows
+
+
+class PocketCapacitySerializer(serializers.ModelSerializer):
+    capacity = serializers.IntegerField(min_value=0)
+
+    class Meta:
+        model = PocketCapacity
+        fields = ['xunit', 'xfloor', 'xpocket', 'capacity', 'is_active']
+        list_serializer_class = PocketCapacityListSerializer
+
+
+class PocketSuggestionSerializer(serializers.Serializer):
+    """Query parameters of the pocket suggestion endpoint"""
+    sacks = serializers.IntegerField(min_value=1)
+    xunit = serializers.CharField(max_length=100, required=False)
+    xfloor = serializers.CharField(max_length=100, required=False)
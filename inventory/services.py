@@ -0,0 +1,390 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from inventory.models import Imtrn, PocketOccupancy, StockBalance
+from ops.models import Certificate, CertificateDetails
+
+BALANCE_KEY = ('business_id_id', 'token_no', 'xitem', 'xunit', 'xfloor', 'xpocket')
+POCKET_KEY = ('business_id_id', 'xunit', 'xfloor', 'xpocket')
+CUSTOMER_FIELDS = ('customer_code', 'customer_name', 'xmobile')
+
+# Certificate statuses that may be posted to stock
+POSTABLE_STATUSES = ('Open', 'Ready', 'Loaded')
+
+logger = logging.getLogger(__name__)
+
+
+class StockLedgerService:
+    """Writes imtrn rows and keeps stock_balance and pocket_occupancy in step with them"""
+
+    @staticmethod
+    def balance_key(entry):
+        """(business, token, item, unit, floor, pocket) for an Imtrn row; missing parts become ''"""
+        return (
+            entry.business_id_id,
+            entry.token_no,
+            entry.xitem or '',
+            entry.xunit or '',
+            entry.xfloor or '',
+            entry.xpocket or '',
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def post(entries, batch_size=1000):
+        """Insert Imtrn rows and apply their quantities to stock_balance in the same transaction"""
+        entries = list(entries)
+        if not entries:
+            return []
+        created = Imtrn.objects.bulk_create(entries, batch_size=batch_size)
+        StockLedgerService.apply(created)
+        return created
+
+    @staticmethod
+    def apply(entries):
+        """Add the signed quantities of ``entries`` to the matching stock_balance and pocket_occupancy rows"""
+        deltas = defaultdict(int)
+        for entry in entries:
+            deltas[StockLedgerService.balance_key(entry)] += int((entry.xqty or 0) * (entry.xsign or 0))
+        deltas = {key: qty for key, qty in deltas.items() if qty}
+        if not deltas:
+            return
+
+        customers = StockLedgerService._customers(deltas.keys())
+        now = timezone.now()
+        rows = [
+            key + customers.get(key[:2], (None, None, None)) + (qty, now)
+            for key, qty in deltas.items()
+        ]
+        StockBalanceUpsert.execute(rows)
+
+        # Same deltas summed per pocket over all tokens and items
+        pockets = defaultdict(int)
+        for (business_id, _, _, unit, floor, pocket), qty in deltas.items():
+            pockets[(business_id, unit, floor, pocket)] += qty
+        PocketOccupancyUpsert.execute([key + (qty, now) for key, qty in pockets.items() if qty])
+
+    @staticmethod
+    def _customers(keys):
+        """Customer code, name and mobile per (business, token) from the certificate"""
+        by_business = defaultdict(set)
+        for business_id, token_no, *_ in keys:
+            by_business[business_id].add(token_no)
+
+        customers = {}
+        for business_id, tokens in by_business.items():
+            for row in Certificate.objects.filter(business_id=business_id, token_no__in=tokens).values_list(
+                    'token_no', *CUSTOMER_FIELDS):
+                customers[(business_id, row[0])] = row[1:]
+        return customers
+
+
+class AdditiveUpsert:
+    """INSERT ... ON CONFLICT DO UPDATE that adds to number_of_sacks instead of overwriting it"""
+
+    model = None
+    key = ()
+    columns = ()
+
+    @classmethod
+    def execute(cls, rows):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return cls._execute_orm(rows)
+
+        qn = connection.ops.quote_name
+        table = qn(cls.model._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} ({', '.join(qn(c) for c in cls.columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(cls.columns))}) "
+            f"ON CONFLICT ({', '.join(qn(c) for c in cls.key)}) DO UPDATE SET "
+            f"number_of_sacks = {table}.number_of_sacks + EXCLUDED.number_of_sacks, "
+            f"updated_at = EXCLUDED.updated_at"
+        )
+        params = [
+            row[:-1] + (connection.ops.adapt_datetimefield_value(row[-1]),)
+            for row in rows
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    @classmethod
+    def _execute_orm(cls, rows):
+        for row in rows:
+            values = dict(zip(cls.columns, row))
+            key = {name: values.pop(name) for name in cls.key}
+            qty = values.pop('number_of_sacks')
+            if not cls.model.objects.filter(**key).update(number_of_sacks=F('number_of_sacks') + qty):
+                cls.model.objects.create(number_of_sacks=qty, **key, **values)
+
+
+class StockBalanceUpsert(AdditiveUpsert):
+    model = StockBalance
+    key = BALANCE_KEY
+    columns = BALANCE_KEY + CUSTOMER_FIELDS + ('number_of_sacks', 'updated_at')
+
+
+class PocketOccupancyUpsert(AdditiveUpsert):
+    model = PocketOccupancy
+    key = POCKET_KEY
+    columns = POCKET_KEY + ('number_of_sacks', 'updated_at')
+
+
+class CertificatePosting:
+    """
+    Posts certificate details to imtrn as ADRE receipts.
+
+    Details are streamed from the database and inserted in batches through
+    StockLedgerService, so stock_balance moves in the same transaction. Posting
+    is idempotent per token: a detail whose location already has an ADRE row
+    for the token is skipped, so a retried or repeated post never doubles
+    stock. New rows are numbered after the token's highest existing xdocrow.
+    """
+
+    def __init__(self, business, user, posted_at=None):
+        self.business = business
+        self.user = user
+        self.posted_at = posted_at or timezone.now()
+        self.previously_posted = set()
+
+    def _posted(self, tokens):
+        """Already posted (item, unit, floor, pocket) keys and the last xdocrow, per token"""
+        posted = defaultdict(set)
+        last_row = defaultdict(int)
+        rows = Imtrn.objects.filter(
+            business_id=self.business, xdocnum__in=tokens, xdoctype="ADRE", xsign=1
+        ).values_list('xdocnum', 'xitem', 'xunit', 'xfloor', 'xpocket', 'xdocrow')
+        for token_no, xitem, xunit, xfloor, xpocket, xdocrow in rows:
+            posted[token_no].add((xitem, xunit, xfloor, xpocket))
+            last_row[token_no] = max(last_row[token_no], xdocrow)
+        return posted, last_row
+
+    def entries(self, certificates, chunk_size=2000):
+        """Yield unposted Imtrn receipt rows for ``certificates``, streaming their details"""
+        certificates = {certificate.token_no: certificate for certificate in certificates}
+        if not certificates:
+            return
+        posted, last_row = self._posted(list(certificates))
+        self.previously_posted = set(posted)
+        current_time = self.posted_at.time()
+
+        details = (CertificateDetails.objects
+                   .filter(business_id=self.business, token_no__in=list(certificates))
+                   .order_by('token_no', 'xunit', 'xfloor', 'xpocket', 'xitem')
+                   .iterator(chunk_size=chunk_size))
+        for detail in details:
+            if not detail.xitem or not detail.number_of_sacks or detail.number_of_sacks <= 0:
+                logger.warning(f"Certificate {detail.token_no} detail {detail.pk} is incomplete, skipping")
+                continue
+            if (detail.xitem, detail.xunit, detail.xfloor, detail.xpocket) in posted[detail.token_no]:
+                continue
+
+            certificate = certificates[detail.token_no]
+            entry_date = certificate.created_at.date() if certificate.created_at else self.posted_at.date()
+            last_row[detail.token_no] += 1
+            yield Imtrn(
+                business_id=self.business,
+                xunit=detail.xunit,
+                xfloor=detail.xfloor,
+                xpocket=detail.xpocket,
+                xitem=detail.xitem,
+                xwh=getattr(certificate, 'xwh', None),
+                xdate=self.posted_at,
+                xyear=self.posted_at.year,
+                xper=(self.posted_at.month + 6) % 12 or 12,
+                xqty=detail.number_of_sacks,
+                xval=detail.total_rent or 0,
+                xdocnum=detail.token_no,
+                token_no=detail.token_no,
+                xdoctype="ADRE",
+                xaction="Receipt",
+                xsign=1,
+                xdocrow=last_row[detail.token_no],
+                xtime=datetime.combine(entry_date, current_time),
+                created_by=self.user,
+                created_at=self.posted_at,
+                updated_at=self.posted_at,
+            )
+
+    @transaction.atomic
+    def post(self, certificates, batch_size=1000):
+        """
+        Post ``certificates`` (Certificate rows of this business) and mark them Posted.
+
+        The certificate rows are locked first so concurrent posts of the same
+        token serialize. Returns {token_no: [created Imtrn rows]}; a token
+        whose details were all posted before maps to an empty list. Tokens
+        with nothing to post at all are left unchanged.
+        """
+        tokens = [certificate.token_no for certificate in certificates]
+        if not tokens:
+            return {}
+        locked = list(Certificate.objects.select_for_update()
+                      .filter(business_id=self.business, token_no__in=tokens))
+
+        created = {certificate.token_no: [] for certificate in locked}
+        entries = self.entries(locked)
+        while True:
+            batch = list(islice(entries, batch_size))
+            if not batch:
+                break
+            for entry in StockLedgerService.post(batch, batch_size=batch_size):
+                created[entry.token_no].append(entry)
+
+        posted = [token_no for token_no, rows in created.items() if rows or token_no in self.previously_posted]
+        Certificate.objects.filter(business_id=self.business, token_no__in=posted).update(
+            xstatus="Posted", posted_at=self.posted_at, posted_by=self.user.id
+        )
+        return created
+
+    def post_batch(self, certificates, chunk_size=200):
+        """
+        Post many certificates, one transaction per chunk of ``chunk_size``.
+
+        Certificates that are already Posted or not in POSTABLE_STATUSES are
+        skipped. A chunk that fails is rolled back on its own and reported as
+        failed; the other chunks still post. Returns {token_no: result dict}.
+        """
+        results = {}
+        postable = []
+        for certificate in certificates:
+            if certificate.xstatus == "Posted":
+                results[certificate.token_no] = {'status': 'skipped', 'message': 'Already posted'}
+            elif certificate.xstatus not in POSTABLE_STATUSES:
+                results[certificate.token_no] = {
+                    'status': 'skipped', 'message': f'Status "{certificate.xstatus}" cannot be posted'
+                }
+            else:
+                postable.append(certificate)
+
+        for start in range(0, len(postable), chunk_size):
+            chunk = postable[start:start + chunk_size]
+            try:
+                created = self.post(chunk)
+            except Exception as e:
+                logger.error(f"Failed to post certificate chunk starting at {chunk[0].token_no}: {e}", exc_info=True)
+                for certificate in chunk:
+                    results[certificate.token_no] = {'status': 'failed', 'message': str(e)}
+                continue
+
+            for certificate in chunk:
+                entries = created.get(certificate.token_no, [])
+                if entries:
+                    results[certificate.token_no] = {'status': 'posted', 'created_count': len(entries)}
+                elif certificate.token_no in self.previously_posted:
+                    results[certificate.token_no] = {'status': 'posted', 'created_count': 0,
+                                                     'message': 'Details were already posted'}
+                else:
+                    results[certificate.token_no] = {'status': 'skipped',
+                                                     'message': 'No valid certificate details to post'}
+        return results
+
+
+def ledger_balances(business_id=None):
+    """
+    Stock per balance key computed straight from imtrn with one grouped query.
+
+    Yields dicts with the balance key, customer fields and number_of_sacks,
+    streamed from a server-side cursor where the backend supports it.
+    """
+    queryset = Imtrn.objects.all()
+    if business_id is not None:
+        queryset = queryset.filter(business_id=business_id)
+
+    certificate = Certificate.objects.filter(business_id=OuterRef('business_id'), token_no=OuterRef('token_no'))
+    return (queryset
+            .values('business_id_id', 'token_no',
+                    item=Coalesce('xitem', Value('')), unit=Coalesce('xunit', Value('')),
+                    floor=Coalesce('xfloor', Value('')), pocket=Coalesce('xpocket', Value('')))
+            .annotate(
+                qty=Cast(Sum(F('xqty') * F('xsign'), output_field=DecimalField()), IntegerField()),
+                customer_code=Subquery(certificate.values('customer_code')[:1]),
+                customer_name=Subquery(certificate.values('customer_name')[:1]),
+                xmobile=Subquery(certificate.values('xmobile')[:1]),
+            )
+            .order_by()
+            .iterator(chunk_size=5000))
+
+
+@transaction.atomic
+def rebuild_stock_balance(business_id=None, batch_size=5000):
+    """
+    Replace stock_balance with balances recomputed from imtrn, and pocket_occupancy
+    from those; returns the number of stock_balance rows written
+    """
+    existing = StockBalance.objects.all()
+    if business_id is not None:
+        existing = existing.filter(business_id=business_id)
+    existing.delete()
+
+    written = 0
+    batch = []
+    for row in ledger_balances(business_id):
+        if not row['qty']:
+            continue
+        batch.append(StockBalance(
+            business_id_id=row['business_id_id'], token_no=row['token_no'], xitem=row['item'],
+            xunit=row['unit'], xfloor=row['floor'], xpocket=row['pocket'],
+            customer_code=row['customer_code'], customer_name=row['customer_name'], xmobile=row['xmobile'],
+            number_of_sacks=row['qty'],
+        ))
+        if len(batch) >= batch_size:
+            StockBalance.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        StockBalance.objects.bulk_create(batch)
+        written += len(batch)
+    rebuild_pocket_occupancy(business_id)
+    return written
+
+
+@transaction.atomic
+def rebuild_pocket_occupancy(business_id=None):
+    """Replace pocket_occupancy with stock_balance summed per pocket; returns the number of rows written"""
+    existing = PocketOccupancy.objects.all()
+    balances = StockBalance.objects.all()
+    if business_id is not None:
+        existing = existing.filter(business_id=business_id)
+        balances = balances.filter(business_id=business_id)
+    existing.delete()
+
+    rows = (balances.values('business_id_id', 'xunit', 'xfloor', 'xpocket')
+            .annotate(sacks=Sum('number_of_sacks'))
+            .exclude(sacks=0)
+            .order_by())
+    return len(PocketOccupancy.objects.bulk_create(
+        [PocketOccupancy(number_of_sacks=row.pop('sacks'), **row) for row in rows.iterator(chunk_size=5000)],
+        batch_size=5000,
+    ))
+
+
+def stock_balance_drift(business_id=None):
+    """
+    Compare stock_balance with imtrn and return the keys that disagree.
+
+    Each item is (key, expected_from_imtrn, stored_in_stock_balance).
+    """
+    balances = StockBalance.objects.all()
+    if business_id is not None:
+        balances = balances.filter(business_id=business_id)
+    stored = {
+        row[:-1]: row[-1]
+        for row in balances.values_list(*BALANCE_KEY, 'number_of_sacks').iterator(chunk_size=5000)
+    }
+
+    drift = []
+    for row in ledger_balances(business_id):
+        key = (row['business_id_id'], row['token_no'], row['item'], row['unit'], row['floor'], row['pocket'])
+        expected = row['qty'] or 0
+        actual = stored.pop(key, 0)
+        if expected != actual:
+            drift.append((key, expected, actual))
+    drift.extend((key, 0, actual) for key, actual in stored.items() if actual)
+    return drift
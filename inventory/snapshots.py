@@ -0,0 +1,196 @@
+"""
+Period-close snapshots of the imtrn stock ledger.
+
+Imtrn rows carry the period they were posted in: ``xyear`` is the calendar
+year and ``xper`` the fiscal month, ``(month + 6) % 12 or 12`` (July is 1),
+so each (xyear, xper) pair is one calendar month. Closing a period stores
+the balance of every (token, item, unit, floor, pocket) at its end in
+``stock_snapshot``, built from the previous closed period's snapshot plus
+the rows posted in between, so closing periods in order reads each ledger
+row once. Stock "as of" a moment then reads the latest snapshot before it
+plus the rows of the later, still open period(s) up to that moment instead
+of summing the whole ledger history.
+
+Snapshots group rows by their xyear/xper columns, so every row is counted in
+exactly one period; only the cut-off inside the open period uses ``xdate``.
+Rows without xyear/xper are not covered by snapshots.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import DecimalField, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from inventory.models import Imtrn, StockPeriodClose, StockSnapshot
+
+LOCATION = ('token_no', 'xitem', 'xunit', 'xfloor', 'xpocket')
+
+# How long after its end a period may be closed. Ledger writers stamp xyear/xper
+# from UTC or server-local clocks, so rows for a period can still arrive for a
+# few hours after the local month boundary.
+CLOSE_GRACE = datetime.timedelta(days=1)
+
+
+def _per(month):
+    return (month + 6) % 12 or 12
+
+
+def period_of(moment):
+    """(xyear, xper) of a date or datetime, as the ledger writers compute it"""
+    return moment.year, _per(moment.month)
+
+
+def period_start(year, per):
+    """First day of the calendar month covered by period (year, per)"""
+    return datetime.date(year, (per + 5) % 12 + 1, 1)
+
+
+def period_end(year, per):
+    """Start of the next period as an aware datetime in the current timezone"""
+    start = period_start(year, per)
+    end = datetime.date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return timezone.make_aware(datetime.datetime.combine(end, datetime.time.min))
+
+
+def posted_through(year, per):
+    """Q for imtrn rows posted in period (year, per) or before it"""
+    month = period_start(year, per).month
+    return Q(xyear__lt=year) | Q(xyear=year, xper__in=[_per(m) for m in range(1, month + 1)])
+
+
+def posted_after(year, per):
+    """Q for imtrn rows posted after period (year, per)"""
+    month = period_start(year, per).month
+    return Q(xyear__gt=year) | Q(xyear=year, xper__in=[_per(m) for m in range(month + 1, 13)])
+
+
+def _movements(business_id, condition):
+    """Signed quantity per location of the imtrn rows of ``business_id`` matching ``condition``"""
+    rows = (Imtrn.objects.filter(condition, business_id=business_id)
+            .values('token_no', item=Coalesce('xitem', Value('')), unit=Coalesce('xunit', Value('')),
+                    floor=Coalesce('xfloor', Value('')), pocket=Coalesce('xpocket', Value('')))
+            .annotate(qty=Cast(Sum(F('xqty') * F('xsign'), output_field=DecimalField()), IntegerField()))
+            .order_by())
+    return {
+        (row['token_no'], row['item'], row['unit'], row['floor'], row['pocket']): row['qty'] or 0
+        for row in rows.iterator(chunk_size=5000)
+    }
+
+
+def latest_close(business_id, before=None):
+    """The last closed period of ``business_id``, or of those starting before the date ``before``"""
+    closes = StockPeriodClose.objects.filter(business_id=business_id)
+    if before is not None:
+        closes = closes.filter(period_start__lt=before)
+    return closes.order_by('-period_start').first()
+
+
+def _snapshot(close, token_no=None):
+    if close is None:
+        return {}
+    rows = StockSnapshot.objects.filter(business_id=close.business_id_id, xyear=close.xyear, xper=close.xper)
+    if token_no is not None:
+        rows = rows.filter(token_no=token_no)
+    return {row[:-1]: row[-1] for row in rows.values_list(*LOCATION, 'number_of_sacks').iterator(chunk_size=5000)}
+
+
+def _delete_snapshots(business_id, closes):
+    periods = Q()
+    for close in closes:
+        periods |= Q(xyear=close.xyear, xper=close.xper)
+    if periods:
+        StockSnapshot.objects.filter(periods, business_id=business_id).delete()
+
+
+@transaction.atomic
+def close_period(business_id, year, per, user=None, batch_size=5000):
+    """
+    Store the closing balances of period (year, per) and record it as closed.
+
+    Closing a period again recomputes it and drops the closes of later
+    periods, which were built on its old balances. Raises ValueError for a
+    period outside 1..12 or one that has not ended (plus CLOSE_GRACE). Returns
+    the StockPeriodClose.
+    """
+    if not 1 <= per <= 12:
+        raise ValueError(f"Period {year}/{per} does not exist (periods are 1..12)")
+    if timezone.now() < period_end(year, per) + CLOSE_GRACE:
+        raise ValueError(f"Period {year}/{per:02d} has not ended")
+    start = period_start(year, per)
+
+    previous = latest_close(business_id, before=start)
+    balances = defaultdict(int, _snapshot(previous))
+    condition = posted_through(year, per)
+    if previous is not None:
+        condition &= posted_after(previous.xyear, previous.xper)
+    for key, qty in _movements(business_id, condition).items():
+        balances[key] += qty
+
+    stale = list(StockPeriodClose.objects.filter(business_id=business_id, period_start__gte=start))
+    _delete_snapshots(business_id, stale)
+    StockPeriodClose.objects.filter(business_id=business_id, period_start__gte=start).delete()
+
+    rows = [
+        StockSnapshot(business_id_id=business_id, xyear=year, xper=per, token_no=token_no, xitem=xitem,
+                      xunit=xunit, xfloor=xfloor, xpocket=xpocket, number_of_sacks=qty)
+        for (token_no, xitem, xunit, xfloor, xpocket), qty in balances.items() if qty
+    ]
+    StockSnapshot.objects.bulk_create(rows, batch_size=batch_size)
+    return StockPeriodClose.objects.create(
+        business_id_id=business_id, xyear=year, xper=per, period_start=start, row_count=len(rows),
+        closed_by=user,
+    )
+
+
+def closeable_periods(business_id, through=None):
+    """
+    Periods of ``business_id`` that close_periods would close, oldest first.
+
+    They run from the first unclosed period with ledger rows up to the period
+    containing the date ``through`` (default: the last period that has ended).
+    """
+    last = timezone.localdate(timezone.now() - CLOSE_GRACE)
+    last = period_of(datetime.date(last.year, last.month, 1) - datetime.timedelta(days=1))
+    if through is not None:
+        last = min(last, period_of(through), key=lambda period: period_start(*period))
+
+    posted = Imtrn.objects.filter(business_id=business_id, xyear__isnull=False, xper__isnull=False)
+    starts = sorted(period_start(year, per) for year, per in posted.values_list('xyear', 'xper').distinct())
+    closed = set(StockPeriodClose.objects.filter(business_id=business_id).values_list('period_start', flat=True))
+    first = next((start for start in starts if start not in closed), None)
+
+    periods = []
+    month = first
+    while month is not None and month <= period_start(*last):
+        periods.append(period_of(month))
+        month = datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return periods
+
+
+def close_periods(business_id, through=None, user=None):
+    """Close closeable_periods() in order; returns the StockPeriodClose rows"""
+    return [close_period(business_id, year, per, user=user) for year, per in closeable_periods(business_id, through)]
+
+
+def balances_as_of(business_id, moment, token_no=None):
+    """
+    Stock per location of ``business_id`` at ``moment`` (an aware datetime).
+
+    Reads the snapshot of the latest period closed before ``moment``'s period
+    plus the imtrn rows of later periods dated before ``moment``. Returns
+    {(token_no, xitem, xunit, xfloor, xpocket): sacks} without zero balances.
+    """
+    year, per = period_of(timezone.localtime(moment))
+    base = latest_close(business_id, before=period_start(year, per))
+
+    balances = defaultdict(int, _snapshot(base, token_no))
+    condition = Q(xdate__lt=moment)
+    if base is not None:
+        condition &= posted_after(base.xyear, base.xper)
+    if token_no is not None:
+        condition &= Q(token_no=token_no)
+    for key, qty in _movements(business_id, condition).items():
+        balances[key] += qty
+    return {key: qty for key, qty in balances.items() if qty}
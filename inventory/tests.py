@@ -1,3 +1,362 @@
+import datetime
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from inventory.models import Imtrn, PocketCapacity, PocketOccupancy, StockBalance, StockPeriodClose, StockSnapshot
+from inventory.occupancy import pocket_room, warehouse_heatmap
+from inventory.services import CertificatePosting, StockLedgerService, stock_balance_drift
+from inventory.snapshots import balances_as_of, close_period, period_end, period_of, period_start
+from masterdata.models import CompanyProfile
+from ops.models import Certificate, CertificateDetails
+from user.models import CustomUser
+from user.serializers import LoginSerializer
+
+# certificate, imtrn, ... are unmanaged, so the test database does not get them from migrations
+UNMANAGED_MODELS = [model for model in apps.get_models()
+                    if not model._meta.managed and model._meta.db_table != 'stock']
+
+
+def setUpModule():
+    with connection.schema_editor() as editor:
+        for model in UNMANAGED_MODELS:
+            editor.create_model(model)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        for model in reversed(UNMANAGED_MODELS):
+            editor.delete_model(model)
+
+
+def ledger_row(business, xdocnum, xdocrow, qty, token_no=None, xdoctype='ADRE', xpocket='P01', **fields):
+    """An imtrn row in U1/1/``xpocket``; a negative ``qty`` is an issue"""
+    return Imtrn(business_id=business, xdocnum=xdocnum, token_no=xdocnum if token_no is None else token_no,
+                 xdocrow=xdocrow, xsign=1 if qty > 0 else -1, xqty=Decimal(abs(qty)), xdoctype=xdoctype,
+                 xitem='01-01-001-0001', xunit='U1', xfloor='1', xpocket=xpocket, **fields)
+
+
+def certificate(business, token_no, pockets, xstatus='Open'):
+    """A certificate with ``pockets`` ({xpocket: sacks} in U1/1) as its details"""
+    CertificateDetails.objects.bulk_create([
+        CertificateDetails(business_id=business, token_no=token_no, xitem='01-01-001-0001', xunit='U1', xfloor='1',
+                           xpocket=xpocket, number_of_sacks=sacks, rent_per_sack=Decimal('300.00'))
+        for xpocket, sacks in pockets.items()
+    ])
+    return Certificate.objects.create(
+        business_id=business, token_no=token_no, customer_code='CRT-000001', customer_name='Karim',
+        xmobile='01711111111', number_of_sacks=sum(pockets.values()), number_of_empty_sacks=0,
+        rent_per_sack=Decimal('300.00'), xstatus=xstatus,
+    )
+
+
+def stock(business, token_no):
+    """{xpocket: sacks} of ``token_no`` in stock_balance"""
+    return dict(StockBalance.objects.filter(business_id=business, token_no=token_no)
+                .values_list('xpocket', 'number_of_sacks'))
+
+
+class StockBalanceBackfillTests(TestCase):
+    """Migration 0003 fills stock_balance from the ledger, including receipts posted without token_no"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        Imtrn.objects.bulk_create([
+            # Posted by the old CertificatePost view: the token is only in xdocnum
+            ledger_row(cls.business, '25-00001', 1, 10, token_no=''),
+            ledger_row(cls.business, 'CH-25-000001', 1, -4, token_no='25-00001', xdoctype='CHL'),
+        ])
+
+    def test_legacy_receipt_is_booked_on_its_token(self):
+        migration = import_module('inventory.migrations.0003_stockbalance')
+        editor = connection.schema_editor()
+        migration.fill_receipt_tokens(apps, editor)
+        migration.fill_stock_balance(apps, editor)
+
+        self.assertEqual(list(StockBalance.objects.values_list('token_no', 'number_of_sacks')), [('25-00001', 6)])
+        self.assertEqual(stock_balance_drift(self.business.pk), [])
+
+
+class WarehouseHeatmapTests(TestCase):
+    """Totals measure utilisation against the pockets whose capacity is known"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        PocketCapacity.objects.create(business_id=cls.business, xunit='U1', xfloor='1', xpocket='P01', capacity=100)
+        PocketOccupancy.objects.bulk_create([
+            PocketOccupancy(business_id=cls.business, xunit='U1', xfloor='1', xpocket='P01', number_of_sacks=50),
+            PocketOccupancy(business_id=cls.business, xunit='U1', xfloor='1', xpocket='P02', number_of_sacks=9000),
+        ])
+
+    def test_sacks_of_unknown_capacity_pockets_do_not_count_towards_utilisation(self):
+        heatmap = warehouse_heatmap(self.business.pk)
+        floor = heatmap['units'][0]['floors'][0]
+        for total in (heatmap, heatmap['units'][0], floor):
+            self.assertEqual(total['number_of_sacks'], 9050)
+            self.assertEqual(total['sacks_in_capacity'], 50)
+            self.assertEqual((total['capacity'], total['free'], total['utilisation']), (100, 50, 50.0))
+        self.assertEqual([pocket['utilisation'] for pocket in floor['pockets']], [50.0, None])
+
+
+class PocketCapacityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=cls.business.pk, user_role='Staff')
+
+    def setUp(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def post_capacities(self, rows):
+        return self.client.post('/api/inventory/pockets/capacity/', rows, content_type='application/json')
+
+    def test_saves_capacities(self):
+        response = self.post_capacities([
+            {'xunit': 'U1', 'xfloor': '1', 'xpocket': 'P01', 'capacity': 100},
+            {'xunit': 'U1', 'xfloor': '1', 'xpocket': 'P02', 'capacity': 80, 'is_active': False},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(PocketCapacity.objects.filter(business_id=self.business).count(), 2)
+
+    def test_rejects_a_pocket_listed_twice(self):
+        response = self.post_capacities([
+            {'xunit': 'U1', 'xfloor': '1', 'xpocket': 'P01', 'capacity': 100},
+            {'xunit': 'U1', 'xfloor': '1', 'xpocket': 'P01', 'capacity': 120},
+        ])
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn('U1/1/P01', response.content.decode())
+        self.assertFalse(PocketCapacity.objects.filter(business_id=self.business).exists())
+
+    def test_inactive_pocket_has_no_room(self):
+        PocketCapacity.objects.create(business_id=self.business, xunit='U1', xfloor='1', xpocket='P01',
+                                      capacity=100, is_active=False)
+        self.assertEqual(pocket_room(self.business.pk, 'U1', '1', 'P01'), 0)
+
+
+class CertificatePostingTests(TestCase):
+    """Posting a certificate books each detail once, however often it is posted (inventory.services)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=cls.business.pk, user_role='Staff')
+        certificate(cls.business, '25-00001', {'P01': 30, 'P02': 20})
+
+    def post(self, certificates=None):
+        if certificates is None:
+            certificates = Certificate.objects.filter(business_id=self.business, token_no='25-00001')
+        return CertificatePosting(self.business, self.user).post(certificates)['25-00001']
+
+    def receipts(self):
+        return list(Imtrn.objects.filter(business_id=self.business, xdocnum='25-00001', xdoctype='ADRE')
+                    .order_by('xdocrow').values_list('xdocrow', 'xpocket', 'xqty'))
+
+    def test_post_books_receipts_and_stock(self):
+        self.assertEqual(len(self.post()), 2)
+
+        self.assertEqual(self.receipts(), [(1, 'P01', 30), (2, 'P02', 20)])
+        self.assertEqual(stock(self.business, '25-00001'), {'P01': 30, 'P02': 20})
+        self.assertEqual(Certificate.objects.get(business_id=self.business, token_no='25-00001').xstatus, 'Posted')
+        self.assertEqual(stock_balance_drift(self.business.pk), [])
+
+    def test_repeated_post_adds_nothing(self):
+        self.post()
+        self.assertEqual(self.post(), [])
+
+        self.assertEqual(len(self.receipts()), 2)
+        self.assertEqual(stock(self.business, '25-00001'), {'P01': 30, 'P02': 20})
+
+    def test_repeated_request_is_rejected(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+        self.assertEqual(self.client.post('/api/inventory/certificate-post/25-00001/').status_code, 201)
+        self.assertEqual(self.client.post('/api/inventory/certificate-post/25-00001/').status_code, 400)
+        self.assertEqual(stock(self.business, '25-00001'), {'P01': 30, 'P02': 20})
+
+    def test_request_that_read_the_certificate_before_it_was_posted_adds_nothing(self):
+        # Two requests load the Open certificate; the second only gets the row lock once the first committed
+        stale = list(Certificate.objects.filter(business_id=self.business, token_no='25-00001'))
+        self.post()
+        self.assertEqual(self.post(stale), [])
+
+        self.assertEqual(len(self.receipts()), 2)
+        self.assertEqual(stock(self.business, '25-00001'), {'P01': 30, 'P02': 20})
+
+    def test_repost_books_only_details_added_since(self):
+        self.post()
+        CertificateDetails.objects.create(business_id=self.business, token_no='25-00001', xitem='01-01-001-0001',
+                                          xunit='U1', xfloor='1', xpocket='P03', number_of_sacks=10)
+
+        self.assertEqual([(entry.xdocrow, entry.xpocket) for entry in self.post()], [(3, 'P03')])
+        self.assertEqual(stock(self.business, '25-00001'), {'P01': 30, 'P02': 20, 'P03': 10})
+        self.assertEqual(stock_balance_drift(self.business.pk), [])
+
+
+class CertificateBatchPostTests(TestCase):
+    """certificate-post/batch/ posts chunk by chunk and reports a result per certificate"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=cls.business.pk, user_role='Staff')
+        for number in range(1, 6):
+            certificate(cls.business, f"25-0000{number}", {'P01': 10 * number})
+        certificate(cls.business, '25-00006', {'P02': 5}, xstatus='Cancelled')
+        certificate(cls.business, '25-00007', {})
+
+    def setUp(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def post_batch(self, **body):
+        response = self.client.post('/api/inventory/certificate-post/batch/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def statuses(self, data):
+        return {token_no: result['status'] for token_no, result in data['results'].items()}
+
+    def test_failed_chunk_is_rolled_back_alone(self):
+        post = StockLedgerService.post
+
+        def fail_for_token_3(entries, **kwargs):
+            entries = list(entries)
+            if any(entry.token_no == '25-00003' for entry in entries):
+                raise RuntimeError("ledger unavailable")
+            return post(entries, **kwargs)
+
+        with mock.patch.object(StockLedgerService, 'post', side_effect=fail_for_token_3):
+            data = self.post_batch(token_nos=[f"25-0000{number}" for number in range(1, 6)], chunk_size=2)
+
+        # Chunks are (1, 2), (3, 4) and (5)
+        self.assertEqual(self.statuses(data), {'25-00001': 'posted', '25-00002': 'posted', '25-00003': 'failed',
+                                               '25-00004': 'failed', '25-00005': 'posted'})
+        self.assertEqual(data['results']['25-00003']['message'], "ledger unavailable")
+        self.assertEqual(data['summary'], {'posted': 3, 'failed': 2})
+        self.assertEqual(
+            dict(Certificate.objects.filter(business_id=self.business, token_no__lte='25-00005')
+                 .values_list('token_no', 'xstatus')),
+            {'25-00001': 'Posted', '25-00002': 'Posted', '25-00003': 'Open', '25-00004': 'Open', '25-00005': 'Posted'}
+        )
+        self.assertEqual(stock(self.business, '25-00004'), {})
+        self.assertEqual(stock(self.business, '25-00005'), {'P01': 50})
+        self.assertEqual(stock_balance_drift(self.business.pk), [])
+
+    def test_reports_certificates_that_cannot_be_posted(self):
+        CertificatePosting(self.business, self.user).post(
+            Certificate.objects.filter(business_id=self.business, token_no='25-00001'))
+
+        data = self.post_batch(token_nos=['25-00001', '25-00002', '25-00006', '25-00007', '25-09999'])
+
+        self.assertEqual(self.statuses(data), {'25-00001': 'skipped', '25-00002': 'posted', '25-00006': 'skipped',
+                                               '25-00007': 'skipped', '25-09999': 'not_found'})
+        self.assertEqual(data['results']['25-00001']['message'], 'Already posted')
+        self.assertEqual(data['results']['25-00006']['message'], 'Status "Cancelled" cannot be posted')
+        self.assertEqual(stock(self.business, '25-00006'), {})
+        self.assertEqual(Certificate.objects.get(business_id=self.business, token_no='25-00006').xstatus, 'Cancelled')
+
+    def test_date_range_selects_postable_certificates_only(self):
+        today = Certificate.objects.get(business_id=self.business, token_no='25-00001').create_date
+        data = self.post_batch(date_from=today.isoformat(), date_to=today.isoformat())
+
+        self.assertNotIn('25-00006', data['results'])
+        self.assertEqual(data['summary'], {'posted': 5, 'skipped': 1})
+
+
+def moment(year, month, day):
+    return timezone.make_aware(datetime.datetime(year, month, day, 12))
+
+
+class StockSnapshotTests(TestCase):
+    """Stock as of a date from period-close snapshots plus the open periods (inventory.snapshots)"""
+
+    # (xdocnum, sacks, posting date) for token 25-00001 in U1/1/P01
+    LEDGER = [
+        ('25-00001', 100, (2025, 6, 10)),
+        ('CH-25-000001', -30, (2025, 7, 15)),
+        ('CH-25-000002', -20, (2025, 8, 20)),
+        ('TO-25-000001', 5, (2025, 9, 5)),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        Imtrn.objects.bulk_create([cls.posted(xdocnum, qty, moment(*day)) for xdocnum, qty, day in cls.LEDGER])
+
+    @classmethod
+    def posted(cls, xdocnum, qty, xdate, xdocrow=1):
+        xyear, xper = period_of(xdate)
+        return ledger_row(cls.business, xdocnum, xdocrow, qty, token_no='25-00001', xdate=xdate, xyear=xyear,
+                          xper=xper)
+
+    def as_of(self, year, month, day):
+        return balances_as_of(self.business.pk, moment(year, month, day)).get(
+            ('25-00001', '01-01-001-0001', 'U1', '1', 'P01'), 0)
+
+    def ledger_sum(self, year, month, day):
+        return sum(qty for _, qty, posted in self.ledger() if posted < moment(year, month, day))
+
+    def ledger(self):
+        return [(xdocnum, int(xqty * xsign), xdate) for xdocnum, xqty, xsign, xdate in
+                Imtrn.objects.filter(business_id=self.business).values_list('xdocnum', 'xqty', 'xsign', 'xdate')]
+
+    def closed(self):
+        return list(StockPeriodClose.objects.filter(business_id=self.business)
+                    .order_by('period_start').values_list('xyear', 'xper'))
+
+    def test_fiscal_periods_are_calendar_months_from_july(self):
+        self.assertEqual(period_of(datetime.date(2025, 7, 1)), (2025, 1))
+        self.assertEqual(period_of(datetime.date(2025, 6, 30)), (2025, 12))
+        self.assertEqual(period_of(datetime.date(2026, 1, 1)), (2026, 7))
+        for month in range(1, 13):
+            start = datetime.date(2025, month, 1)
+            self.assertEqual(period_start(*period_of(start)), start)
+        self.assertEqual(period_end(2025, 6), timezone.make_aware(datetime.datetime(2026, 1, 1)))
+
+    def test_as_of_before_inside_and_after_closed_periods(self):
+        close_period(self.business.pk, 2025, 12)
+        close_period(self.business.pk, 2025, 1)
+
+        expected = {(2025, 6, 5): 0, (2025, 6, 30): 100, (2025, 7, 20): 70, (2025, 8, 1): 70,
+                    (2025, 8, 25): 50, (2025, 9, 10): 55}
+        for day, sacks in expected.items():
+            self.assertEqual(self.as_of(*day), sacks, day)
+            self.assertEqual(self.ledger_sum(*day), sacks, day)
+        self.assertEqual(StockSnapshot.objects.get(business_id=self.business, xyear=2025, xper=1).number_of_sacks,
+                         70)
+
+    def test_reclosing_a_period_drops_later_closes(self):
+        for per in (12, 1, 2):
+            close_period(self.business.pk, 2025, per)
+        self.assertEqual(self.closed(), [(2025, 12), (2025, 1), (2025, 2)])
+
+        # A June receipt arrives late
+        Imtrn.objects.bulk_create([self.posted('25-00001', 10, moment(2025, 6, 28), xdocrow=2)])
+        close_period(self.business.pk, 2025, 12)
+
+        self.assertEqual(self.closed(), [(2025, 12)])
+        self.assertEqual(list(StockSnapshot.objects.filter(business_id=self.business)
+                              .values_list('xper', 'number_of_sacks')), [(12, 110)])
+        self.assertEqual(self.as_of(2025, 8, 25), 60)
+        self.assertEqual(self.ledger_sum(2025, 8, 25), 60)
 
-# Create your tests here.
+    def test_rejects_periods_that_do_not_exist_or_have_not_ended(self):
+        for per in (0, 13):
+            with self.assertRaisesMessage(ValueError, "does not exist"):
+                close_period(self.business.pk, 2025, per)
+        year, per = period_of(timezone.localdate())
+        with self.assertRaisesMessage(ValueError, "has not ended"):
+            close_period(self.business.pk, year, per)
+        self.assertEqual(self.closed(), [])
@@ -2,8 +2,14 @@ from django.urls import path
 from inventory import views
 
 urlpatterns=[
+    path('certificate-post/batch/', views.CertificateBatchPost.as_view(), name='certificate-post-batch'),
     path('certificate-post/<str:token_no>/',views.CertificatePost.as_view(), name='certificate-post'),
     path('current-stock/', views.CurrentStock.as_view(), name='current-stock-status'),
+    path('stock-as-of/', views.StockAsOf.as_view(), name='stock-as-of'),
+    path('reports/stock-movement/', views.StockMovement.as_view(), name='stock-movement-report'),
+    path('pockets/capacity/', views.PocketCapacityView.as_view(), name='pocket-capacity'),
+    path('pockets/occupancy/', views.WarehouseOccupancy.as_view(), name='warehouse-occupancy'),
+    path('pockets/suggest/', views.SuggestPockets.as_view(), name='suggest-pockets'),
     path('transfer-order-entry/', views.TransferEntry.as_view(), name='transfer-order-entry'),
 
 ]
\ No newline at end of file
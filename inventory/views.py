@@ -1,5 +1,6 @@
 import logging
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, time, timedelta
 from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
@@ -7,13 +8,21 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from inventory.serializers import CurrentStockSerializer, ImtorSerializer
+from inventory.serializers import CurrentStockSerializer, ImtorSerializer, CertificateBatchPostSerializer, \
+    PocketCapacitySerializer, PocketSuggestionSerializer
 from utils.customlist import CustomListAPIView
 logger = logging.getLogger(__name__)
-from inventory.models import Imtrn, Stock, Imtor
+from inventory.models import Imtrn, Imtor, PocketCapacity, StockBalance
+from inventory.services import CertificatePosting, StockLedgerService, POSTABLE_STATUSES
+from inventory.occupancy import pocket_room, suggest_pockets, warehouse_heatmap
+from inventory.reports import LEVELS, StockMovementReport
+from inventory.snapshots import LOCATION, balances_as_of
 from masterdata.models import CompanyProfile
+from masterdata.company_cache import get_request_company
 from ops.models import Certificate, CertificateDetails
 from utils.response import APIResponse
+from utils.streaming import CONTENT_TYPES, streaming_response
+from utils.values_serializer import ValuesSerializer
 
 
 
@@ -26,7 +35,7 @@ class CertificatePost(APIView):
         try:
             # 1️⃣ Get and validate business
             try:
-                business = CompanyProfile.objects.get(pk=request.user.business_id)
+                business = get_request_company(request)
             except CompanyProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -50,8 +59,7 @@ class CertificatePost(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
             # 4️⃣ Validate certificate status (adjust valid statuses as needed)
-            valid_statuses = ['Open', 'Ready', 'Loaded']  # Define your valid statuses
-            if hasattr(certificate, 'xstatus') and certificate.xstatus not in valid_statuses:
+            if hasattr(certificate, 'xstatus') and certificate.xstatus not in POSTABLE_STATUSES:
                 return Response({
                     'success': False,
                     'message': f'Certificate status "{certificate.xstatus}" cannot be posted to stock'
@@ -69,73 +77,29 @@ class CertificatePost(APIView):
                     'message': 'No certificate details found for posting to stock'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # 6️⃣ Prepare common values
-            entry_date = certificate.created_at.date() if certificate.created_at else timezone.now().date()
-            current_time = timezone.now().time()
-            xtime = datetime.combine(entry_date, current_time)
-            current_datetime = timezone.now()
+            # 6️⃣ Post details to imtrn and stock_balance, marking the certificate Posted
+            posting = CertificatePosting(business, request.user)
+            created_entries = posting.post([certificate])[token_no]
+            current_datetime = posting.posted_at
 
-            # 7️⃣ Process transaction
-            with transaction.atomic():
-                imtrn_entries = []
-
-                # Prepare bulk create data
-                for idx, detail in enumerate(certificate_details, 1):
-                    # Validate detail data (add more validations as needed)
-                    if not detail.xitem:
-                        logger.warning(f"Certificate detail {detail.id} missing xitem, skipping")
-                        continue
-
-                    if not detail.number_of_sacks or detail.number_of_sacks <= 0:
-                        logger.warning(f"Certificate detail {detail.id} has invalid quantity, skipping")
-                        continue
-
-                    # Create Imtrn entry data
-                    imtrn_entry = Imtrn(
-                        business_id=business,
-                        xunit=detail.xunit,
-                        xfloor=detail.xfloor,
-                        xpocket=detail.xpocket,
-                        xitem=detail.xitem,
-                        xwh=getattr(certificate, 'xwh', None),  # Safe attribute access
-                        xdate=current_datetime,
-                        xyear=current_datetime.year,
-                        xper=(current_datetime.month + 6) % 12 or 12,
-                        xqty=detail.number_of_sacks,  # or convert to weight if needed
-                        xval=detail.total_rent or 0,  # map to valuation if needed
-                        xdocnum=token_no,
-                        xdoctype="ADRE",
-                        xaction="Receipt",
-                        xsign=1,
-                        xdocrow=idx,
-                        xtime=xtime,
-                        created_by=request.user,
-                        created_at=current_datetime,  # Add if your model has this field
-                        updated_at=current_datetime,  # Add if your model has this field
-                    )
-                    imtrn_entries.append(imtrn_entry)
-
-                # Check if we have valid entries to create
-                if not imtrn_entries:
-                    return Response({
-                        'success': False,
-                        'message': 'No valid certificate details found for posting to stock'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-
-                # Bulk create stock transactions
-                created_entries = Imtrn.objects.bulk_create(imtrn_entries)
-
-                # Update certificate status
-                certificate.xstatus = "Posted"
-                certificate.posted_at = current_datetime  # Add if your model has this field
-                certificate.posted_by = request.user.id  # Add if your model has this field
-                certificate.save()
-
-                # Log successful operation
-                logger.info(
-                    f"Certificate {token_no} successfully posted to stock. "
-                    f"Created {len(created_entries)} entries. User: {request.user.id}"
-                )
+            # Check if we had valid entries to create
+            if not created_entries and token_no in posting.previously_posted:
+                return Response({
+                    'success': False,
+                    'message': f'All details of certificate {token_no} are already posted to stock'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            if not created_entries:
+                return Response({
+                    'success': False,
+                    'message': 'No valid certificate details found for posting to stock'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # 7️⃣ Log successful operation
+            logger.info(
+                f"Certificate {token_no} successfully posted to stock. "
+                f"Created {len(created_entries)} entries. User: {request.user.id}"
+            )
 
             # 8️⃣ Success response
             return Response({
@@ -179,24 +143,197 @@ class CertificatePost(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class CertificateBatchPost(APIView):
+    """
+    Post many certificates to imtrn in one call.
+
+    Body: {"token_nos": [...]} or {"date_from": ..., "date_to": ...} (certificate
+    create_date), plus an optional "chunk_size". Each chunk is posted in its own
+    transaction; the response carries a result per token.
+    """
+
+    def post(self, request):
+        serializer = CertificateBatchPostSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse.validation_error(errors=serializer.errors)
+        params = serializer.validated_data
+
+        # 1️⃣ Get and validate business
+        try:
+            business = get_request_company(request)
+        except CompanyProfile.DoesNotExist:
+            return APIResponse.error(message="User business profile not found")
+
+        # 2️⃣ Load the selected certificates in one query
+        certificates = Certificate.objects.filter(business_id=business)
+        token_nos = params.get('token_nos')
+        if token_nos:
+            certificates = certificates.filter(token_no__in=token_nos)
+        else:
+            certificates = certificates.filter(xstatus__in=POSTABLE_STATUSES)
+        if params.get('date_from'):
+            certificates = certificates.filter(create_date__gte=params['date_from'])
+        if params.get('date_to'):
+            certificates = certificates.filter(create_date__lte=params['date_to'])
+        certificates = list(certificates.order_by('token_no'))
+
+        # 3️⃣ Post chunk by chunk
+        posting = CertificatePosting(business, request.user)
+        results = posting.post_batch(certificates, chunk_size=params['chunk_size'])
+        for token_no in token_nos or []:
+            results.setdefault(token_no, {'status': 'not_found', 'message': 'Certificate not found'})
+
+        # 4️⃣ Summarize
+        summary = defaultdict(int)
+        for result in results.values():
+            summary[result['status']] += 1
+        logger.info(f"Batch posted certificates for business {business.pk}: {dict(summary)}. User: {request.user.id}")
+
+        return APIResponse.success(
+            data={
+                'summary': dict(summary),
+                'posted_at': posting.posted_at.isoformat(),
+                'results': results,
+            },
+            message=f"Posted {summary['posted']} of {len(results)} certificates"
+        )
+
+
 class CurrentStock(APIView):
     def get(self, request, *args, **kwargs):
         token_no = self.request.query_params.get('token_no')
         xmobile = self.request.query_params.get('xmobile')
         xpocket = self.request.query_params.get('xpocket')
-        snippets = Stock.objects.filter(Q(token_no=token_no) | Q(xmobile=xmobile) | Q(xpocket=xpocket))
-        serializer = CurrentStockSerializer(snippets, many=True)
+        snippets = StockBalance.objects.filter(business_id=request.user.business_id).filter(
+            Q(token_no=token_no) | Q(xmobile=xmobile) | Q(xpocket=xpocket))
 
-        return APIResponse.success(
-            data=serializer.data,
+        return APIResponse.fast_success(
+            data=ValuesSerializer.for_serializer(CurrentStockSerializer).serialize(snippets),
             message="Stock Status retrieved successfully"
         )
 
+
+class StockAsOf(APIView):
+    """
+    Stock per token and location at the end of ``?date=YYYY-MM-DD`` (optionally ``&token_no=``),
+    read from the latest period snapshot plus the ledger rows after it (see inventory.snapshots)
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            as_of = datetime.strptime(request.query_params.get('date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return APIResponse.error(
+                message="date is required as YYYY-MM-DD",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        moment = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+        balances = balances_as_of(request.user.business_id, moment, request.query_params.get('token_no') or None)
+        data = [dict(zip(LOCATION, key), number_of_sacks=qty) for key, qty in sorted(balances.items())]
+        return APIResponse.fast_success(
+            data=data,
+            message="Stock Status retrieved successfully",
+            meta={'as_of': as_of.isoformat(), 'count': len(data)}
+        )
+
+
+class StockMovement(APIView):
+    """
+    Stock movement report streamed as CSV or JSON lines:
+    ``?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD[&output=csv|jsonl][&level=location|token][&token_no=]``
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            date_from = datetime.strptime(params.get('date_from', ''), '%Y-%m-%d').date()
+            date_to = datetime.strptime(params.get('date_to', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return APIResponse.error(
+                message="date_from and date_to are required as YYYY-MM-DD",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        output = params.get('output', 'csv')
+        if output not in CONTENT_TYPES:
+            return APIResponse.error(
+                message=f"output must be one of {', '.join(CONTENT_TYPES)}",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            report = StockMovementReport(request.user.business_id, date_from, date_to,
+                                         token_no=params.get('token_no') or None,
+                                         level=params.get('level', LEVELS[0]))
+        except ValueError as e:
+            return APIResponse.error(message=str(e), status_code=status.HTTP_400_BAD_REQUEST)
+
+        return streaming_response(output, report.columns, report,
+                                  f"stock-movement-{date_from.isoformat()}-{date_to.isoformat()}")
+
+
+class PocketCapacityView(APIView):
+    """
+    GET: configured pocket capacities.
+    POST: a list of {xunit, xfloor, xpocket, capacity, is_active} rows, inserted or updated by location
+    """
+
+    def get(self, request, format=None):
+        capacities = PocketCapacity.objects.filter(business_id=request.user.business_id).order_by(
+            'xunit', 'xfloor', 'xpocket')
+        return APIResponse.fast_success(
+            data=ValuesSerializer.for_serializer(PocketCapacitySerializer).serialize(capacities),
+            message="Pocket capacities retrieved successfully"
+        )
+
+    def post(self, request, format=None):
+        serializer = PocketCapacitySerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return APIResponse.validation_error(errors=serializer.errors, message="Invalid pocket capacities")
+
+        PocketCapacity.objects.bulk_create(
+            [PocketCapacity(business_id_id=request.user.business_id, **row) for row in serializer.validated_data],
+            update_conflicts=True,
+            unique_fields=['business_id', 'xunit', 'xfloor', 'xpocket'],
+            update_fields=['capacity', 'is_active', 'updated_at'],
+        )
+        return APIResponse.success(
+            data={'count': len(serializer.validated_data)},
+            message="Pocket capacities saved successfully"
+        )
+
+
+class WarehouseOccupancy(APIView):
+    """Capacity, sacks, free room and utilisation of every unit, floor and pocket in one document"""
+
+    def get(self, request, format=None):
+        return APIResponse.fast_success(
+            data=warehouse_heatmap(request.user.business_id),
+            message="Warehouse occupancy retrieved successfully"
+        )
+
+
+class SuggestPockets(APIView):
+    """Best-fit pockets for ``?sacks=N`` (optionally ``&xunit=&xfloor=``), see inventory.occupancy"""
+
+    def get(self, request, format=None):
+        serializer = PocketSuggestionSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return APIResponse.validation_error(errors=serializer.errors, message="Invalid pocket request")
+
+        suggestion = suggest_pockets(request.user.business_id, **serializer.validated_data)
+        return APIResponse.success(
+            data=suggestion,
+            message=(f"Not enough free room: {suggestion['shortfall']} sacks unplaced" if suggestion['shortfall']
+                     else f"{suggestion['sacks']} sacks fit in {len(suggestion['pockets'])} pockets")
+        )
+
 class TransferEntry(APIView):
     def get(self, request, format=None):
         """Get all transfer orders for the user's business"""
         try:
-            business = CompanyProfile.objects.get(pk=request.user.business_id)
+            business = get_request_company(request)
         except (CompanyProfile.DoesNotExist, AttributeError):
             return APIResponse.error(
                 message="User business profile not found",
@@ -214,7 +351,7 @@ class TransferEntry(APIView):
 
         # Get user's business
         try:
-            business = CompanyProfile.objects.get(pk=request.user.business_id)
+            business = get_request_company(request)
         except CompanyProfile.DoesNotExist:
             return APIResponse.error(
                 message="User business profile not found",
@@ -243,7 +380,8 @@ class TransferEntry(APIView):
         # print(number_of_sacks)
 
         # ✅ Check current stock
-        stock_obj = Stock.objects.filter(token_no=token_no,xunit=xunit,xfloor=xfloor,xpocket=xpocket).first()
+        stock_obj = StockBalance.objects.filter(business_id=business, token_no=token_no, xunit=xunit,
+                                                xfloor=xfloor, xpocket=xpocket).first()
         current_stock = stock_obj.number_of_sacks if stock_obj and stock_obj.number_of_sacks is not None else 0
 
         if current_stock < number_of_sacks:
@@ -252,6 +390,16 @@ class TransferEntry(APIView):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
+        # ✅ Check room in the destination pocket (when its capacity is known; inactive pockets have none)
+        destination = tuple(validated_data.get(name) or '' for name in ('xtunit', 'xtfloor', 'xtpocket'))
+        if destination != (xunit or '', xfloor or '', xpocket or ''):
+            room = pocket_room(business, *destination)
+            if room is not None and room < number_of_sacks:
+                return APIResponse.error(
+                    message=f"Insufficient room in {'/'.join(destination)}: Free={room}, Requested={number_of_sacks}",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
         # Use transaction to ensure data consistency
         try:
             with transaction.atomic():
@@ -264,7 +412,8 @@ class TransferEntry(APIView):
                 )
 
                 # Create stock entries
-                self._create_stock_entries(transfer_order, business, request.user)
+                self._create_stock_entries(transfer_order, business, request.user,
+                                           stock_obj.xitem if stock_obj else None)
 
                 return APIResponse.created(
                     data=serializer.data,
@@ -276,7 +425,7 @@ class TransferEntry(APIView):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _create_stock_entries(self, transfer_order, business, user):
+    def _create_stock_entries(self, transfer_order, business, user, xitem):
         """Create stock transaction entries for the transfer"""
         current_datetime = datetime.now()
         # Use the full datetime instead of just time string
@@ -289,7 +438,7 @@ class TransferEntry(APIView):
             xunit=transfer_order.xfunit,
             xfloor=transfer_order.xffloor,
             xpocket=transfer_order.xfpocket,
-            # xitem=transfer_order.xitem,  # You'll need to add item field to Imtor or get it another way
+            xitem=xitem,  # Item of the source stock balance
             xdate=current_datetime.date(),  # Use date() for date field
             xyear=current_datetime.year,
             xper=self._calculate_period(current_datetime),
@@ -314,7 +463,7 @@ class TransferEntry(APIView):
             xunit=transfer_order.xtunit,
             xfloor=transfer_order.xtfloor,
             xpocket=transfer_order.xtpocket,
-            # xitem=transfer_order.xitem,  # You'll need to add item field to Imtor or get it another way
+            xitem=xitem,  # Item of the source stock balance
             xdate=current_datetime.date(),  # Use date() for date field
             xyear=current_datetime.year,
             xper=self._calculate_period(current_datetime),
@@ -333,8 +482,8 @@ class TransferEntry(APIView):
         )
         stock_entries.append(in_entry)
 
-        # Bulk create for better performance
-        Imtrn.objects.bulk_create(stock_entries)
+        # Bulk create and move the balance between pockets
+        StockLedgerService.post(stock_entries)
 
         # Update transfer order status
         transfer_order.xstatus = 'In Progress'
@@ -350,7 +499,7 @@ class TransferEntryDetail(APIView):
     def get(self, request, transfer_id, format=None):
         """Get specific transfer order details"""
         try:
-            business = CompanyProfile.objects.get(pk=request.user.business_id)
+            business = get_request_company(request)
             transfer_order = Imtor.objects.get(
                 ximtor=transfer_id,
                 business_id=business
@@ -372,7 +521,7 @@ class TransferEntryDetail(APIView):
     def patch(self, request, transfer_id, format=None):
         """Update transfer order status"""
         try:
-            business = CompanyProfile.objects.get(pk=request.user.business_id)
+            business = get_request_company(request)
             transfer_order = Imtor.objects.get(
                 ximtor=transfer_id,
                 business_id=business
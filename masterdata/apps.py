@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class MasterdataConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'masterdata'
+
+    def ready(self):
+        from masterdata import company_cache, geo, mobile_directory, search
+        from masterdata.models import CompanyProfile, CustomerProfile, GeoLocation
+
+        post_save.connect(company_cache._invalidate_on_change, sender=CompanyProfile,
+                          dispatch_uid='company_profile_cache')
+        post_delete.connect(company_cache._invalidate_on_change, sender=CompanyProfile,
+                            dispatch_uid='company_profile_cache')
+        post_save.connect(geo._invalidate_on_change, sender=GeoLocation, dispatch_uid='geo_tree_cache')
+        post_delete.connect(geo._invalidate_on_change, sender=GeoLocation, dispatch_uid='geo_tree_cache')
+        post_save.connect(search._index_on_save, sender=CustomerProfile, dispatch_uid='customer_search_tokens')
+        post_delete.connect(search._unindex_on_delete, sender=CustomerProfile, dispatch_uid='customer_search_tokens')
+        post_save.connect(mobile_directory._write_through, sender=CustomerProfile,
+                          dispatch_uid='customer_mobile_directory')
+        post_delete.connect(mobile_directory._remove, sender=CustomerProfile,
+                            dispatch_uid='customer_mobile_directory')
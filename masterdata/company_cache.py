@@ -0,0 +1,54 @@
+"""
+Process-local cache of CompanyProfile rows.
+
+Almost every request needs the caller's CompanyProfile; it changes rarely, so
+it is kept in a small LRU with a TTL. Saving or deleting a profile drops it from
+this process's cache straight away (see MasterdataConfig.ready); other worker
+processes pick the change up when the TTL expires. Callers get their own
+copy of the cached instance, so setting attributes on it or calling
+refresh_from_db() does not leak into other requests.
+"""
+import copy
+
+from django.conf import settings
+
+from masterdata.models import CompanyProfile
+from utils.ttl_cache import TTLCache
+
+
+def _config():
+    config = {'TTL': 300, 'MAX_ENTRIES': 256}
+    config.update(getattr(settings, 'COMPANY_PROFILE_CACHE', {}))
+    return config
+
+
+_profiles = TTLCache(ttl=_config()['TTL'], max_entries=_config()['MAX_ENTRIES'])
+
+
+def get_company_profile(business_id):
+    """Return the CompanyProfile for ``business_id``; raises CompanyProfile.DoesNotExist like objects.get"""
+    profile = _profiles.get(business_id)
+    if profile is None:
+        profile = CompanyProfile.objects.get(pk=business_id)
+        _profiles.set(business_id, profile)
+    return copy.copy(profile)
+
+
+def get_request_company(request):
+    """CompanyProfile attached by AttachBusinessIDMiddleware, or looked up from the request user"""
+    business = getattr(request, 'business', None)
+    if business is not None:
+        return business
+    return get_company_profile(request.user.business_id)
+
+
+def invalidate_company_profile(business_id=None):
+    """Forget one cached profile, or all of them when ``business_id`` is None"""
+    if business_id is None:
+        _profiles.clear()
+    else:
+        _profiles.pop(business_id)
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_company_profile(instance.pk)
@@ -0,0 +1,178 @@
+"""
+Bulk customer import from CSV.
+
+The file is read row by row (csv.DictReader over any iterable of text lines)
+and handled in batches of ``batch_size`` valid rows, so memory is bounded by
+the batch whatever the file size:
+
+* each row is validated with one CustomerImportRowSerializer, whose geo
+  check runs against the business's cached geo tree (masterdata.geo), so
+  validation costs no queries;
+* mobiles already used earlier in the file are reported as duplicates, and
+  each batch's mobiles are checked against the database with one
+  ``xmobile IN (...)`` query on the (business_id, xmobile) index;
+* customer codes for the batch are reserved in one block from
+  CUSTOMER_SERIES and the rows are written with utils.bulk_insert (COPY on
+  PostgreSQL with psycopg 3, bulk_create otherwise), followed by their
+  search tokens.
+
+A batch that still hits the unique mobile constraint (a customer created
+concurrently) is retried row by row under savepoints so only the offending
+rows are reported. Errors carry the CSV line number of the row.
+
+Batches commit as they are loaded. A file that stops decoding (or parsing)
+part way is not rolled back: the rows before it stay imported, the problem
+is reported as an error of the line where reading stopped, and the summary
+has ``complete`` False.
+"""
+import csv
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from masterdata.mobile_directory import invalidate_directory
+from masterdata.models import CUSTOMER_SERIES, CustomerProfile
+from masterdata.search import index_customers
+from masterdata.serializers import CustomerImportRowSerializer
+from utils.bulk_insert import bulk_insert
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def _messages(detail):
+    """Flatten a ValidationError detail into {field: message}"""
+    if isinstance(detail, dict):
+        return {field: ' '.join(str(message) for message in messages) if isinstance(messages, list)
+                else str(messages) for field, messages in detail.items()}
+    if isinstance(detail, list):
+        return {'non_field_errors': ' '.join(str(message) for message in detail)}
+    return {'non_field_errors': str(detail)}
+
+
+class CustomerImport:
+    """
+    Import customers of ``business_id`` from CSV lines; ``run()`` returns a
+    summary with per-row errors. With ``dry_run`` rows are validated and
+    deduplicated but nothing is written.
+    """
+
+    def __init__(self, business_id, user=None, batch_size=2000, dry_run=False):
+        self.business_id = business_id
+        self.user = user
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.serializer = CustomerImportRowSerializer(context={'business_id': business_id})
+        self.columns = set(self.serializer.fields)
+        self.seen = {}
+        self.summary = {'rows': 0, 'created': 0, 'duplicates': 0, 'error_count': 0, 'errors': [],
+                        'ignored_columns': [], 'complete': True}
+
+    def run(self, lines):
+        reader = csv.DictReader(lines)
+        try:
+            self._read(reader)
+        finally:
+            # Batches are committed as they go, so even a failed run may have created customers
+            if self.summary['created'] and not self.dry_run:
+                invalidate_directory(self.business_id)
+        # Database duplicates are only known when their batch is loaded
+        self.summary['errors'].sort(key=lambda error: error['line'])
+        return self.summary
+
+    def _read(self, reader):
+        batch = []
+        try:
+            header = [name.strip() for name in reader.fieldnames or []]
+            reader.fieldnames = header
+            self.summary['ignored_columns'] = [name for name in header if name and name not in self.columns]
+            missing = [name for name in ('customer_name', 'xmobile') if name not in header]
+            if missing:
+                self._error(1, {name: "Column is missing" for name in missing})
+                return
+
+            for row in reader:
+                line = reader.line_num
+                self.summary['rows'] += 1
+                attrs = self._validate(line, row)
+                if attrs is None:
+                    continue
+                mobile = attrs['xmobile']
+                if mobile in self.seen:
+                    self._duplicate(line, f"Mobile number repeats line {self.seen[mobile]}")
+                    continue
+                self.seen[mobile] = line
+                batch.append((line, attrs))
+                if len(batch) >= self.batch_size:
+                    self._load(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The text is decoded in chunks, so the bad line may be a little after the reported one
+            self.summary['complete'] = False
+            self._error(reader.line_num + 1, {
+                'file': f"Not a readable UTF-8 CSV file ({e}); this and the following lines were not imported"
+            })
+        if batch:
+            self._load(batch)
+
+    def _validate(self, line, row):
+        data = {name: value.strip() for name, value in row.items()
+                if name in self.columns and value is not None and value.strip()}
+        try:
+            return self.serializer.run_validation(data)
+        except serializers.ValidationError as e:
+            self._error(line, _messages(e.detail))
+            return None
+
+    def _error(self, line, errors):
+        self.summary['error_count'] += 1
+        if len(self.summary['errors']) < MAX_REPORTED_ERRORS:
+            self.summary['errors'].append({'line': line, 'errors': errors})
+
+    def _duplicate(self, line, message):
+        self.summary['duplicates'] += 1
+        self._error(line, {'xmobile': message})
+
+    def _load(self, batch):
+        existing = set(CustomerProfile.objects
+                       .filter(business_id=self.business_id, xmobile__in=[attrs['xmobile'] for _, attrs in batch])
+                       .values_list('xmobile', flat=True))
+        rows = []
+        for line, attrs in batch:
+            if attrs['xmobile'] in existing:
+                self._duplicate(line, "A customer with this mobile number already exists")
+            else:
+                rows.append((line, attrs))
+        if not rows:
+            return
+        if self.dry_run:
+            # Would be created; codes are not reserved
+            self.summary['created'] += len(rows)
+            return
+
+        codes = CUSTOMER_SERIES.reserve(self.business_id, len(rows))
+        customers = [
+            CustomerProfile(business_id_id=self.business_id, customer_code=code, created_by=self.user,
+                            updated_by=self.user, **attrs)
+            for code, (_, attrs) in zip(codes, rows)
+        ]
+        try:
+            with transaction.atomic():
+                bulk_insert(CustomerProfile, customers, batch_size=self.batch_size)
+                index_customers(customers, replace=False)
+        except IntegrityError:
+            customers = self._load_rows(rows, customers)
+        self.summary['created'] += len(customers)
+
+    def _load_rows(self, rows, customers):
+        """Insert one by one after a failed batch; returns the customers that were created"""
+        created = []
+        for (line, _), customer in zip(rows, customers):
+            try:
+                with transaction.atomic():
+                    CustomerProfile.objects.bulk_create([customer])
+            except IntegrityError:
+                self._duplicate(line, "A customer with this mobile number already exists")
+            else:
+                created.append(customer)
+        index_customers(created, replace=False)
+        return created
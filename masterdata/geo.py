@@ -0,0 +1,182 @@
+"""
+In-memory geo hierarchy (division → district → upazila → union) per business.
+
+GeoLocation is reference data that changes a few times a year but is read on
+every booking form dropdown change and every customer save. Each business's
+rows are loaded once into a GeoTree with precomputed, sorted lists for the
+dropdown endpoints and a set of hierarchy paths for O(1) validation.
+
+Trees live in a process-local TTL cache. A GeoLocation save/delete drops the
+business's tree in this process (see MasterdataConfig.ready); other worker
+processes rebuild theirs when the TTL expires. Each tree carries an ETag
+derived from its contents so clients can revalidate with If-None-Match.
+
+The full hierarchy is also available as one nested document (GeoTree.nested),
+rendered and gzip-compressed once per tree version for the geo/tree/ endpoint.
+"""
+import gzip
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from masterdata.models import GeoLocation
+from utils.ttl_cache import TTLCache
+
+GEO_FIELDS = (
+    'division_name', 'division_bn', 'district_name', 'district_bn',
+    'upazila_name', 'upazila_bn', 'union_name', 'union_bn',
+)
+
+
+def _config():
+    config = {'TTL': 3600, 'MAX_ENTRIES': 64}
+    config.update(getattr(settings, 'GEO_TREE_CACHE', {}))
+    return config
+
+
+_trees = TTLCache(ttl=_config()['TTL'], max_entries=_config()['MAX_ENTRIES'])
+
+
+def _distinct(rows, fields):
+    """Distinct dicts of ``fields`` from ``rows`` (8-tuples in GEO_FIELDS order), in first-seen order"""
+    indexes = [GEO_FIELDS.index(field) for field in fields]
+    seen = {}
+    for row in rows:
+        key = tuple(row[i] for i in indexes)
+        if key not in seen:
+            seen[key] = dict(zip(fields, key))
+    return list(seen.values())
+
+
+class GeoTree:
+    """Precomputed lookups over one business's GeoLocation rows"""
+
+    def __init__(self, rows):
+        rows = sorted(set(rows))
+        self.rows = rows
+
+        self.divisions = _distinct(rows, ('division_name', 'division_bn'))
+        self.districts = sorted(_distinct(rows, ('district_name', 'district_bn')),
+                                key=lambda d: d['district_name'])
+
+        by_district = {}
+        by_upazila = {}
+        for row in rows:
+            by_district.setdefault(row[2], []).append(row)
+            by_upazila.setdefault((row[2], row[4]), []).append(row)
+        self.upazilas = {
+            district: sorted(_distinct(group, ('district_name', 'district_bn', 'upazila_name', 'upazila_bn')),
+                             key=lambda u: u['upazila_name'])
+            for district, group in by_district.items()
+        }
+        self.unions = {
+            key: sorted(_distinct(group, GEO_FIELDS), key=lambda u: u['union_name'])
+            for key, group in by_upazila.items()
+        }
+
+        # Every (division,), (division, district), ... prefix that exists
+        self.paths = set()
+        for row in rows:
+            path = (row[0], row[2], row[4], row[6])
+            for depth in range(1, 5):
+                self.paths.add(path[:depth])
+
+        digest = hashlib.sha1(repr(rows).encode('utf-8')).hexdigest()
+        self.etag = quote_etag(digest[:32])
+        # Whole seconds, as HTTP dates carry no fractions
+        self.last_modified = int(time.time())
+        self._rendered = None
+
+    def contains(self, division=None, district=None, upazila=None, union=None):
+        """True if the given leading part of the hierarchy exists"""
+        path = tuple(value for value in (division, district, upazila, union) if value)
+        return not path or path in self.paths
+
+    def nested(self):
+        """division → district → upazila → union as nested lists of {name, bn, <children>}"""
+        divisions = []
+        levels = (('districts', 2), ('upazilas', 4), ('unions', 6))
+        for row in self.rows:
+            nodes, index = divisions, 0
+            while True:
+                name, bn = row[index], row[index + 1]
+                if not nodes or nodes[-1]['name'] != name or nodes[-1]['bn'] != bn:
+                    nodes.append({'name': name, 'bn': bn})
+                node = nodes[-1]
+                if index == 6:
+                    break
+                child, index = levels[index // 2]
+                nodes = node.setdefault(child, [])
+        return divisions
+
+    def rendered(self):
+        """(json_bytes, gzip_bytes) of the nested tree in the APIResponse envelope, built once"""
+        if self._rendered is None:
+            payload = {
+                "success": True,
+                "status_code": status.HTTP_200_OK,
+                "message": "Geo hierarchy retrieved successfully",
+                "data": {"version": self.etag.strip('"'), "divisions": self.nested()},
+            }
+            body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            self._rendered = (body, gzip.compress(body, mtime=0))
+        return self._rendered
+
+    def not_modified(self, request):
+        """True if the client already has this version of the tree (If-None-Match, else If-Modified-Since)"""
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or self.etag in etags
+        since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return since is not None and since >= self.last_modified
+
+    def not_modified_response(self):
+        return self.tag(Response(status=status.HTTP_304_NOT_MODIFIED))
+
+    def tag(self, response):
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def tree_response(self, request):
+        """HttpResponse with the pre-rendered nested tree, gzip-encoded when the client accepts it"""
+        body, compressed = self.rendered()
+        response = HttpResponse(content_type='application/json')
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response.content = compressed
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response.content = body
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return self.tag(response)
+
+
+def get_geo_tree(business_id):
+    """Return the GeoTree for a business, building it from GeoLocation on a cache miss"""
+    tree = _trees.get(business_id)
+    if tree is None:
+        rows = GeoLocation.objects.filter(business_id=business_id).values_list(*GEO_FIELDS)
+        tree = GeoTree(list(rows))
+        _trees.set(business_id, tree)
+    return tree
+
+
+def invalidate_geo_tree(business_id=None):
+    """Forget one business's tree, or all of them when ``business_id`` is None"""
+    if business_id is None:
+        _trees.clear()
+    else:
+        _trees.pop(business_id)
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_geo_tree(instance.business_id_id)
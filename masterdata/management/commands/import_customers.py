@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from masterdata.customer_import import CustomerImport
+from masterdata.models import CompanyProfile
+
+
+class Command(BaseCommand):
+    help = "Import customers of a business from a CSV file, reporting invalid and duplicate rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, required=True, help="business_id to import into")
+        parser.add_argument('--file', required=True, help="CSV file with a header row of customer fields")
+        parser.add_argument('--user', help="username recorded as created_by/updated_by")
+        parser.add_argument('--batch-size', type=int, default=2000, help="rows per insert batch")
+        parser.add_argument('--dry-run', action='store_true', help="validate and deduplicate without saving")
+
+    def handle(self, *args, **options):
+        if not CompanyProfile.objects.filter(pk=options['business']).exists():
+            raise CommandError(f"Business {options['business']} does not exist")
+        user = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                user = User.objects.get(**{User.USERNAME_FIELD: options['user']})
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        started = time.perf_counter()
+        importer = CustomerImport(options['business'], user=user, batch_size=options['batch_size'],
+                                  dry_run=options['dry_run'])
+        try:
+            with open(options['file'], encoding='utf-8-sig', newline='') as lines:
+                summary = importer.run(lines)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in summary['errors']:
+            details = '; '.join(f"{field}: {message}" for field, message in error['errors'].items())
+            self.stdout.write(f"line {error['line']}: {details}")
+        if summary['ignored_columns']:
+            self.stdout.write(f"Ignored columns: {', '.join(summary['ignored_columns'])}")
+        verb = "Would create" if options['dry_run'] else "Created"
+        result = (f"{verb} {summary['created']} of {summary['rows']} rows ({summary['duplicates']} duplicates, "
+                  f"{summary['error_count'] - summary['duplicates']} invalid) in {time.perf_counter() - started:.2f}s")
+        if not summary['complete']:
+            raise CommandError(f"{result}; stopped before the end of the file")
+        self.stdout.write(self.style.SUCCESS(result))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masterdata', '0005_alter_itemmaster_current_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCounter',
+            fields=[
+                ('pk', models.CompositePrimaryKey('business_id', 'xseries', 'xyear', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('xseries', models.CharField(max_length=20)),
+                ('xyear', models.IntegerField(default=0)),
+                ('xlast', models.BigIntegerField(default=0)),
+                ('business_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='masterdata.companyprofile')),
+            ],
+            options={
+                'verbose_name': 'Document Counter',
+                'verbose_name_plural': 'Document Counters',
+                'db_table': 'document_counter',
+            },
+        ),
+    ]
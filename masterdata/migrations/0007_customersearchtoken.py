@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SEARCH_COLUMNS = ('customer_name', 'customer_code', 'xmobile', 'contact_person', 'xemail')
+
+
+def create_search_indexes(apps, schema_editor):
+    """pg_trgm indexes for the icontains search on PostgreSQL; token backfill elsewhere"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS customer_profile_{column}_trgm "
+                f"ON customer_profile USING gin (UPPER({column}::text) gin_trgm_ops)"
+            )
+        return
+
+    from masterdata.search import customer_tokens
+
+    CustomerProfile = apps.get_model('masterdata', 'CustomerProfile')
+    CustomerSearchToken = apps.get_model('masterdata', 'CustomerSearchToken')
+    batch = []
+    for customer in CustomerProfile.objects.values('business_id', *SEARCH_COLUMNS).iterator(chunk_size=2000):
+        batch.extend(
+            CustomerSearchToken(business_id_id=customer['business_id'], customer_code=customer['customer_code'],
+                                token=token)
+            for token in customer_tokens(customer)
+        )
+        if len(batch) >= 5000:
+            CustomerSearchToken.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    CustomerSearchToken.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS customer_profile_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masterdata', '0006_documentcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSearchToken',
+            fields=[
+                ('pk', models.CompositePrimaryKey('business_id', 'token', 'customer_code', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=100)),
+                ('customer_code', models.CharField(max_length=50)),
+                ('business_id', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='masterdata.companyprofile')),
+            ],
+            options={
+                'verbose_name': 'Customer Search Token',
+                'verbose_name_plural': 'Customer Search Tokens',
+                'db_table': 'customer_search_token',
+                'indexes': [models.Index(fields=['business_id', 'customer_code'], name='customer_search_token_code')],
+            },
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
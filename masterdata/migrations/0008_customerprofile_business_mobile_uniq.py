@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Duplicate groups listed when the migration refuses to run
+REPORTED_DUPLICATES = 50
+
+
+def check_duplicate_mobiles(apps, schema_editor):
+    """
+    Refuse to add the constraint while a business has several customers with
+    the same mobile number, listing them so they can be merged or corrected.
+    Which record is the real customer is a business decision, so nothing is
+    changed automatically.
+    """
+    CustomerProfile = apps.get_model('masterdata', 'CustomerProfile')
+    customers = CustomerProfile.objects.exclude(xmobile__isnull=True).exclude(xmobile='')
+    duplicates = list(customers.values('business_id', 'xmobile').annotate(customers=Count('customer_code'))
+                      .filter(customers__gt=1).order_by('business_id', 'xmobile'))
+    if not duplicates:
+        return
+
+    lines = []
+    for duplicate in duplicates[:REPORTED_DUPLICATES]:
+        codes = customers.filter(business_id=duplicate['business_id'], xmobile=duplicate['xmobile']).order_by(
+            'customer_code').values_list('customer_code', flat=True)
+        lines.append(f"  business {duplicate['business_id']}, mobile {duplicate['xmobile']}: {', '.join(codes)}")
+    if len(duplicates) > REPORTED_DUPLICATES:
+        lines.append(f"  ... and {len(duplicates) - REPORTED_DUPLICATES} more")
+    raise RuntimeError(
+        f"Cannot add customer_profile_business_mobile_uniq: {len(duplicates)} mobile numbers are used by more "
+        f"than one customer of the same business. Merge the customers or correct their numbers, then migrate "
+        f"again:\n" + "\n".join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masterdata', '0007_customersearchtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_mobiles, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customerprofile',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('xmobile__isnull', False), models.Q(('xmobile', ''), _negated=True)),
+                fields=('business_id', 'xmobile'),
+                name='customer_profile_business_mobile_uniq',
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masterdata', '0008_customerprofile_business_mobile_uniq'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commoncodes',
+            index=models.Index(condition=models.Q(('zactive', True)), fields=['business_id', 'xtype'], name='commoncodes_active_type_idx'),
+        ),
+    ]
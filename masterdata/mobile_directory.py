@@ -0,0 +1,120 @@
+"""
+Per-business mobile number → customer directory.
+
+Gate clerks identify farmers by mobile number: the customer search, booking
+and certificate flows all resolve (business_id, xmobile) to a customer, and
+the type-ahead endpoint needs prefix matches while the number is being typed.
+Each business's numbers are loaded once (one query) into a MobileDirectory
+holding a dict for exact lookups and a sorted list for prefix search.
+
+Directories live in a process-local TTL cache and are written through when
+a CustomerProfile save/delete in this process commits (see
+MasterdataConfig.ready), so a rolled back write never shows up. Other
+processes see changes after the TTL, so the directory only serves the
+type-ahead; ``find_customer``, which callers act on, always reads the
+database with one probe of the unique (business_id, xmobile) index.
+"""
+import threading
+from bisect import bisect_left
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from masterdata.models import CustomerProfile
+from utils.ttl_cache import TTLCache
+
+
+def _config():
+    config = {'TTL': 600, 'MAX_ENTRIES': 16}
+    config.update(getattr(settings, 'MOBILE_DIRECTORY_CACHE', {}))
+    return config
+
+
+_directories = TTLCache(ttl=_config()['TTL'], max_entries=_config()['MAX_ENTRIES'])
+
+
+class MobileDirectory:
+    """mobile → (customer_code, customer_name) for one business"""
+
+    def __init__(self, rows):
+        self._lock = threading.Lock()
+        self._by_mobile = {}
+        self._by_code = {}
+        for mobile, code, name in rows:
+            self._by_mobile[mobile] = (code, name)
+            self._by_code[code] = mobile
+        self._sorted = None
+
+    def get(self, mobile):
+        """(customer_code, customer_name) for ``mobile``, or None"""
+        with self._lock:
+            return self._by_mobile.get(mobile)
+
+    def prefix(self, prefix, limit=10):
+        """Up to ``limit`` (mobile, customer_code, customer_name) whose mobile starts with ``prefix``"""
+        # Reads hold the lock too: put() changes both maps and the sorted list together
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(self._by_mobile)
+            mobiles = self._sorted
+            matches = []
+            for index in range(bisect_left(mobiles, prefix), len(mobiles)):
+                mobile = mobiles[index]
+                if not mobile.startswith(prefix) or len(matches) >= limit:
+                    break
+                matches.append((mobile,) + self._by_mobile[mobile])
+            return matches
+
+    def put(self, mobile, code, name):
+        with self._lock:
+            old_mobile = self._by_code.pop(code, None)
+            if old_mobile is not None:
+                self._by_mobile.pop(old_mobile, None)
+            if mobile:
+                self._by_mobile[mobile] = (code, name)
+                self._by_code[code] = mobile
+            self._sorted = None
+
+    def remove(self, code):
+        self.put(None, code, None)
+
+
+def get_directory(business_id):
+    directory = _directories.get(business_id)
+    if directory is None:
+        rows = (CustomerProfile.objects
+                .filter(business_id=business_id, xmobile__isnull=False)
+                .exclude(xmobile='')
+                .values_list('xmobile', 'customer_code', 'customer_name'))
+        directory = MobileDirectory(rows.iterator(chunk_size=5000))
+        _directories.set(business_id, directory)
+    return directory
+
+
+def find_customer(business_id, mobile):
+    """The CustomerProfile with ``mobile`` in the business, or None; read from the database, never the cache"""
+    return CustomerProfile.objects.filter(business_id=business_id, xmobile=mobile).first()
+
+
+def invalidate_directory(business_id=None):
+    if business_id is None:
+        _directories.clear()
+    else:
+        _directories.pop(business_id)
+
+
+def _put(business_id, mobile, code, name):
+    directory = _directories.get(business_id)
+    if directory is not None:
+        directory.put(mobile, code, name)
+
+
+def _write_through(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(_put, instance.business_id_id, instance.xmobile or None,
+                                      instance.customer_code, instance.customer_name), using=using)
+
+
+def _remove(sender, instance, using=None, **kwargs):
+    transaction.on_commit(partial(_put, instance.business_id_id, None, instance.customer_code, None), using=using)
@@ -5,6 +5,8 @@ from user.models import CustomUser
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from masterdata.numbering import DocumentSeries
+
 class CompanyProfile(models.Model):
     business_id = models.AutoField(primary_key=True)
     business_name = models.CharField(max_length=255)  # Full legal name
@@ -67,6 +69,23 @@ class AuditModel(models.Model):
 
 
 # core/models.py or common/models.py
+class DocumentCounter(models.Model):
+    """Last number handed out per business, document series and year (see masterdata.numbering)"""
+    pk = models.CompositePrimaryKey('business_id', 'xseries', 'xyear')
+    business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
+    xseries = models.CharField(max_length=20)
+    xyear = models.IntegerField(default=0)
+    xlast = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'document_counter'
+        verbose_name = 'Document Counter'
+        verbose_name_plural = 'Document Counters'
+
+    def __str__(self):
+        return f"{self.xseries}-{self.xyear}: {self.xlast}"
+
+
 class CommonCodes(AuditModel):
     pk = models.CompositePrimaryKey('business_id', 'xtype','xcode')
     business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
@@ -80,23 +99,24 @@ class CommonCodes(AuditModel):
         db_table = 'commoncodes'
         verbose_name = 'Common Code'
         verbose_name_plural = 'Common Codes'
+        indexes = [
+            models.Index(fields=['business_id', 'xtype'], condition=models.Q(zactive=True),
+                         name='commoncodes_active_type_idx'),
+        ]
 
     def __str__(self):
         return f"{self.xtype} - {self.xdesc}"
 
+CUSTOMER_SERIES = DocumentSeries('CUSTOMER', 'CRT-', 6, model='masterdata.CustomerProfile', field='customer_code')
+# Customers created by the certificate flow (ops.services.CertificateService) have always been numbered CUS-
+CERTIFICATE_CUSTOMER_SERIES = DocumentSeries('CUSTOMER_CUS', 'CUS-', 6, model='masterdata.CustomerProfile',
+                                             field='customer_code')
+
+
 def cus_code():
-    cusprifix = "CRT-"
-    # For the very first time invoice_number is YY-MM-DD-001
-    next_cus_code = '000001'
-    # Get Last Invoice Number of Current Year, Month and Day (20-11-28 YY-MM-DD)
-    last_customer = CustomerProfile.objects.filter(customer_code__startswith=cusprifix).order_by('customer_code').last()
-    if last_customer:
-        # Cut 4 digit from the left and converted to int (2011:xxx)
-        last_cus_code = int(last_customer.customer_code[4:])
-        # Increment one with last six digit
-        next_cus_code = '{0:06d}'.format(last_cus_code + 1)
-    # Return custom invoice number
-    return cusprifix + next_cus_code
+    # Kept as the field default for migration history; the code is allocated
+    # from CUSTOMER_SERIES in CustomerProfile.save() once business_id is known
+    return ''
 
 
 class CustomerProfile(AuditModel):
@@ -160,10 +180,45 @@ class CustomerProfile(AuditModel):
         indexes = [
             models.Index(fields=['business_id', 'customer_code', 'xmobile']),
         ]
+        # One customer per mobile number within a business; backs the mobile lookups
+        # in masterdata.mobile_directory. Blank numbers are not constrained.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business_id', 'xmobile'],
+                condition=models.Q(xmobile__isnull=False) & ~models.Q(xmobile=''),
+                name='customer_profile_business_mobile_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.customer_code} - {self.customer_name}"
 
+    def save(self, *args, **kwargs):
+        if not self.customer_code:
+            self.customer_code = CUSTOMER_SERIES.next(self.business_id_id)
+        super().save(*args, **kwargs)
+
+
+class CustomerSearchToken(models.Model):
+    """
+    Normalized search tokens per customer (see masterdata/search.py).
+
+    Used for customer search on databases without trigram indexes; a search
+    term matches a customer when it is a prefix of one of its tokens.
+    """
+    pk = models.CompositePrimaryKey('business_id', 'token', 'customer_code')
+    business_id = models.ForeignKey(CompanyProfile, on_delete=models.DO_NOTHING)
+    token = models.CharField(max_length=100)
+    customer_code = models.CharField(max_length=50)
+
+    class Meta:
+        db_table = 'customer_search_token'
+        verbose_name = 'Customer Search Token'
+        verbose_name_plural = 'Customer Search Tokens'
+        indexes = [
+            models.Index(fields=['business_id', 'customer_code'], name='customer_search_token_code'),
+        ]
+
 
 class GeoLocation(models.Model):
     pk = models.CompositePrimaryKey('business_id', 'division_name', 'district_name','upazila_name','union_name')
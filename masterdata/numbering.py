@@ -0,0 +1,187 @@
+"""
+Document number allocation for booking, token, challan, transfer and customer codes.
+
+Numbers are handed out from a per (business, series, year) counter instead of
+reading the last row of the document table on every insert:
+
+* ``counter`` mode (default) keeps the counter in the ``document_counter`` table
+  and bumps it with a single ``UPDATE ... RETURNING``.
+* ``sequence`` mode (PostgreSQL only) uses one database SEQUENCE per counter,
+  so allocation never takes a row lock.
+
+Each worker process can reserve a block of numbers at a time (``BLOCK_SIZE``)
+and serve later allocations from memory; in sequence mode the block size is
+used as the sequence CACHE, which does the same per database session. Unused numbers in a block are lost when
+the process exits, so block sizes above 1 trade gap-free numbering for fewer
+round trips. A block is only cached once the transaction that reserved it
+commits; if it rolls back, its numbers are released with the counter.
+"""
+import datetime
+import re
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def _config():
+    config = {'BACKEND': 'counter', 'BLOCK_SIZE': 1}
+    config.update(getattr(settings, 'DOCUMENT_NUMBERING', {}))
+    return config
+
+
+def _use_sequences():
+    return _config()['BACKEND'] == 'sequence' and connection.vendor == 'postgresql'
+
+
+def _sequence_name(business_id, series, year):
+    return re.sub(r'[^a-z0-9_]', '_', f"docno_{business_id}_{series}_{year}".lower())
+
+
+def _reserve_from_counter(business_id, series, year, count, seed):
+    """Advance the counter by ``count`` and return the last number reserved."""
+    DocumentCounter = apps.get_model('masterdata', 'DocumentCounter')
+    with transaction.atomic():
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {DocumentCounter._meta.db_table} SET xlast = xlast + %s "
+                    f"WHERE business_id_id = %s AND xseries = %s AND xyear = %s RETURNING xlast",
+                    [count, business_id, series, year]
+                )
+                row = cursor.fetchone()
+            if row:
+                return row[0]
+        else:
+            lookup = DocumentCounter.objects.filter(business_id_id=business_id, xseries=series, xyear=year)
+            if lookup.update(xlast=F('xlast') + count):
+                return lookup.values_list('xlast', flat=True).get()
+
+        # First allocation for this counter: start after the highest legacy number
+        start = seed() if seed else 0
+        counter, created = DocumentCounter.objects.get_or_create(
+            business_id_id=business_id, xseries=series, xyear=year,
+            defaults={'xlast': start + count}
+        )
+        if created:
+            return counter.xlast
+    # Lost the creation race to another worker; the row exists now
+    return _reserve_from_counter(business_id, series, year, count, None)
+
+
+def _reserve_from_sequence(business_id, series, year, count, seed):
+    """Draw ``count`` values from the PostgreSQL sequence backing this counter."""
+    name = _sequence_name(business_id, series, year)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is None:
+            start = (seed() if seed else 0) + 1
+            cache = max(int(_config()['BLOCK_SIZE']), 1)
+            cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {name} START WITH {int(start)} CACHE {cache}")
+        cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [name, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def allocate(business_id, series, year=0, count=1, seed=None):
+    """
+    Reserve ``count`` numbers for a business/series/year.
+
+    Returns a list of integers. In counter mode the list is always a contiguous
+    range; in sequence mode concurrent callers may interleave.
+    ``seed`` is called once, when the counter is first created, and must return
+    the highest number already in use.
+    """
+    if count <= 0:
+        return []
+
+    if _use_sequences():
+        return _reserve_from_sequence(business_id, series, year, count, seed)
+
+    key = (business_id, series, year)
+    with _blocks_lock:
+        block = _blocks.get(key)
+        if block and block[1] - block[0] + 1 >= count:
+            first = block[0]
+            block[0] += count
+            return list(range(first, first + count))
+
+    block_size = max(int(_config()['BLOCK_SIZE']), count)
+    last = _reserve_from_counter(business_id, series, year, block_size, seed)
+    first = last - block_size + 1
+
+    if block_size > count:
+        # The counter UPDATE belongs to the caller's transaction: cache the rest of the
+        # block only once it commits, so a rollback cannot leave numbers in memory that
+        # the database will hand out again
+        def keep_block():
+            with _blocks_lock:
+                _blocks[key] = [first + count, last]
+        transaction.on_commit(keep_block)
+    return list(range(first, first + count))
+
+
+def reset_blocks():
+    """Drop every number block cached by this process."""
+    with _blocks_lock:
+        _blocks.clear()
+
+
+class DocumentSeries:
+    """
+    A formatted numbering series such as ``B25-00001`` or ``CRT-000001``.
+
+    ``prefix`` may contain ``{yy}`` for the two digit year; such series restart
+    every year. ``model``/``field`` point at the table holding existing numbers
+    and are only used to seed a new counter from legacy data.
+    """
+
+    def __init__(self, code, prefix, width, model, field):
+        self.code = code
+        self.prefix = prefix
+        self.width = width
+        self.model = model
+        self.field = field
+        self.yearly = '{yy}' in prefix
+
+    def _year(self, today=None):
+        return (today or datetime.date.today()).year if self.yearly else 0
+
+    def _prefix(self, year):
+        return self.prefix.format(yy=f"{year % 100:02d}")
+
+    def format(self, number, year):
+        return f"{self._prefix(year)}{number:0{self.width}d}"
+
+    def parse(self, value):
+        """Return the serial part of a formatted number, or None if it does not parse."""
+        try:
+            return int(value.rsplit('-', 1)[-1])
+        except (AttributeError, ValueError):
+            return None
+
+    def _seed(self, business_id, year):
+        def seed():
+            prefix = self._prefix(year)
+            model = apps.get_model(self.model)
+            last = (model.objects
+                    .filter(business_id=business_id, **{f"{self.field}__startswith": prefix})
+                    .order_by(f"-{self.field}")
+                    .values_list(self.field, flat=True)
+                    .first())
+            return self.parse(last) or 0
+        return seed
+
+    def reserve(self, business_id, count, today=None):
+        """Reserve ``count`` formatted numbers for a business."""
+        year = self._year(today)
+        numbers = allocate(business_id, self.code, year, count, seed=self._seed(business_id, year))
+        return [self.format(number, year) for number in numbers]
+
+    def next(self, business_id, today=None):
+        """Reserve a single formatted number for a business."""
+        return self.reserve(business_id, 1, today)[0]
@@ -0,0 +1,109 @@
+"""
+Customer search over name, code, mobile, contact person and email.
+
+Two backends, chosen by settings.CUSTOMER_SEARCH['BACKEND'] ('auto' picks by
+database vendor):
+
+* ``trigram`` (PostgreSQL): the original ``icontains`` filters, served by
+  pg_trgm GIN indexes on UPPER(column) created in migration 0007.
+* ``tokens`` (other databases): a CustomerSearchToken table holding
+  normalized tokens per customer; every word of the search term must be a
+  prefix of one of the customer's tokens. Name, contact and email contribute
+  their words; code and mobile contribute every suffix, so any substring of
+  them matches as it does with ``icontains``.
+
+The token table is kept in step by CustomerProfile signals (see
+MasterdataConfig.ready); bulk writes must call ``index_customers``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_FIELDS = ('customer_name', 'customer_code', 'xmobile', 'contact_person', 'xemail')
+WORD_FIELDS = ('customer_name', 'contact_person', 'xemail')
+SUFFIX_FIELDS = ('customer_code', 'xmobile')
+
+TOKEN_MAX_LENGTH = 100
+_split = re.compile(r'[^0-9a-z\u0980-\u09ff]+')
+
+
+def backend():
+    configured = getattr(settings, 'CUSTOMER_SEARCH', {}).get('BACKEND', 'auto')
+    if configured == 'auto':
+        return 'trigram' if connection.vendor == 'postgresql' else 'tokens'
+    return configured
+
+
+def normalize(value):
+    """Lowercase words of ``value``; punctuation and spaces separate words"""
+    return [word for word in _split.split(str(value or '').lower()) if word]
+
+
+def customer_tokens(customer):
+    """Set of search tokens for a customer (model instance or dict with SEARCH_FIELDS)"""
+    get = customer.get if isinstance(customer, dict) else (lambda name: getattr(customer, name))
+    tokens = set()
+    for name in WORD_FIELDS:
+        tokens.update(normalize(get(name)))
+    for name in SUFFIX_FIELDS:
+        value = ''.join(normalize(get(name)))
+        tokens.update(value[i:] for i in range(len(value)))
+    return {token[:TOKEN_MAX_LENGTH] for token in tokens}
+
+
+def index_customers(customers, replace=True):
+    """(Re)write the search tokens of ``customers`` (CustomerProfile rows); a no-op for the trigram backend"""
+    from masterdata.models import CustomerSearchToken
+
+    customers = list(customers)
+    if not customers or backend() != 'tokens':
+        return
+    if replace:
+        keys = Q()
+        for customer in customers:
+            keys |= Q(business_id=customer.business_id_id, customer_code=customer.customer_code)
+        CustomerSearchToken.objects.filter(keys).delete()
+    CustomerSearchToken.objects.bulk_create([
+        CustomerSearchToken(business_id_id=customer.business_id_id, customer_code=customer.customer_code, token=token)
+        for customer in customers
+        for token in customer_tokens(customer)
+    ], ignore_conflicts=True)
+
+
+def search_customers(queryset, business_id, term):
+    """Filter a CustomerProfile queryset of ``business_id`` down to customers matching ``term``"""
+    from masterdata.models import CustomerSearchToken
+
+    if backend() != 'tokens':
+        condition = Q()
+        for name in SEARCH_FIELDS:
+            condition |= Q(**{f'{name}__icontains': term})
+        return queryset.filter(condition)
+
+    words = normalize(term)
+    if not words:
+        return queryset
+    for word in words:
+        word = word[:TOKEN_MAX_LENGTH]
+        # Range instead of LIKE so the (business_id, token) primary key index is used
+        codes = CustomerSearchToken.objects.filter(
+            business_id=business_id, token__gte=word, token__lt=word + '\uffff'
+        ).values('customer_code')
+        queryset = queryset.filter(customer_code__in=codes)
+    return queryset
+
+
+def _index_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_customers([instance])
+
+
+def _unindex_on_delete(sender, instance, **kwargs):
+    from masterdata.models import CustomerSearchToken
+
+    if backend() == 'tokens':
+        CustomerSearchToken.objects.filter(
+            business_id=instance.business_id_id, customer_code=instance.customer_code
+        ).delete()
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework import serializers
 from .models import CustomerProfile, GeoLocation, CompanyProfile, RateSetup
 from masterdata.models import CommonCodes, GeoLocation
+from masterdata.geo import get_geo_tree
 
 class CommonCodesSerializer(serializers.ModelSerializer):
     class Meta:
@@ -136,33 +137,26 @@ class CustomerProfileCreateSerializer(serializers.ModelSerializer):
 
         # If any geo field is provided, validate the hierarchy
         if any([division, district, upazila, union]):
-            business_id = self.context['request'].user.business_id
-
-            # Check if the geo-location combination exists
-            geo_query = GeoLocation.objects.filter(business_id=business_id)
+            business_id = self.context.get('business_id') or self.context['request'].user.business_id
 
-            if division:
-                geo_query = geo_query.filter(division_name=division)
             if district:
                 if not division:
                     raise serializers.ValidationError({
                         'district_name': 'Division must be provided when district is specified'
                     })
-                geo_query = geo_query.filter(district_name=district)
             if upazila:
                 if not district or not division:
                     raise serializers.ValidationError({
                         'upazila_name': 'Division and district must be provided when upazila is specified'
                     })
-                geo_query = geo_query.filter(upazila_name=upazila)
             if union:
                 if not upazila or not district or not division:
                     raise serializers.ValidationError({
                         'union_name': 'Division, district, and upazila must be provided when union is specified'
                     })
-                geo_query = geo_query.filter(union_name=union)
 
-            if not geo_query.exists():
+            # Check if the geo-location combination exists in the cached hierarchy
+            if not get_geo_tree(business_id).contains(division, district, upazila, union):
                 raise serializers.ValidationError({
                     'geo_location': 'Invalid geo-location combination'
                 })
@@ -189,6 +183,19 @@ class CustomerProfileCreateSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class CustomerImportRowSerializer(CustomerProfileCreateSerializer):
+    """
+    One row of a bulk customer import (masterdata.customer_import).
+
+    Field and geo-location validation only, against the business given as
+    ``context['business_id']``; duplicate mobiles are checked for the whole
+    file at once by the importer.
+    """
+
+    def validate(self, attrs):
+        return self.validate_geo_location(attrs)
+
+
 class CustomerProfileResponseSerializer(serializers.ModelSerializer):
     """Serializer for response data"""
     business_name = serializers.CharField(source='business_id.company_name', read_only=True)
@@ -270,31 +277,24 @@ class CustomerProfileUpdateSerializer(serializers.ModelSerializer):
         if any([division, district, upazila, union]):
             business_id = self.context['request'].user.business_id
 
-            # Check if the geo-location combination exists
-            geo_query = GeoLocation.objects.filter(business_id=business_id)
-
-            if division:
-                geo_query = geo_query.filter(division_name=division)
             if district:
                 if not division:
                     raise serializers.ValidationError({
                         'district_name': 'Division must be provided when district is specified'
                     })
-                geo_query = geo_query.filter(district_name=district)
             if upazila:
                 if not district or not division:
                     raise serializers.ValidationError({
                         'upazila_name': 'Division and district must be provided when upazila is specified'
                     })
-                geo_query = geo_query.filter(upazila_name=upazila)
             if union:
                 if not upazila or not district or not division:
                     raise serializers.ValidationError({
                         'union_name': 'Division, district, and upazila must be provided when union is specified'
                     })
-                geo_query = geo_query.filter(union_name=union)
 
-            if not geo_query.exists():
+            # Check if the geo-location combination exists in the cached hierarchy
+            if not get_geo_tree(business_id).contains(division, district, upazila, union):
                 raise serializers.ValidationError({
                     'geo_location': 'Invalid geo-location combination'
                 })
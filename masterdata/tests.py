@@ -1,3 +1,283 @@
-from django.test import TestCase
+import datetime
+import io
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from masterdata.company_cache import get_company_profile, invalidate_company_profile
+from masterdata.customer_import import CustomerImport
+from masterdata.mobile_directory import find_customer, get_directory, invalidate_directory
+from masterdata.models import CUSTOMER_SERIES, CommonCodes, CompanyProfile, CustomerProfile, DocumentCounter
+from masterdata.numbering import DocumentSeries, reset_blocks
+from ops.services import CertificateService
+from user.models import CustomUser
+from user.serializers import LoginSerializer
+
+
+def company_lookups(queries):
+    """Queries that read the company_profile table"""
+    table = connection.ops.quote_name(CompanyProfile._meta.db_table)
+    return [query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith('SELECT') and table in query['sql']]
+
+
+class CompanyProfileLookupTests(TestCase):
+    """An authenticated request resolves the caller's CompanyProfile at most once (masterdata.company_cache)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=cls.business.pk, user_role='Staff')
+
+    def setUp(self):
+        invalidate_company_profile()
+        token = LoginSerializer.get_token(self.user).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def create_customer(self, mobile):
+        return self.client.post('/api/masterdata/customers/create/',
+                                {'customer_name': 'Karim', 'xmobile': mobile}, content_type='application/json')
+
+    def test_one_company_lookup_on_a_cold_cache(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.create_customer('01711111111')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(company_lookups(queries.captured_queries)), 1)
+
+    def test_no_company_lookup_once_cached(self):
+        self.create_customer('01711111111')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.create_customer('01722222222')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(company_lookups(queries.captured_queries), [])
+
+    def test_profile_change_is_seen_by_the_next_request(self):
+        self.create_customer('01711111111')
+        self.business.business_name = 'Renamed Cold Storage'
+        self.business.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.create_customer('01722222222')
+        self.assertEqual(len(company_lookups(queries.captured_queries)), 1)
+
+    def test_each_caller_gets_its_own_instance(self):
+        first = get_company_profile(self.business.pk)
+        first.business_name = 'Changed by one request'
+        with self.assertNumQueries(0):
+            second = get_company_profile(self.business.pk)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.business_name, 'Test Cold Storage')
+
+
+class CommonCodesListTests(TestCase):
+    """Lookup lists are read whole by dropdowns, so they are not paginated"""
+
+    @classmethod
+    def setUpTestData(cls):
+        business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=business.pk, user_role='Staff')
+        CommonCodes.objects.bulk_create([
+            CommonCodes(business_id=business, xtype='BANK', xcode=f"B{number:03d}") for number in range(150)
+        ])
+
+    def test_returns_every_code(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        response = self.client.get('/api/masterdata/common-codes/list/', {'xtype': 'BANK'},
+                                   HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual(len(body['data']), 150)
+        self.assertNotIn('pagination', body['meta'])
+
+
+def customer_csv(rows, bad_line=None):
+    """CSV bytes of ``rows`` customers, with an invalid UTF-8 byte on line ``bad_line``"""
+    lines = [b'customer_name,xmobile'] + [f"Farmer {number},017{number:08d}".encode() for number in range(rows)]
+    if bad_line is not None:
+        lines[bad_line - 1] = b'Farmer \xff,01899999999'
+    return b'\r\n'.join(lines) + b'\r\n'
+
+
+class CustomerImportTests(TestCase):
+    """Rows inserted concurrently with an import batch are reported, not fatal"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+
+    def setUp(self):
+        invalidate_directory()
+
+    def test_unreadable_line_stops_the_import_and_keeps_earlier_batches(self):
+        get_directory(self.business.pk)
+        lines = io.TextIOWrapper(io.BytesIO(customer_csv(900, bad_line=800)), encoding='utf-8-sig', newline='')
+        summary = CustomerImport(self.business.pk, batch_size=100).run(lines)
+
+        self.assertFalse(summary['complete'])
+        self.assertGreater(summary['created'], 0)
+        self.assertEqual(CustomerProfile.objects.filter(business_id=self.business).count(), summary['created'])
+        stop = summary['errors'][-1]
+        self.assertIn('file', stop['errors'])
+        self.assertEqual(stop['line'], summary['rows'] + 2)
+        # The directory cached before the import sees the imported customers
+        self.assertIsNotNone(get_directory(self.business.pk).get('01700000000'))
+
+    def test_command_reports_an_unreadable_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as upload:
+            upload.write(customer_csv(10, bad_line=5))
+            upload.flush()
+            output = io.StringIO()
+            with self.assertRaisesMessage(CommandError, "stopped before the end of the file"):
+                call_command('import_customers', business=self.business.pk, file=upload.name, stdout=output)
+        self.assertIn('Not a readable UTF-8 CSV file', output.getvalue())
+
+    def test_batch_conflict_falls_back_to_single_rows(self):
+        reserve = CUSTOMER_SERIES.reserve
+
+        def reserve_after_concurrent_insert(business_id, count):
+            # Another request creates a customer after the batch's duplicate check
+            CustomerProfile.objects.create(business_id=self.business, customer_code='CRT-900000',
+                                           customer_name='Rahim', xmobile='01722222222')
+            return reserve(business_id, count)
+
+        lines = ['customer_name,xmobile', 'Karim,01711111111', 'Rahim,01722222222', 'Salam,01733333333']
+        with mock.patch.object(CUSTOMER_SERIES, 'reserve', side_effect=reserve_after_concurrent_insert):
+            summary = CustomerImport(self.business.pk).run(lines)
+
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual(summary['duplicates'], 1)
+        self.assertEqual([error['line'] for error in summary['errors']], [3])
+        self.assertEqual(CustomerProfile.objects.filter(business_id=self.business).count(), 3)
+
+
+class MobileDirectoryTests(TestCase):
+    """Mobile type-ahead from the cached directory, written through on commit (masterdata.mobile_directory)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=cls.business.pk, user_role='Staff')
+        for code, name, mobile in (('CRT-000001', 'Karim', '01711111111'), ('CRT-000002', 'Rahim', '01711122222'),
+                                   ('CRT-000003', 'Salam', '01811111111')):
+            CustomerProfile.objects.create(business_id=cls.business, customer_code=code, customer_name=name,
+                                           xmobile=mobile)
+
+    def setUp(self):
+        invalidate_directory()
+
+    def create_customer(self, code, mobile, business=None):
+        return CustomerProfile.objects.create(business_id=business or self.business, customer_code=code,
+                                              customer_name='Farmer', xmobile=mobile)
+
+    def test_suggest_returns_prefix_matches(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        response = self.client.get('/api/ops/customers/mobile-suggest/', {'q': '017111'},
+                                   HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([match['customer_code'] for match in response.json()['data']],
+                         ['CRT-000001', 'CRT-000002'])
+
+    def test_committed_customer_is_written_through(self):
+        directory = get_directory(self.business.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_customer('CRT-000004', '01722222222')
+        self.assertEqual(directory.get('01722222222'), ('CRT-000004', 'Farmer'))
+
+    def test_rolled_back_customer_is_not_cached(self):
+        directory = get_directory(self.business.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.create_customer('CRT-000004', '01722222222')
+                    raise IntegrityError("simulated failure after the insert")
+            except IntegrityError:
+                pass
+        self.assertIsNone(directory.get('01722222222'))
+        self.assertEqual(directory.prefix('01722'), [])
+
+    def test_mobile_is_unique_per_business(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_customer('CRT-000004', '01711111111')
+        other = CompanyProfile.objects.create(business_name='Other Cold Storage', address='Rangpur')
+        self.create_customer('CRT-000001', '01711111111', business=other)
+        self.create_customer('CRT-000005', '')
+        self.create_customer('CRT-000006', '')
+        self.assertEqual(find_customer(self.business.pk, '01711111111').customer_code, 'CRT-000001')
+
+
+class DocumentSeriesTests(TestCase):
+    """Document numbers come from per business counters (masterdata.numbering)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.other = CompanyProfile.objects.create(business_name='Other Cold Storage', address='Rangpur')
+
+    def setUp(self):
+        reset_blocks()
+
+    def counter(self, series='CUSTOMER', business=None):
+        return DocumentCounter.objects.get(business_id=business or self.business, xseries=series, xyear=0).xlast
+
+    def test_counters_are_per_business(self):
+        self.assertEqual(CUSTOMER_SERIES.reserve(self.business.pk, 2), ['CRT-000001', 'CRT-000002'])
+        self.assertEqual(CUSTOMER_SERIES.next(self.other.pk), 'CRT-000001')
+        self.assertEqual(CUSTOMER_SERIES.next(self.business.pk), 'CRT-000003')
+
+    def test_yearly_series_restart_each_year(self):
+        series = DocumentSeries('TESTYEAR', 'T{yy}-', 5, model='masterdata.CustomerProfile', field='customer_code')
+        self.assertEqual(series.next(self.business.pk, today=datetime.date(2025, 12, 31)), 'T25-00001')
+        self.assertEqual(series.next(self.business.pk, today=datetime.date(2026, 1, 1)), 'T26-00001')
+        self.assertEqual(series.next(self.business.pk, today=datetime.date(2025, 12, 31)), 'T25-00002')
+
+    def test_new_counter_starts_after_existing_codes(self):
+        CustomerProfile.objects.bulk_create([
+            CustomerProfile(business_id=self.business, customer_code='CRT-000041', customer_name='Karim'),
+            CustomerProfile(business_id=self.business, customer_code='CUS-000007', customer_name='Rahim'),
+        ])
+        self.assertEqual(CUSTOMER_SERIES.next(self.business.pk), 'CRT-000042')
+        # Customers created while issuing certificates keep their own CUS- numbering
+        self.assertEqual(CertificateService.generate_customer_code(self.business.pk), 'CUS-000008')
+
+    @override_settings(DOCUMENT_NUMBERING={'BLOCK_SIZE': 10})
+    def test_block_is_served_from_memory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(CUSTOMER_SERIES.next(self.business.pk), 'CRT-000001')
+        with self.assertNumQueries(0):
+            self.assertEqual(CUSTOMER_SERIES.reserve(self.business.pk, 3), ['CRT-000002', 'CRT-000003', 'CRT-000004'])
+        self.assertEqual(self.counter(), 10)
+
+    @override_settings(DOCUMENT_NUMBERING={'BLOCK_SIZE': 10})
+    def test_block_of_a_rolled_back_transaction_is_not_reused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                CUSTOMER_SERIES.next(self.business.pk)
+                raise RuntimeError("customer create failed")
+        self.assertFalse(DocumentCounter.objects.filter(business_id=self.business).exists())
+
+        # The database hands the numbers out again, so memory must not serve them a second time
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(CUSTOMER_SERIES.next(self.business.pk), 'CRT-000001')
+        self.assertEqual(CUSTOMER_SERIES.next(self.business.pk), 'CRT-000002')
+        self.assertEqual(self.counter(), 10)
+
+    @skipUnless(connection.vendor == 'postgresql', "SEQUENCE numbering needs PostgreSQL")
+    @override_settings(DOCUMENT_NUMBERING={'BACKEND': 'sequence', 'BLOCK_SIZE': 1})
+    def test_sequence_backend(self):
+        CustomerProfile.objects.create(business_id=self.business, customer_code='CRT-000041', customer_name='Karim')
+        self.assertEqual(CUSTOMER_SERIES.reserve(self.business.pk, 2), ['CRT-000042', 'CRT-000043'])
+        self.assertEqual(CUSTOMER_SERIES.next(self.other.pk), 'CRT-000001')
+        self.assertFalse(DocumentCounter.objects.exists())
+
+    @override_settings(DOCUMENT_NUMBERING={'BACKEND': 'sequence'})
+    def test_sequence_backend_falls_back_to_the_counter_elsewhere(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest("PostgreSQL uses the sequence")
+        self.assertEqual(CUSTOMER_SERIES.next(self.business.pk), 'CRT-000001')
+        self.assertEqual(self.counter(), 1)
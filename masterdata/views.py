@@ -1,12 +1,15 @@
 import datetime
+import io
 
 from django.shortcuts import render
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, generics
+from rest_framework.exceptions import NotFound
 from masterdata.models import CommonCodes, CompanyProfile, GeoLocation, RateSetup
 from masterdata.serializers import CommonCodesSerializer, DivisionSerializer, CustomerProfileCreateSerializer, \
     CustomerProfileResponseSerializer, GeoLocationSerializer, CustomerProfileUpdateSerializer
 from utils.customlist import CustomListAPIView
+from utils.pagination import KeysetPagination
 from utils.response import APIResponse
 # views.py
 from rest_framework.views import APIView
@@ -14,6 +17,10 @@ from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 from .models import CustomerProfile, CompanyProfile
+from masterdata.company_cache import get_request_company
+from masterdata.customer_import import CustomerImport
+from masterdata.geo import get_geo_tree
+from masterdata.search import search_customers
 
 
 
@@ -30,7 +37,7 @@ class CommonCodesAdd(APIView):
                 instance = serializer.save(
                     created_by=request.user,
                     # Add business_id if your model has it
-                    business_id=CompanyProfile.objects.get(pk=request.user.business_id)
+                    business_id=get_request_company(request)
                 )
                 return APIResponse.created(
                     data=serializer.data,
@@ -60,31 +67,28 @@ class DivisionListView(APIView):
     """Get all divisions for a business"""
     def get(self, request, format=None):
         try:
-            # Get distinct divisions for the business
-            divisions = GeoLocation.objects.filter(
-                business_id=request.user.business_id
-            ).values(
-                'division_name', 'division_bn'
-            ).distinct().order_by('division_name')
+            # Get distinct divisions for the business from the cached hierarchy
+            tree = get_geo_tree(request.user.business_id)
+            if tree.not_modified(request):
+                return tree.not_modified_response()
 
-            if not divisions.exists():
-                return APIResponse.success(
+            if not tree.divisions:
+                return tree.tag(APIResponse.success(
                     data=[],
                     message="No divisions found",
                     meta={'count': 0}
-                )
+                ))
 
-            # Convert to list for serialization
-            divisions_list = list(divisions)
+            divisions_list = tree.divisions
 
-            return APIResponse.success(
+            return tree.tag(APIResponse.success(
                 data=divisions_list,
                 message="Divisions retrieved successfully",
                 meta={
                     'count': len(divisions_list),
                     'level': 'division'
                 }
-            )
+            ))
 
         except Exception as e:
             return APIResponse.error(
@@ -100,33 +104,54 @@ class GeoLocationAll(generics.ListAPIView):
     filterset_fields = ['division_name',]
 
 
+class GeoTreeView(APIView):
+    """
+    The business's whole geo hierarchy as one nested document:
+    divisions → districts → upazilas → unions, each node {name, bn, <children>}.
+
+    The body is rendered and compressed once per tree version; clients send
+    If-None-Match (or If-Modified-Since) and get 304 until the hierarchy changes.
+    """
+
+    def get(self, request, format=None):
+        try:
+            tree = get_geo_tree(request.user.business_id)
+            if tree.not_modified(request):
+                return tree.not_modified_response()
+            return tree.tree_response(request)
+
+        except Exception as e:
+            return APIResponse.error(
+                message="Failed to retrieve geo hierarchy",
+                status_code=500
+            )
+
+
 class DistrictListView(APIView):
     """Get all districts for a given division"""
 
     def get(self, request, format=None):
         try:
-            # Get districts for specific division
-            districts = GeoLocation.objects.filter(
-                business_id=request.user.business_id
-            ).values(
-                'district_name', 'district_bn'
-            ).distinct().order_by('district_name')
+            # Get districts from the cached hierarchy
+            tree = get_geo_tree(request.user.business_id)
+            if tree.not_modified(request):
+                return tree.not_modified_response()
+
+            districts_list = tree.districts
 
-            if not districts.exists():
+            if not districts_list:
                 return APIResponse.not_found(
                     f"No districts found"
                 )
 
-            districts_list = list(districts)
-
-            return APIResponse.success(
+            return tree.tag(APIResponse.success(
                 data=districts_list,
                 message=f"Districts retrieved successfully for",
                 meta={
                     'count': len(districts_list),
                     'level': 'district'
                 }
-            )
+            ))
 
         except Exception as e:
             return APIResponse.error(
@@ -140,23 +165,19 @@ class UpazilaListView(APIView):
 
     def get(self, request, district_name, format=None):
         try:
-            # Get upazilas for specific division and district
-            upazilas = GeoLocation.objects.filter(
-                business_id=request.user.business_id,
-                district_name=district_name
-            ).values(
-                'district_name', 'district_bn',
-                'upazila_name', 'upazila_bn'
-            ).distinct().order_by('upazila_name')
+            # Get upazilas for specific district from the cached hierarchy
+            tree = get_geo_tree(request.user.business_id)
+            if tree.not_modified(request):
+                return tree.not_modified_response()
+
+            upazilas_list = tree.upazilas.get(district_name, [])
 
-            if not upazilas.exists():
+            if not upazilas_list:
                 return APIResponse.not_found(
                     f"No upazilas found for {district_name}"
                 )
 
-            upazilas_list = list(upazilas)
-
-            return APIResponse.success(
+            return tree.tag(APIResponse.success(
                 data=upazilas_list,
                 message=f"Upazilas retrieved successfully for {district_name}",
                 meta={
@@ -164,7 +185,7 @@ class UpazilaListView(APIView):
                     'level': 'upazila',
                     'parent_district': district_name
                 }
-            )
+            ))
 
         except Exception as e:
             return APIResponse.error(
@@ -176,24 +197,19 @@ class UpazilaListView(APIView):
 class UnionListView(APIView):
     def get(self, request,district_name, upazila_name, format=None):
         try:
-            # Get unions for specific division, district, and upazila
-            unions = GeoLocation.objects.filter(
-                business_id=request.user.business_id,
-                district_name=district_name,
-                upazila_name=upazila_name
-            ).values(
-                'division_name', 'division_bn', 'district_name', 'district_bn',
-                'upazila_name', 'upazila_bn', 'union_name', 'union_bn'
-            ).distinct().order_by('union_name')
+            # Get unions for specific district and upazila from the cached hierarchy
+            tree = get_geo_tree(request.user.business_id)
+            if tree.not_modified(request):
+                return tree.not_modified_response()
+
+            unions_list = tree.unions.get((district_name, upazila_name), [])
 
-            if not unions.exists():
+            if not unions_list:
                 return APIResponse.not_found(
                     f"No unions found for {upazila_name}, {district_name}"
                 )
 
-            unions_list = list(unions)
-
-            return APIResponse.success(
+            return tree.tag(APIResponse.success(
                 data=unions_list,
                 message=f"Unions retrieved successfully for {upazila_name}, {district_name}",
                 meta={
@@ -202,7 +218,7 @@ class UnionListView(APIView):
                     'parent_district': district_name,
                     'parent_upazila': upazila_name
                 }
-            )
+            ))
 
         except Exception as e:
             return APIResponse.error(
@@ -221,7 +237,7 @@ class CustomerProfileCreate(APIView):
             with transaction.atomic():
                 # Validate user's business
                 try:
-                    business = CompanyProfile.objects.get(pk=request.user.business_id)
+                    business = get_request_company(request)
                 except CompanyProfile.DoesNotExist:
                     return APIResponse.error(
                         message="Business profile not found",
@@ -266,6 +282,38 @@ class CustomerProfileCreate(APIView):
             )
 
 
+class CustomerProfileImport(APIView):
+    """
+    POST a CSV of customers as multipart ``file`` (header row with the
+    customer create fields; customer_name and xmobile are required).
+    ``?dry_run=true`` validates without saving. Valid rows are created,
+    invalid and duplicate rows are reported with their line numbers.
+    """
+
+    def post(self, request, format=None):
+        # 1️⃣ Validate user's business and the upload
+        try:
+            business = get_request_company(request)
+        except CompanyProfile.DoesNotExist:
+            return APIResponse.error(message="Business profile not found", status_code=404)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return APIResponse.validation_error(errors={'file': ["A CSV file is required"]},
+                                                message="Customer import failed")
+
+        # 2️⃣ Stream the rows through the importer
+        dry_run = request.GET.get('dry_run', 'false').lower() == 'true'
+        importer = CustomerImport(business.pk, user=request.user, dry_run=dry_run)
+        summary = importer.run(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+
+        # 3️⃣ Summary with per-row errors; an unreadable file stops the import where it became unreadable
+        message = "Customer import validated" if dry_run else f"{summary['created']} customers imported"
+        if not summary['complete']:
+            message += "; the file could not be read to the end"
+        return APIResponse.success(data=summary, message=message)
+
+
 class CustomerProfileUpdate(APIView):
     """
     PUT/PATCH API for updating customer profile
@@ -295,7 +343,7 @@ class CustomerProfileUpdate(APIView):
             with transaction.atomic():
                 # Validate user's business
                 try:
-                    business = CompanyProfile.objects.get(pk=request.user.business_id)
+                    business = get_request_company(request)
                 except CompanyProfile.DoesNotExist:
                     return APIResponse.error(
                         message="Business profile not found",
@@ -349,6 +397,9 @@ class CustomerProfileList(APIView):
     """
     GET: List customers with filtering and search
     """
+    keyset_ordering = ('business_id_id', '-created_at', '-customer_code')
+    page_size = 20
+    max_page_size = 100
 
     def get(self, request, format=None):
         """Get customers with filtering and pagination"""
@@ -378,47 +429,29 @@ class CustomerProfileList(APIView):
             if include_inactive:
                 queryset = CustomerProfile.objects.filter(business_id=request.user.business_id)
 
-            # Search functionality
+            # Search functionality (indexed, see masterdata/search.py)
             search = request.GET.get('search')
             if search:
-                from django.db.models import Q
-                queryset = queryset.filter(
-                    Q(customer_name__icontains=search) |
-                    Q(customer_code__icontains=search) |
-                    Q(xmobile__icontains=search) |
-                    Q(contact_person__icontains=search) |
-                    Q(xemail__icontains=search)
-                )
-
-            # Pagination
-            from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
-            page = request.GET.get('page', 1)
-            per_page = min(int(request.GET.get('per_page', 20)), 100)
+                queryset = search_customers(queryset, request.user.business_id, search)
 
-            paginator = Paginator(queryset.order_by('-created_at'), per_page)
-
-            try:
-                customers = paginator.page(page)
-            except PageNotAnInteger:
-                customers = paginator.page(1)
-            except EmptyPage:
-                customers = paginator.page(paginator.num_pages)
+            # Keyset pagination: newest first, ?cursor= from meta.pagination.next
+            paginator = KeysetPagination()
+            paginator.page_size_query_param = 'per_page'
+            customers = paginator.paginate_queryset(queryset, request, view=self)
 
             # Serialize data
             serializer = CustomerProfileResponseSerializer(customers, many=True)
 
-            return APIResponse.success(
+            return APIResponse.fast_success(
                 data=serializer.data,
                 message="Customers retrieved successfully",
                 meta={
                     'pagination': {
-                        'current_page': customers.number,
-                        'total_pages': paginator.num_pages,
-                        'per_page': per_page,
-                        'total_count': paginator.count,
-                        'has_next': customers.has_next(),
-                        'has_previous': customers.has_previous(),
+                        'per_page': paginator.page_size,
+                        'count': paginator.count,
+                        'count_type': paginator.count_type,
+                        'has_next': paginator.has_next,
+                        'next': paginator.get_next_link(),
                     },
                     'filters_applied': {
                         'customer_type': customer_type,
@@ -431,6 +464,9 @@ class CustomerProfileList(APIView):
                 }
             )
 
+        except NotFound as e:
+            return APIResponse.error(message=str(e.detail))
+
         except Exception as e:
             return APIResponse.error(
                 message="Failed to retrieve customers",
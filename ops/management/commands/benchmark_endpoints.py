@@ -0,0 +1,180 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import StockBalance
+from masterdata.models import CompanyProfile, CustomerProfile
+from ops.models import Certificate, CertificateDetails, TokenNumber
+from ops.season import FLOORS, ITEM, POCKETS, UNITS, create_missing_tables
+from ops.services import TokenService
+from user.models import CustomUser
+from user.serializers import LoginSerializer
+
+SCENARIOS = ['token_generate', 'booking_create', 'certificate_create', 'certificate_post', 'current_stock',
+             'challan_create']
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentile(values, share):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the key endpoints through the full middleware/auth stack against the configured database "
+        "(seed it first with seed_season) and report p50/p95/p99 latency and queries per request. "
+        "Everything is rolled back unless --keep is given. Fails when a scenario had errors or nothing to run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, required=True, help="business_id to run as")
+        parser.add_argument('--requests', type=int, default=200, help="requests per scenario")
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help="run only this scenario (repeatable)")
+        parser.add_argument('--seed', type=int, default=0, help="random seed")
+        parser.add_argument('--keep', action='store_true', help="commit what the requests wrote")
+
+    def handle(self, *args, **options):
+        business_id = options['business']
+        if not CompanyProfile.objects.filter(pk=business_id).exists():
+            raise CommandError(f"Business {business_id} does not exist")
+        for table in create_missing_tables():
+            self.stdout.write(f"Created missing table {table}")
+        self.user = CustomUser.objects.filter(business_id=business_id).order_by('id').first()
+        if self.user is None:
+            raise CommandError(f"Business {business_id} has no users")
+        self.business_id = business_id
+        self.count = options['requests']
+        self.random = random.Random(options['seed'])
+
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')),
+                    'localhost')
+        access = LoginSerializer.get_token(self.user).access_token
+        self.client = Client(HTTP_HOST=host, HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        results = {}
+        try:
+            with transaction.atomic():
+                for scenario in options['scenario'] or SCENARIOS:
+                    results[scenario] = getattr(self, f"_{scenario}")()
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'scenario':<20}{'n':>6}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                          f"{'queries':>10}")
+        for scenario, (timings, queries, errors) in results.items():
+            timings.sort()
+            self.stdout.write(
+                f"{scenario:<20}{len(timings):>6}{errors:>8}{_percentile(timings, .50):>10.1f}"
+                f"{_percentile(timings, .95):>10.1f}{_percentile(timings, .99):>10.1f}"
+                f"{(sum(queries) / len(queries) if queries else 0):>10.1f}"
+            )
+        self.stdout.write(f"{connection.vendor}: {self.count} requests per scenario"
+                          + ("" if options['keep'] else " (rolled back)"))
+
+        # A scenario without requests (e.g. certificate_post after every certificate_create failed) is a failure too
+        failed = [scenario for scenario, (timings, queries, errors) in results.items() if errors or not timings]
+        if failed:
+            raise CommandError(f"Scenarios with failed requests or nothing to run: {', '.join(failed)}")
+
+    def _run(self, requests):
+        """Time each (method, path, payload) and count its queries; returns (ms list, query counts, errors)"""
+        timings, queries, errors = [], [], 0
+        for method, path, payload in requests:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                if method == 'get':
+                    response = self.client.get(path, payload)
+                else:
+                    response = self.client.post(path, payload, content_type='application/json')
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            if response.status_code >= 300:
+                errors += 1
+                if errors == 1:
+                    self.stderr.write(f"{path}: {response.status_code} {response.content[:300]!r}")
+        return timings, queries, errors
+
+    def _counted_tokens(self, count):
+        """Issue ``count`` tokens and mark them counted, outside the timed requests"""
+        tokens = [token.token_no for token in TokenService.issue_tokens(self.business_id, self.user, count)['tokens']]
+        TokenNumber.objects.filter(business_id=self.business_id, token_no__in=tokens).update(
+            xstatus='Counted', xsack=50)
+        return tokens
+
+    def _mobiles(self):
+        mobiles = list(CustomerProfile.objects.filter(business_id=self.business_id)
+                       .values_list('xmobile', flat=True)[:1000])
+        return mobiles or ['01711111111']
+
+    def _token_generate(self):
+        return self._run(('post', '/api/ops/token/generate/', {'number_of_tokens': 1}) for _ in range(self.count))
+
+    def _booking_create(self):
+        mobiles = self._mobiles()
+        return self._run(
+            ('post', '/api/ops/bookings/create/',
+             {'xmobile': self.random.choice(mobiles), 'xname': 'Benchmark Farmer', 'xsack': 50})
+            for _ in range(self.count)
+        )
+
+    def _certificate_create(self):
+        mobiles = self._mobiles()
+        self.certified = self._counted_tokens(self.count)
+        return self._run(
+            ('post', '/api/ops/certificates/create/',
+             {'token_no': token_no, 'xmobile': self.random.choice(mobiles), 'customer_name': 'Benchmark Farmer',
+              'number_of_sacks': 50, 'number_of_empty_sacks': 0, 'rent_per_sack': '300'})
+            for token_no in self.certified
+        )
+
+    def _certificate_post(self):
+        tokens = getattr(self, 'certified', None)
+        if tokens is None:
+            self._certificate_create()
+            tokens = self.certified
+        tokens = list(Certificate.objects.filter(business_id=self.business_id, token_no__in=tokens)
+                      .values_list('token_no', flat=True))
+        CertificateDetails.objects.bulk_create([
+            CertificateDetails(business_id_id=self.business_id, token_no=token_no, xitem=ITEM,
+                               xunit=self.random.choice(UNITS), xfloor=self.random.choice(FLOORS),
+                               xpocket=self.random.choice(POCKETS), number_of_sacks=50, created_by=self.user)
+            for token_no in tokens
+        ])
+        return self._run(('post', f"/api/inventory/certificate-post/{token_no}/", {}) for token_no in tokens)
+
+    def _stocked(self):
+        return list(StockBalance.objects.filter(business_id=self.business_id, number_of_sacks__gt=0)
+                    .values_list('token_no', 'xunit', 'xfloor', 'xpocket', 'number_of_sacks')[:self.count * 5])
+
+    def _current_stock(self):
+        tokens = [row[0] for row in self._stocked()] or ['-']
+        return self._run(('get', '/api/inventory/current-stock/', {'token_no': self.random.choice(tokens)})
+                         for _ in range(self.count))
+
+    def _challan_create(self):
+        requests, seen = [], set()
+        for token_no, xunit, xfloor, xpocket, sacks in self._stocked():
+            if token_no in seen:
+                continue
+            seen.add(token_no)
+            requests.append(('post', '/api/ops/delivery-challan/create/',
+                             {'token_no': token_no,
+                              'delivery_items': [{'quantity': '1', 'xunit': xunit, 'xfloor': xfloor,
+                                                  'xpocket': xpocket}]}))
+            if len(requests) == self.count:
+                break
+        return self._run(requests)
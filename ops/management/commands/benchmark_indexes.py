@@ -0,0 +1,181 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from inventory import models as inventory_models
+from inventory.models import Imtrn
+from inventory.services import POSTABLE_STATUSES
+from masterdata.models import CommonCodes, CompanyProfile
+from ops import models as ops_models
+from ops.models import Booking, Certificate, TokenNumber
+
+# Managed indexes from the hot-path suite, as (model, Meta.indexes name)
+MANAGED_INDEXES = [
+    (TokenNumber, 'token_number_pending_idx'),
+    (TokenNumber, 'token_number_counted_idx'),
+    (Booking, 'booking_pending_idx'),
+    (Booking, 'booking_mobile_status_idx'),
+    (CommonCodes, 'commoncodes_active_type_idx'),
+]
+UNMANAGED_INDEXES = ops_models.UNMANAGED_INDEXES + inventory_models.UNMANAGED_INDEXES
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _status(i):
+    # Roughly the end-of-season mix: most documents have moved past the queues
+    return 'Pending' if i % 10 == 0 else 'Counted' if i % 10 == 1 else 'Posted'
+
+
+def _mobile(i):
+    return f"017{i:08d}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway business, then print EXPLAIN plans and timings for the hot-path queries "
+        "with the index suite dropped and recreated. Everything runs in one transaction that is "
+        "rolled back; DROP INDEX locks the tables meanwhile, so run it against a staging database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=20000, help="tokens/bookings/certificates to seed")
+        parser.add_argument('--repeat', type=int, default=5, help="timed runs per query (best is reported)")
+        parser.add_argument('--analyze', action='store_true', help="EXPLAIN ANALYZE on PostgreSQL")
+
+    def handle(self, *args, **options):
+        self.options = options
+        try:
+            with transaction.atomic():
+                business = self._seed(options['tokens'])
+                queries = self._queries(business, options['tokens'])
+                self._drop_indexes()
+                before = self._measure(queries)
+                self._create_indexes()
+                after = self._measure(queries)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for label, _ in queries:
+            plan_before, ms_before = before[label]
+            plan_after, ms_after = after[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{label}: {ms_before:.2f} ms -> {ms_after:.2f} ms"
+            ))
+            self.stdout.write("  without suite:\n    " + plan_before.replace("\n", "\n    "))
+            self.stdout.write("  with suite:\n    " + plan_after.replace("\n", "\n    "))
+        self.stdout.write(f"{connection.vendor}: {options['tokens']} tokens seeded (rolled back)")
+
+    def _tables(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.table_names(cursor))
+
+    def _seed(self, count):
+        business = CompanyProfile.objects.create(business_name='Index benchmark', address='-')
+        tables = self._tables()
+        years = (25, 26)
+        tokens = [f"{years[i % 2]}-{i:05d}" for i in range(count)]
+
+        TokenNumber.objects.bulk_create(
+            [TokenNumber(business_id=business, token_no=token, xsack=10, xstatus=_status(i))
+             for i, token in enumerate(tokens)], batch_size=2000)
+        Booking.objects.bulk_create(
+            [Booking(business_id=business, booking_no=f"B{token}", xmobile=_mobile(i % (count // 3 + 1)),
+                     xname='Farmer', xstatus=_status(i))
+             for i, token in enumerate(tokens)], batch_size=2000)
+        CommonCodes.objects.bulk_create(
+            [CommonCodes(business_id=business, xtype=xtype, xcode=f"{xtype}-{i}", zactive=i % 4 == 0)
+             for xtype in ('ZONE', 'BANK', 'POTATO', 'DEPARTMENT') for i in range(count // 20)],
+            batch_size=2000)
+
+        if Certificate._meta.db_table in tables:
+            statuses = ('Open', 'Ready', 'Loaded') + ('Posted',) * 7
+            Certificate.objects.bulk_create(
+                [Certificate(business_id=business, token_no=token, customer_name='Farmer',
+                             xmobile=_mobile(i % (count // 3 + 1)), number_of_sacks=10,
+                             number_of_empty_sacks=0, posted_by=0, xstatus=statuses[i % 10])
+                 for i, token in enumerate(tokens)], batch_size=2000)
+        if Imtrn._meta.db_table in tables:
+            rows = (Imtrn(business_id=business, xdocnum=token, token_no=token, xdocrow=row, xsign=1,
+                          xdoctype='ADRE', xitem='01-01-001-0001', xunit=f"U{row}", xfloor=str(i % 5 + 1),
+                          xpocket=f"P{i % 40}", xqty=random.randint(1, 20))
+                    for i, token in enumerate(tokens) for row in range(1, 4))
+            Imtrn.objects.bulk_create(rows, batch_size=2000)
+        return business
+
+    def _queries(self, business, count):
+        tables = self._tables()
+        mobile = _mobile(count // 7)
+        token = f"26-{(count // 2) | 1:05d}"
+        queries = [
+            ('Pending tokens', TokenNumber.objects.filter(business_id=business, xstatus='Pending')
+             .order_by('business_id_id', 'token_no')[:100]),
+            ('Counted tokens', TokenNumber.objects.filter(business_id=business, xstatus='Counted')
+             .order_by('business_id_id', 'token_no')[:100]),
+            ('Pending bookings', Booking.objects.filter(business_id=business, xstatus='Pending')
+             .order_by('business_id_id', '-booking_no')[:100]),
+            ('Bookings by mobile', Booking.objects.filter(business_id=business, xmobile=mobile, xstatus='Pending')),
+            ('Active common codes', CommonCodes.objects.filter(business_id=business, zactive=True, xtype='ZONE')),
+        ]
+        if Certificate._meta.db_table in tables:
+            queries += [
+                ('Postable certificates', Certificate.objects.filter(business_id=business,
+                                                                     xstatus__in=POSTABLE_STATUSES)
+                 .order_by('token_no')[:200]),
+                ('Certificates by mobile', Certificate.objects.filter(business_id=business, xmobile=mobile)),
+            ]
+        if Imtrn._meta.db_table in tables:
+            queries.append(
+                ('Imtrn at a location', Imtrn.objects.filter(business_id=business, token_no=token,
+                                                             xunit='U1', xfloor='2', xpocket='P10'))
+            )
+        return queries
+
+    def _execute(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def _analyze(self):
+        tables = self._tables()
+        for table in {model._meta.db_table for model, _ in MANAGED_INDEXES} | {i.table for i in UNMANAGED_INDEXES}:
+            if table in tables:
+                self._execute(f"ANALYZE {connection.ops.quote_name(table)}")
+
+    def _drop_indexes(self):
+        for model, name in MANAGED_INDEXES:
+            self._execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(name)}")
+        tables = self._tables()
+        for index in UNMANAGED_INDEXES:
+            if index.table in tables:
+                self._execute(index.drop_sql(connection))
+        self._analyze()
+
+    def _create_indexes(self):
+        editor = connection.schema_editor()
+        for model, name in MANAGED_INDEXES:
+            index = next(index for index in model._meta.indexes if index.name == name)
+            self._execute(str(index.create_sql(model, editor)))
+        tables = self._tables()
+        for index in UNMANAGED_INDEXES:
+            if index.table in tables:
+                self._execute(index.create_sql(connection))
+        self._analyze()
+
+    def _measure(self, queries):
+        explain = {'analyze': True} if self.options['analyze'] and connection.vendor == 'postgresql' else {}
+        results = {}
+        for label, queryset in queries:
+            plan = queryset.explain(**explain)
+            best = None
+            for _ in range(max(self.options['repeat'], 1)):
+                started = time.perf_counter()
+                list(queryset.all())
+                elapsed = (time.perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = (plan, best)
+        return results
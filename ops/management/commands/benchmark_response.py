@@ -0,0 +1,78 @@
+import datetime
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from utils import response as response_module
+from utils.response import APIResponse
+
+
+def _rows(count):
+    """Rows shaped like the stock/certificate lists: strings, ints, Decimals and datetimes"""
+    now = timezone.now()
+    return [
+        {
+            'token_no': f"26-{number:05d}",
+            'customer_code': f"CRT-{number % 5000:06d}",
+            'customer_name': 'Abdul Karim Mia',
+            'xmobile': f"017{number:08d}",
+            'xitem': '01-01-001-0001',
+            'xunit': f"U{number % 4 + 1}",
+            'xfloor': str(number % 5 + 1),
+            'xpocket': f"P{number % 40 + 1:02d}",
+            'number_of_sacks': number % 400,
+            'rent_per_sack': Decimal('300.00'),
+            'total_rent': Decimal(number % 400) * Decimal('300.00'),
+            'create_date': now.date(),
+            'created_at': now - datetime.timedelta(minutes=number),
+        }
+        for number in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare APIResponse.success (DRF rendering) with APIResponse.fast_success on large lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="rows in the list")
+        parser.add_argument('--repeat', type=int, default=20, help="timed runs per path (best is reported)")
+
+    def _drf(self, rows):
+        response = APIResponse.success(data=rows, message="Data retrieved successfully", meta={'count': len(rows)})
+        response.accepted_renderer = JSONRenderer()
+        response.accepted_media_type = 'application/json'
+        response.renderer_context = {}
+        return response.render().content
+
+    def _fast(self, rows):
+        return APIResponse.fast_success(data=rows, message="Data retrieved successfully",
+                                        meta={'count': len(rows)}).content
+
+    def _stdlib(self, rows):
+        orjson, response_module.orjson = response_module.orjson, None
+        try:
+            return self._fast(rows)
+        finally:
+            response_module.orjson = orjson
+
+    def handle(self, *args, **options):
+        rows = _rows(options['rows'])
+        paths = [('DRF Response + JSONRenderer', self._drf), ('fast_success (stdlib json)', self._stdlib)]
+        if response_module.orjson is not None:
+            paths.append(('fast_success (orjson)', self._fast))
+
+        reference = json.loads(self._drf(rows))
+        for label, render in paths:
+            content = render(rows)
+            best = None
+            for _ in range(max(options['repeat'], 1)):
+                started = time.perf_counter()
+                render(rows)
+                elapsed = (time.perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            same = "identical" if json.loads(content) == reference else "DIFFERS from DRF output"
+            self.stdout.write(f"{label:<30} {best:8.1f} ms  {len(content):>9} bytes  {same}")
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import StockBalance
+from inventory.serializers import CurrentStockSerializer
+from masterdata.models import CompanyProfile
+from ops.models import Booking, Certificate, TokenNumber
+from ops.serializers import BookingSerializer, CertificateSerializer, TokenSerializer
+from utils.response import dumps
+from utils.values_serializer import ValuesSerializer
+
+LISTS = {
+    'tokens': (TokenNumber, TokenSerializer, '-token_no'),
+    'bookings': (Booking, BookingSerializer, '-booking_no'),
+    'certificates': (Certificate, CertificateSerializer, '-token_no'),
+    'current_stock': (StockBalance, CurrentStockSerializer, 'token_no'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ModelSerializer(many=True) with the values()-based ValuesSerializer on the list serializers "
+        "(query + serialization, best of --repeat) against the configured database; seed it first with seed_season"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, required=True, help="business_id whose rows are listed")
+        parser.add_argument('--rows', type=int, default=20000, help="rows per list")
+        parser.add_argument('--repeat', type=int, default=5, help="timed runs per path (best is reported)")
+        parser.add_argument('--list', action='append', choices=list(LISTS), help="only this list (repeatable)")
+
+    def handle(self, *args, **options):
+        business_id = options['business']
+        if not CompanyProfile.objects.filter(pk=business_id).exists():
+            raise CommandError(f"Business {business_id} does not exist")
+
+        self.stdout.write(f"{'list':<16}{'rows':>8}{'model ms':>11}{'values ms':>11}{'speedup':>9}  output")
+        for name in options['list'] or LISTS:
+            model, serializer_class, ordering = LISTS[name]
+            queryset = model.objects.filter(business_id=business_id).order_by(ordering)[:options['rows']]
+            values_serializer = ValuesSerializer.for_serializer(serializer_class)
+
+            def model_path():
+                return serializer_class(queryset.all(), many=True).data
+
+            def values_path():
+                return values_serializer.serialize(queryset.all())
+
+            reference, fast = model_path(), values_path()
+            same = "identical" if dumps(reference) == dumps(fast) else "DIFFERS from ModelSerializer"
+            model_ms, values_ms = self._best(model_path, options['repeat']), self._best(values_path, options['repeat'])
+            self.stdout.write(f"{name:<16}{len(reference):>8}{model_ms:>11.1f}{values_ms:>11.1f}"
+                              f"{model_ms / values_ms if values_ms else 0:>8.1f}x  {same}")
+
+    @staticmethod
+    def _best(path, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            path()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
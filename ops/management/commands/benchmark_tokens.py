@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from masterdata.models import CompanyProfile
+from ops.services import TokenService
+from user.models import CustomUser
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time bulk token issuing (TokenService.issue_tokens) against the configured database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, required=True, help="business_id to issue tokens for")
+        parser.add_argument('--count', type=int, default=10000, help="number of tokens to issue")
+        parser.add_argument('--keep', action='store_true', help="commit the tokens instead of rolling back")
+
+    def handle(self, *args, **options):
+        business_id = options['business']
+        count = options['count']
+        if not CompanyProfile.objects.filter(pk=business_id).exists():
+            raise CommandError(f"Business {business_id} does not exist")
+        user = CustomUser.objects.filter(business_id=business_id).first()
+
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    issued = TokenService.issue_tokens(business_id, user, count)
+                    elapsed = time.perf_counter() - started
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(
+            f"{connection.vendor}: issued {issued['count']} tokens "
+            f"({issued['first']} .. {issued['last']}) in {elapsed * 1000:.1f} ms "
+            f"with {len(queries)} queries"
+            + ("" if options['keep'] else " (rolled back)")
+        )
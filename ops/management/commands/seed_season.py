@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ops.season import SeasonSeeder, create_missing_tables
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic cold-storage season (customers, tokens, bookings, certificates with details, "
+        "transfers, challans and the imtrn ledger) into new businesses of the configured database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=1, help="cold stores to create")
+        parser.add_argument('--customers', type=int, default=100000, help="customers, split over the businesses")
+        parser.add_argument('--tokens', type=int, default=500000, help="tokens, split over the businesses")
+        parser.add_argument('--details', type=int, default=3, help="most pockets per certificate")
+        parser.add_argument('--transfer-rate', type=float, default=0.1, help="share of posted tokens transferred")
+        parser.add_argument('--delivery-rate', type=float, default=0.4, help="share of posted tokens delivered")
+        parser.add_argument('--year', type=int, help="season year (default: this year)")
+        parser.add_argument('--seed', type=int, default=0, help="random seed")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="tokens written per transaction")
+
+    def handle(self, *args, **options):
+        for table in create_missing_tables():
+            self.stdout.write(f"Created missing table {table}")
+        seeder = SeasonSeeder(
+            businesses=options['businesses'], customers=options['customers'], tokens=options['tokens'],
+            details=options['details'], transfer_rate=options['transfer_rate'],
+            delivery_rate=options['delivery_rate'], year=options['year'], seed=options['seed'],
+            chunk_size=options['chunk_size'], log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        started = time.perf_counter()
+        counts = seeder.run()
+        elapsed = time.perf_counter() - started
+
+        for table, count in counts.items():
+            self.stdout.write(f"  {table:<14} {count:>10}")
+        self.stdout.write(self.style.SUCCESS(f"{connection.vendor}: season seeded in {elapsed:.1f} s"))
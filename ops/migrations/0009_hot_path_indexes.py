@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+from utils.db_indexes import UnmanagedIndex, create_indexes, drop_indexes
+
+# Frozen copy of the ops.models.UNMANAGED_INDEXES entries this migration adds
+INDEXES = [
+    UnmanagedIndex('certificate_business_status_idx', 'certificate', ['business_id_id', 'xstatus', 'token_no']),
+    UnmanagedIndex('certificate_business_mobile_idx', 'certificate', ['business_id_id', 'xmobile']),
+]
+
+
+def create_unmanaged_indexes(apps, schema_editor):
+    create_indexes(schema_editor, INDEXES)
+
+
+def drop_unmanaged_indexes(apps, schema_editor):
+    drop_indexes(schema_editor, INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops', '0008_certificate_booking_xstatus'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('xstatus', 'Pending')), fields=['business_id', 'booking_no'], name='booking_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['business_id', 'xmobile', 'xstatus'], name='booking_mobile_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokennumber',
+            index=models.Index(condition=models.Q(('xstatus', 'Pending')), fields=['business_id', 'token_no'], name='token_number_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokennumber',
+            index=models.Index(condition=models.Q(('xstatus', 'Counted')), fields=['business_id', 'token_no'], name='token_number_counted_idx'),
+        ),
+        migrations.RunPython(create_unmanaged_indexes, drop_unmanaged_indexes),
+    ]
@@ -1,52 +1,34 @@
-import datetime
 from math import trunc
 
 from django.core.validators import RegexValidator
-from django.db import models, transaction
+from django.db import models
 
 from masterdata.models import AuditModel, CompanyProfile, CustomerProfile
+from masterdata.numbering import DocumentSeries
+from utils.db_indexes import UnmanagedIndex
 
-import datetime
+BOOKING_SERIES = DocumentSeries('BOOKING', 'B{yy}-', 5, model='ops.Booking', field='booking_no')
+TOKEN_SERIES = DocumentSeries('TOKEN', '{yy}-', 5, model='ops.TokenNumber', field='token_no')
+CHALLAN_SERIES = DocumentSeries('CHALLAN', 'CL-{yy}-', 6, model='ops.Opchallan', field='xchlnum')
 
-def booking_no():
-    # Get current year and extract the last two digits (e.g., 2025 → "25")
-    year_suffix = datetime.date.today().strftime('%y')
-    prefix = f'B{year_suffix}-'
-
-    # Get last booking_no with that prefix
-    last_booking = Booking.objects.filter(booking_no__startswith=prefix).order_by('booking_no').last()
+# Indexes on the unmanaged tables below, created by migration 0009_hot_path_indexes
+UNMANAGED_INDEXES = [
+    # Certificate lists and batch posting filter on xstatus within a business
+    UnmanagedIndex('certificate_business_status_idx', 'certificate', ['business_id_id', 'xstatus', 'token_no']),
+    UnmanagedIndex('certificate_business_mobile_idx', 'certificate', ['business_id_id', 'xmobile']),
+]
 
-    # Default serial number
-    next_serial = 1
 
-    if last_booking:
-        # Extract last 5-digit serial part and increment
-        try:
-            last_serial = int(last_booking.booking_no.split('-')[1])
-            next_serial = last_serial + 1
-        except (IndexError, ValueError):
-            pass  # Just fall back to default if something goes wrong
+def booking_no():
+    # Kept as the field default for migration history; the number is allocated
+    # from BOOKING_SERIES in Booking.save() once business_id is known
+    return ''
 
-    booking_number = f"{prefix}{next_serial:05d}"
-    return booking_number
 
 def token_no():
-    # GET Current Date
-    today = datetime.date.today()
-    # Format the date like (20-11 YY-MM)
-    today_string = today.strftime('%y%m')
-    # For the very first time invoice_number is YY-MM-DD-001
-    next_invoice_number = '000001'
-    # Get Last Invoice Number of Current Year, Month and Day (20-11-28 YY-MM-DD)
-    last_invoice = Booking.objects.filter(booking_no__startswith=today_string).order_by('booking_no').last()
-
-    if last_invoice:
-        # Cut 4 digit from the left and converted to int (2011:xxx)
-        last_invoice_number = int(last_invoice.booking_no[4:])
-        # Increment one with last six digit
-        next_invoice_number = '{0:06d}'.format(last_invoice_number + 1)
-    # Return custom invoice number
-    return today_string + next_invoice_number
+    # Referenced by migration 0001 only; tokens are numbered from TOKEN_SERIES
+    return ''
+
 
 class Booking(AuditModel):
     pk = models.CompositePrimaryKey('business_id', 'booking_no')
@@ -79,10 +61,21 @@ class Booking(AuditModel):
         db_table = 'booking'
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
+        indexes = [
+            # BookingList: pending bookings only, newest first
+            models.Index(fields=['business_id', 'booking_no'], condition=models.Q(xstatus='Pending'),
+                         name='booking_pending_idx'),
+            models.Index(fields=['business_id', 'xmobile', 'xstatus'], name='booking_mobile_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.booking_no}"
 
+    def save(self, *args, **kwargs):
+        if not self.booking_no:
+            self.booking_no = BOOKING_SERIES.next(self.business_id_id)
+        super().save(*args, **kwargs)
+
 
 class TokenNumber(AuditModel):
     pk = models.CompositePrimaryKey('business_id', 'token_no')
@@ -95,6 +88,19 @@ class TokenNumber(AuditModel):
         db_table = 'token_number'
         verbose_name = 'Token Number'
         verbose_name_plural = 'Token Numbers'
+        indexes = [
+            # PendingToken / CountedToken queues; most tokens move on to Posted, so
+            # the partial indexes stay small
+            models.Index(fields=['business_id', 'token_no'], condition=models.Q(xstatus='Pending'),
+                         name='token_number_pending_idx'),
+            models.Index(fields=['business_id', 'token_no'], condition=models.Q(xstatus='Counted'),
+                         name='token_number_counted_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.token_no:
+            self.token_no = TOKEN_SERIES.next(self.business_id_id)
+        super().save(*args, **kwargs)
 
 
 class Certificate(models.Model):
@@ -136,7 +142,7 @@ class Certificate(models.Model):
     updated_at = models.DateTimeField(blank=True, null=True)
     xstatus = models.CharField(max_length=50,default='Open')
 
-    posted_by = models.IntegerField()
+    posted_by = models.IntegerField(blank=True, null=True)
     posted_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
@@ -174,29 +180,9 @@ class CertificateDetails(models.Model):
 class Opchallan(models.Model):
     @staticmethod
     def generate_delivery_number():
-        """Generate unique transfer order number with format TO-YY-XXXXXX"""
-        with transaction.atomic():
-            year_str = datetime.date.today().strftime('%y')
-            prefix = f"CL-{year_str}-"
-
-            # Use select_for_update to prevent race conditions
-            last_entry = (Opchallan.objects
-                          .filter(xchlnum__startswith=prefix)
-                          .select_for_update()
-                          .order_by('-xchlnum')
-                          .first())
-
-            if last_entry:
-                try:
-                    last_code = int(last_entry.xchlnum.split('-')[-1])
-                    next_number = f"{last_code + 1:06d}"
-                except (ValueError, IndexError):
-                    # Fallback if parsing fails
-                    next_number = "000001"
-            else:
-                next_number = "000001"
-
-            return prefix + next_number
+        """Field default kept for migration history; save() allocates from CHALLAN_SERIES"""
+        return ''
+
     pk = models.CompositePrimaryKey('business_id_id', 'xchlnum', 'token_no')
     business_id = models.ForeignKey('masterdata.CompanyProfile', models.DO_NOTHING)
     xchlnum = models.CharField(max_length=100, default=generate_delivery_number)
@@ -240,6 +226,11 @@ class Opchallan(models.Model):
     def __str__(self):
         return str(self.xchlnum)
 
+    def save(self, *args, **kwargs):
+        if not self.xchlnum:
+            self.xchlnum = CHALLAN_SERIES.next(self.business_id_id)
+        super().save(*args, **kwargs)
+
 
 class Opchalland(models.Model):
     pk = models.CompositePrimaryKey('business_id_id', 'xchlnum', 'token_no', 'xrow')
@@ -0,0 +1,297 @@
+"""
+Synthetic cold-storage season for load testing (see the seed_season command).
+
+A season runs roughly like this for every business:
+
+* farmers (customers) book space and get tokens at the gate in Feb-Mar,
+* counted tokens become certificates whose sacks are spread over a few
+  pockets (certificate_details) and posted to the imtrn ledger,
+* some sacks are moved between pockets over the summer (imtor + imtrn),
+* from August the farmers take their potatoes out on delivery challans.
+
+Rows are written with bulk_create in chunks of tokens so memory stays flat,
+document numbers are reserved from the normal numbering series, and
+stock_balance is rebuilt from imtrn at the end. The legacy tables Django does
+not manage are created from their models first when the database lacks them
+(``create_missing_tables``), so a freshly migrated SQLite database works.
+"""
+import datetime
+import random
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventory import models as inventory_models
+from inventory.models import Imtor, Imtrn, TRANSFER_SERIES
+from inventory.services import rebuild_stock_balance
+from masterdata.models import CompanyProfile, CustomerProfile, GeoLocation, CUSTOMER_SERIES
+from masterdata.search import index_customers
+from ops import models as ops_models
+from ops.models import (Booking, Certificate, CertificateDetails, Opchallan, Opchalland, TokenNumber,
+                        BOOKING_SERIES, CHALLAN_SERIES, TOKEN_SERIES)
+from user.models import CustomUser
+
+ITEM = '01-01-001-0001'
+UNITS = ['U1', 'U2', 'U3', 'U4']
+FLOORS = ['1', '2', '3', '4', '5']
+POCKETS = [f"P{number:02d}" for number in range(1, 41)]
+
+FIRST_NAMES = ['Abdul', 'Rahim', 'Karim', 'Jamal', 'Kamal', 'Rafiq', 'Shafiq', 'Habib', 'Nazrul', 'Mizanur',
+               'Anwar', 'Harun', 'Selim', 'Faruk', 'Jahangir', 'Monir', 'Alamgir', 'Shahidul', 'Rezaul', 'Babul']
+LAST_NAMES = ['Hossain', 'Rahman', 'Islam', 'Uddin', 'Ahmed', 'Mia', 'Sarkar', 'Sheikh', 'Mondal', 'Khan']
+GEO = [
+    ('Rajshahi', 'রাজশাহী', 'Bogura', 'বগুড়া', 'Shibganj', 'শিবগঞ্জ', 'Mokamtala', 'মোকামতলা'),
+    ('Rajshahi', 'রাজশাহী', 'Bogura', 'বগুড়া', 'Sherpur', 'শেরপুর', 'Khamarkandi', 'খামারকান্দি'),
+    ('Rajshahi', 'রাজশাহী', 'Joypurhat', 'জয়পুরহাট', 'Kalai', 'কালাই', 'Puranapail', 'পুরানাপৈল'),
+    ('Rangpur', 'রংপুর', 'Rangpur', 'রংপুর', 'Pirganj', 'পীরগঞ্জ', 'Chatra', 'চতরা'),
+    ('Rangpur', 'রংপুর', 'Thakurgaon', 'ঠাকুরগাঁও', 'Pirganj', 'পীরগঞ্জ', 'Bhomradaha', 'ভোমরাদহ'),
+    ('Dhaka', 'ঢাকা', 'Munshiganj', 'মুন্সিগঞ্জ', 'Sirajdikhan', 'সিরাজদিখান', 'Latabdi', 'লতাব্দী'),
+]
+
+# Share of tokens that never got past the gate, and of certificates still unposted
+PENDING_RATE = 0.03
+COUNTED_RATE = 0.03
+UNPOSTED_RATE = 0.05
+
+
+def _period(date):
+    return (date.month + 6) % 12 or 12
+
+
+def create_missing_tables():
+    """
+    Create the unmanaged tables (certificate, imtrn, opchallan, ...) the
+    database lacks, with their UNMANAGED_INDEXES, from the model definitions.
+    Existing tables are left alone; ``stock`` is the legacy stock view that
+    stock_balance replaced and is skipped. Returns the tables created.
+    """
+    existing = set(connection.introspection.table_names())
+    missing = [model for model in apps.get_models()
+               if not model._meta.managed and model._meta.db_table not in existing | {'stock'}]
+    if not missing:
+        return []
+    created = {model._meta.db_table for model in missing}
+    with connection.schema_editor() as editor:
+        for model in missing:
+            editor.create_model(model)
+        for index in ops_models.UNMANAGED_INDEXES + inventory_models.UNMANAGED_INDEXES:
+            if index.table in created:
+                editor.execute(index.create_sql(connection))
+    return sorted(created)
+
+
+class SeasonSeeder:
+    """
+    Seed ``businesses`` cold stores sharing ``customers`` farmers and ``tokens`` tokens between them.
+
+    ``details`` is the most pockets one certificate is spread over;
+    ``transfer_rate`` and ``delivery_rate`` are the shares of posted tokens
+    that get a transfer order and a delivery challan.
+    """
+
+    def __init__(self, businesses=1, customers=100000, tokens=500000, details=3, transfer_rate=0.1,
+                 delivery_rate=0.4, year=None, seed=0, chunk_size=5000, log=None):
+        self.businesses = businesses
+        self.customers = customers
+        self.tokens = tokens
+        self.details = details
+        self.transfer_rate = transfer_rate
+        self.delivery_rate = delivery_rate
+        self.year = year or datetime.date.today().year
+        self.random = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.counts = dict.fromkeys(
+            ['businesses', 'customers', 'tokens', 'bookings', 'certificates', 'details', 'transfers',
+             'challans', 'imtrn', 'stock_balance'], 0)
+
+    def _day(self, first, last):
+        """A random aware datetime between the two (month, day) pairs of the season year"""
+        start = datetime.date(self.year, *first)
+        days = (datetime.date(self.year, *last) - start).days
+        day = start + datetime.timedelta(days=self.random.randint(0, days))
+        moment = datetime.datetime.combine(day, datetime.time(self.random.randint(8, 17), self.random.randint(0, 59)))
+        return timezone.make_aware(moment)
+
+    def _share(self, total, index):
+        return total // self.businesses + (1 if index < total % self.businesses else 0)
+
+    def run(self):
+        """Seed every business; returns row counts per table"""
+        for index in range(self.businesses):
+            business = CompanyProfile.objects.create(
+                business_name=f"Season Cold Storage {index + 1}", short_name=f"SCS{index + 1}", address='Bogura'
+            )
+            user = CustomUser.objects.create_user(
+                username=f"season_{business.pk}", password=None, business_id=business.pk, user_role='Admin'
+            )
+            self.counts['businesses'] += 1
+            self.log(f"business {business.pk}: seeding")
+            self._geo(business)
+            farmers = self._customers(business, user, self._share(self.customers, index))
+            self._tokens(business, user, farmers, self._share(self.tokens, index))
+            self.counts['stock_balance'] += rebuild_stock_balance(business.pk)
+        return self.counts
+
+    def _geo(self, business):
+        GeoLocation.objects.bulk_create(
+            [GeoLocation(business_id=business, division_name=row[0], division_bn=row[1], district_name=row[2],
+                         district_bn=row[3], upazila_name=row[4], upazila_bn=row[5], union_name=row[6],
+                         union_bn=row[7]) for row in GEO],
+            ignore_conflicts=True
+        )
+
+    def _customers(self, business, user, count):
+        """Create ``count`` farmers; returns [(customer_code, name, mobile, geo)]"""
+        farmers = []
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            codes = CUSTOMER_SERIES.reserve(business.pk, size)
+            rows = []
+            for offset, code in enumerate(codes):
+                number = start + offset
+                name = f"{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}"
+                mobile = f"01{3 + number % 7}{business.pk % 100:02d}{number:06d}"
+                geo = self.random.choice(GEO)
+                farmers.append((code, name, mobile, geo))
+                rows.append(CustomerProfile(
+                    business_id=business, customer_code=code, customer_name=name, xmobile=mobile,
+                    father_name=f"{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}",
+                    division_name=geo[0], district_name=geo[2], upazila_name=geo[4], union_name=geo[6],
+                    village=f"Village {number % 300}", created_by=user, updated_by=user,
+                ))
+            CustomerProfile.objects.bulk_create(rows, batch_size=2000)
+            index_customers(rows, replace=False)
+            self.counts['customers'] += len(rows)
+        return farmers
+
+    def _tokens(self, business, user, farmers, count):
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            with transaction.atomic():
+                self._token_chunk(business, user, farmers, size)
+            self.log(f"business {business.pk}: {start + size}/{count} tokens")
+
+    def _token_chunk(self, business, user, farmers, size):
+        received = datetime.date(self.year, 3, 1)
+        token_nos = TOKEN_SERIES.reserve(business.pk, size, today=received)
+        booking_nos = BOOKING_SERIES.reserve(business.pk, size, today=received)
+        tokens, bookings, certificates, details, ledger = [], [], [], [], []
+        locations = {}
+
+        for token_no, booking_no in zip(token_nos, booking_nos):
+            code, name, mobile, geo = self.random.choice(farmers)
+            sacks = self.random.randint(20, 400)
+            roll = self.random.random()
+            status = 'Pending' if roll < PENDING_RATE else 'Counted' if roll < PENDING_RATE + COUNTED_RATE else 'Completed'
+            tokens.append(TokenNumber(business_id=business, token_no=token_no, xsack=sacks if status != 'Pending' else 0,
+                                      xstatus=status, created_by=user, updated_by=user))
+            bookings.append(Booking(business_id=business, booking_no=booking_no, customer_code=code, xmobile=mobile,
+                                    xname=name, division_name=geo[0], district_name=geo[2], upazila_name=geo[4],
+                                    union_name=geo[6], xsack=sacks, xadvance=sacks * 20,
+                                    created_by=user, updated_by=user))
+            if status != 'Completed':
+                continue
+
+            created = self._day((2, 15), (3, 31))
+            posted = self.random.random() >= UNPOSTED_RATE
+            certificates.append(Certificate(
+                business_id=business, token_no=token_no, booking_no=booking_no, customer_code=code,
+                customer_name=name, xmobile=mobile, division_name=geo[0], district_name=geo[2],
+                upazila_name=geo[4], union_name=geo[6], number_of_sacks=sacks, number_of_empty_sacks=0,
+                rent_per_sack=300, total_rent=sacks * 300, created_by=user, updated_by=user,
+                created_at=created, updated_at=created, xstatus='Posted' if posted else 'Open',
+                posted_by=user.pk if posted else None, posted_at=created if posted else None,
+            ))
+
+            pockets = self.random.randint(1, self.details)
+            split = sorted(self.random.sample(range(1, sacks), pockets - 1)) if pockets > 1 else []
+            spots = {}
+            for quantity in (b - a for a, b in zip([0] + split, split + [sacks])):
+                spot = (self.random.choice(UNITS), self.random.choice(FLOORS), self.random.choice(POCKETS))
+                spots[spot] = spots.get(spot, 0) + quantity
+            for row, (spot, quantity) in enumerate(spots.items(), start=1):
+                details.append(CertificateDetails(
+                    business_id=business, token_no=token_no, xitem=ITEM, xunit=spot[0], xfloor=spot[1],
+                    xpocket=spot[2], number_of_sacks=quantity, rent_per_sack=300, total_rent=quantity * 300,
+                    created_by=user, updated_by=user, created_at=created, updated_at=created,
+                ))
+                if posted:
+                    locations.setdefault(token_no, {})[spot] = quantity
+                    ledger.append(self._imtrn(business, user, token_no, token_no, row, 1, 'ADRE', 'Receipt',
+                                              spot, quantity, created))
+
+        TokenNumber.objects.bulk_create(tokens, batch_size=2000)
+        Booking.objects.bulk_create(bookings, batch_size=2000)
+        Certificate.objects.bulk_create(certificates, batch_size=2000)
+        CertificateDetails.objects.bulk_create(details, batch_size=2000)
+        self.counts['tokens'] += len(tokens)
+        self.counts['bookings'] += len(bookings)
+        self.counts['certificates'] += len(certificates)
+        self.counts['details'] += len(details)
+
+        ledger += self._transfers(business, user, locations)
+        ledger += self._deliveries(business, user, locations)
+        Imtrn.objects.bulk_create(ledger, batch_size=2000)
+        self.counts['imtrn'] += len(ledger)
+
+    def _imtrn(self, business, user, docnum, token_no, row, sign, doctype, action, spot, quantity, moment):
+        return Imtrn(
+            business_id=business, xdocnum=docnum, token_no=token_no, xdocrow=row, xsign=sign,
+            xdoctype=doctype, xaction=action, xitem=ITEM, xunit=spot[0], xfloor=spot[1], xpocket=spot[2],
+            xqty=quantity, xval=0, xdate=moment, xyear=moment.year, xper=_period(moment), xtime=moment,
+            created_by=user, created_at=moment, updated_at=moment,
+        )
+
+    def _transfers(self, business, user, locations):
+        moving = [token for token in locations if self.random.random() < self.transfer_rate]
+        if not moving:
+            return []
+        numbers = TRANSFER_SERIES.reserve(business.pk, len(moving), today=datetime.date(self.year, 6, 1))
+        orders, ledger = [], []
+        for ximtor, token_no in zip(numbers, moving):
+            source, available = self.random.choice(list(locations[token_no].items()))
+            target = (self.random.choice(UNITS), self.random.choice(FLOORS), self.random.choice(POCKETS))
+            if target in locations[token_no]:
+                continue
+            quantity = self.random.randint(1, available)
+            moment = self._day((5, 1), (7, 31))
+            orders.append(Imtor(business_id=business, ximtor=ximtor, token_no=token_no, xtype='TO',
+                                xfunit=source[0], xffloor=source[1], xfpocket=source[2],
+                                xtunit=target[0], xtfloor=target[1], xtpocket=target[2],
+                                number_of_sacks=quantity, xstatus='In Progress', created_by=user, updated_by=user))
+            ledger.append(self._imtrn(business, user, ximtor, token_no, 1, -1, 'TO', 'Transfer Out',
+                                      source, quantity, moment))
+            ledger.append(self._imtrn(business, user, ximtor, token_no, 2, 1, 'TO', 'Transfer In',
+                                      target, quantity, moment))
+            locations[token_no][source] -= quantity
+            locations[token_no][target] = quantity
+        Imtor.objects.bulk_create(orders, batch_size=2000)
+        self.counts['transfers'] += len(orders)
+        return ledger
+
+    def _deliveries(self, business, user, locations):
+        leaving = [token for token in locations if self.random.random() < self.delivery_rate]
+        if not leaving:
+            return []
+        numbers = CHALLAN_SERIES.reserve(business.pk, len(leaving), today=datetime.date(self.year, 9, 1))
+        challans, lines, ledger = [], [], []
+        for xchlnum, token_no in zip(numbers, leaving):
+            moment = self._day((8, 1), (11, 30))
+            challans.append(Opchallan(business_id=business, xchlnum=xchlnum, token_no=token_no, xstatus='Open',
+                                      created_by=user, updated_by=user))
+            stocked = [(spot, quantity) for spot, quantity in locations[token_no].items() if quantity > 0]
+            for row, (spot, quantity) in enumerate(stocked, start=1):
+                # Most farmers empty the pocket; some take part of it now
+                taken = quantity if self.random.random() < 0.7 else self.random.randint(1, quantity)
+                lines.append(Opchalland(business_id=business, xchlnum=xchlnum, token_no=token_no, xrow=row,
+                                        xitem=ITEM, xunit=spot[0], xfloor=spot[1], xpocket=spot[2],
+                                        xqtychl=taken, xrate=300, xlineamt=taken * 300))
+                ledger.append(self._imtrn(business, user, xchlnum, token_no, row, -1, 'CHL', 'Delivery Out',
+                                          spot, taken, moment))
+                locations[token_no][spot] -= taken
+        Opchallan.objects.bulk_create(challans, batch_size=2000)
+        Opchalland.objects.bulk_create(lines, batch_size=2000)
+        self.counts['challans'] += len(challans)
+        return ledger
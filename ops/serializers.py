@@ -1,12 +1,16 @@
+from collections import defaultdict
 from datetime import datetime
 
 from django.core.validators import RegexValidator
 
-from inventory.models import Stock, Imtrn
+from inventory.models import Imtrn, StockBalance
+from inventory.services import StockLedgerService
 from masterdata.models import CustomerProfile, ItemMaster, CompanyProfile
+from masterdata.company_cache import get_company_profile, get_request_company
+from masterdata.mobile_directory import find_customer
 from ops.models import TokenNumber, Booking, Certificate, CertificateDetails, Opchalland, Opchallan
 from rest_framework import serializers
-from django.db import models, transaction
+from django.db import transaction
 from django.utils import timezone
 from .models import CertificateDetails, Certificate
 from decimal import Decimal
@@ -132,10 +136,7 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         mobile_number = validated_data.get('xmobile')
 
         # Try to find existing customer by mobile number
-        existing_customer = CustomerProfile.objects.filter(
-            business_id=business,
-            xmobile=mobile_number
-        ).first()
+        existing_customer = find_customer(business.pk, mobile_number) if mobile_number else None
 
         if existing_customer:
             # Customer exists - use existing customer data and update customer_code in booking
@@ -358,7 +359,7 @@ class CertificateDetailsBulkCreateSerializer(serializers.Serializer):
         # Resolve business_id from user
         from masterdata.models import CompanyProfile
         try:
-            business_profile = CompanyProfile.objects.get(pk=user.business_id)
+            business_profile = get_company_profile(user.business_id)
             business_id = business_profile.business_id
         except CompanyProfile.DoesNotExist:
             raise serializers.ValidationError("User business profile not found")
@@ -391,27 +392,27 @@ class CertificateDetailsBulkCreateSerializer(serializers.Serializer):
         from masterdata.models import CompanyProfile
 
         try:
-            business_profile = CompanyProfile.objects.get(pk=user.business_id)
+            business_profile = get_company_profile(user.business_id)
             business_id = business_profile.business_id
         except CompanyProfile.DoesNotExist:
             raise serializers.ValidationError("User business profile not found")
 
         details = data.get('details', [])
 
-        # Check if any composite keys already exist in DB
-        existing_keys = []
-        for i, detail in enumerate(details):
-            existing = CertificateDetails.objects.filter(
-                business_id=business_id,  # Use business_id string/integer
-                token_no=token_no,
-                xitem=detail.get('xitem'),
-                xunit=detail.get('xunit'),
-                xfloor=detail.get('xfloor'),
-                xpocket=detail.get('xpocket')
-            ).exists()
+        # Load every existing detail of this token once: composite keys and quantities
+        existing_rows = CertificateDetails.objects.filter(
+            business_id=business_id,  # Use business_id string/integer
+            token_no=token_no
+        ).values_list('xitem', 'xunit', 'xfloor', 'xpocket', 'number_of_sacks')
+        existing_details = {row[:4]: row[4] for row in existing_rows}
 
-            if existing:
-                existing_keys.append(i)
+        # Check if any composite keys already exist in DB
+        default_item = CertificateDetails._meta.get_field('xitem').get_default()
+        existing_keys = [
+            i for i, detail in enumerate(details)
+            if (detail.get('xitem', default_item), detail.get('xunit'),
+                detail.get('xfloor'), detail.get('xpocket')) in existing_details
+        ]
 
         if existing_keys:
             raise serializers.ValidationError({
@@ -432,13 +433,8 @@ class CertificateDetailsBulkCreateSerializer(serializers.Serializer):
         print(
             f"DEBUG: Certificate {token_no} found, no_of_sack: {getattr(certificate, 'no_of_sack', 'FIELD_NOT_FOUND')}")
 
-        # Get existing details quantity for this certificate (Alternative approach)
-        existing_details_qty = CertificateDetails.objects.filter(
-            business_id=business_id,  # Use business_id string/integer
-            token_no=token_no
-        ).aggregate(
-            total_existing=models.Sum('number_of_sacks')
-        )['total_existing'] or 0
+        # Existing details quantity for this certificate, from the rows loaded above
+        existing_details_qty = sum(qty or 0 for qty in existing_details.values())
 
         # Calculate new details quantity
         new_details_qty = sum(detail.get('number_of_sacks', 0) for detail in details)
@@ -483,27 +479,28 @@ class CertificateDetailsBulkCreateSerializer(serializers.Serializer):
         current_time = timezone.now()
 
         # Resolve business_id automatically
-        from masterdata.models import CompanyProfile
-        business = CompanyProfile.objects.get(pk=user.business_id)
+        business = get_company_profile(user.business_id)
 
-        with transaction.atomic():
-            for detail_data in details_data:
-                # Auto-fill business_id and token_no
-                detail_data['business_id'] = business
-                detail_data['token_no'] = token_no
-
-                # Auto-calculate total_rent
-                if detail_data.get('number_of_sacks') and detail_data.get('rent_per_sack'):
-                    detail_data['total_rent'] = (
-                            detail_data['number_of_sacks'] * detail_data['rent_per_sack']
-                    )
+        for detail_data in details_data:
+            # Auto-fill business_id and token_no
+            detail_data['business_id'] = business
+            detail_data['token_no'] = token_no
+
+            # Auto-calculate total_rent
+            if detail_data.get('number_of_sacks') and detail_data.get('rent_per_sack'):
+                detail_data['total_rent'] = (
+                        detail_data['number_of_sacks'] * detail_data['rent_per_sack']
+                )
 
-                # Audit fields
-                detail_data['created_by'] = user
-                detail_data['created_at'] = current_time
+            # Audit fields
+            detail_data['created_by'] = user
+            detail_data['created_at'] = current_time
 
-                detail = CertificateDetails.objects.create(**detail_data)
-                created_details.append(detail)
+            created_details.append(CertificateDetails(**detail_data))
+
+        # Insert the whole batch with one bulk_create
+        with transaction.atomic():
+            CertificateDetails.objects.bulk_create(created_details)
 
         return created_details
 
@@ -620,6 +617,14 @@ class OpchallandSerializer(serializers.ModelSerializer):
 #         return data
 
 
+class ChallanListSerializer(serializers.ModelSerializer):
+    """Read-only delivery challan header, for lists and exports"""
+
+    class Meta:
+        model = Opchallan
+        exclude = ['pk']
+
+
 class OpchallanSerializer(serializers.ModelSerializer):
     delivery_items = OpchallandSerializer(many=True, write_only=True)
 
@@ -632,12 +637,9 @@ class OpchallanSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['xchlnum', 'created_by', 'business_id']
 
-    def _create_stock_out_entries(self, delivery_item, challan, business, user):
-        """Create stock transaction entries for delivery"""
-        current_datetime = datetime.now()
-
-        # Stock OUT entry (from source location) - Negative quantity
-        out_entry = Imtrn(
+    def _stock_out_entry(self, delivery_item, challan, business, user, current_datetime):
+        """Stock OUT imtrn row (from source location) for one delivery line"""
+        return Imtrn(
             business_id=business,
             xunit=delivery_item.xunit,
             xfloor=delivery_item.xfloor,
@@ -659,7 +661,6 @@ class OpchallanSerializer(serializers.ModelSerializer):
             created_at=current_datetime,
             updated_at=current_datetime,
         )
-        out_entry.save()
 
     def _calculate_period(self, date):
         """Calculate period based on your business logic"""
@@ -672,7 +673,7 @@ class OpchallanSerializer(serializers.ModelSerializer):
 
         # Get business profile
         try:
-            business = CompanyProfile.objects.get(pk=request.user.business_id)
+            business = get_request_company(request)
             self.context['business'] = business
         except CompanyProfile.DoesNotExist:
             raise serializers.ValidationError("Business profile not found")
@@ -693,28 +694,31 @@ class OpchallanSerializer(serializers.ModelSerializer):
                 'token_no': 'Certificate not found for the given token number'
             })
 
-        # Validate stock for each delivery item
-        delivery_items_data = data.get('delivery_items', [])
-        for item_data in delivery_items_data:
+        # Load every stock balance of this token once, per (unit, floor, pocket)
+        available = defaultdict(int)
+        balances = StockBalance.objects.filter(
+            business_id=business,
+            token_no=token_no
+        ).values_list('xunit', 'xfloor', 'xpocket', 'number_of_sacks')
+        for xunit, xfloor, xpocket, number_of_sacks in balances:
+            available[(xunit, xfloor, xpocket)] += number_of_sacks or 0
+
+        # Validate stock for all delivery items in memory; repeated locations add up
+        requested = defaultdict(Decimal)
+        for item_data in data.get('delivery_items', []):
             xunit = item_data.get('xunit')
             xfloor = item_data.get('xfloor')
             xpocket = item_data.get('xpocket')
-            xqtychl = Decimal(str(item_data.get('xqtychl', '0.0')))
 
             if xunit and xfloor and xpocket:
-                stock_obj = Stock.objects.filter(
-                    token_no=token_no,
-                    xunit=xunit,
-                    xfloor=xfloor,
-                    xpocket=xpocket
-                ).first()
-
-                current_stock = stock_obj.number_of_sacks if stock_obj and stock_obj.number_of_sacks is not None else 0
+                location = (xunit, xfloor, xpocket)
+                requested[location] += Decimal(str(item_data.get('xqtychl', '0.0')))
+                current_stock = available[location]
 
-                if current_stock < xqtychl:
+                if current_stock < requested[location]:
                     raise serializers.ValidationError({
                         'delivery_items': f'Insufficient stock for unit {xunit}, floor {xfloor}, pocket {xpocket}. '
-                                          f'Available: {current_stock}, Requested: {xqtychl}'
+                                          f'Available: {current_stock}, Requested: {requested[location]}'
                     })
 
         return data
@@ -739,12 +743,13 @@ class OpchallanSerializer(serializers.ModelSerializer):
 
             # Calculate item amounts and total
             item_total_amount = Decimal('0.0')
+            delivery_items = []
             for index, item_data in enumerate(delivery_items_data, start=1):
                 xqtychl = Decimal(str(item_data.get('xqtychl', '0.0')))
                 item_amount = xqtychl * xrate
                 item_total_amount += item_amount
 
-                delivery_item = Opchalland.objects.create(
+                delivery_items.append(Opchalland(
                     xrow=index,
                     business_id=business,
                     xchlnum=opchallan.xchlnum,
@@ -755,10 +760,16 @@ class OpchallanSerializer(serializers.ModelSerializer):
                     created_by=opchallan.created_by,
                     xitem="01-01-001-0001",
                     **item_data
-                )
+                ))
 
-                # Create stock out entry
-                self._create_stock_out_entries(delivery_item, opchallan, business, request.user)
+            # Write all lines, then all stock out entries, with one bulk insert each
+            Opchalland.objects.bulk_create(delivery_items)
+            current_datetime = datetime.now()
+            StockLedgerService.post([
+                self._stock_out_entry(delivery_item, opchallan, business, request.user, current_datetime)
+                for delivery_item in delivery_items
+            ])
+            opchallan._delivery_items = delivery_items
 
             # Get all additional amounts
             xchgtot = Decimal(str(request.data.get('xchgtot', '0.0')))
@@ -781,12 +792,14 @@ class OpchallanSerializer(serializers.ModelSerializer):
         """Include delivery items in response"""
         data = super().to_representation(instance)
 
-        # Add delivery items to response
-        delivery_items = Opchalland.objects.filter(
-            business_id=instance.business_id,
-            xchlnum=instance.xchlnum,
-            token_no=instance.token_no
-        )
+        # Add delivery items to response; reuse the lines create() just wrote
+        delivery_items = getattr(instance, '_delivery_items', None)
+        if delivery_items is None:
+            delivery_items = Opchalland.objects.filter(
+                business_id=instance.business_id,
+                xchlnum=instance.xchlnum,
+                token_no=instance.token_no
+            )
         data['delivery_items'] = OpchallandSerializer(delivery_items, many=True).data
         data['xchlnum'] = instance.xchlnum  # Include auto-generated number
 
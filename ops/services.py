@@ -2,6 +2,7 @@ from django.db import transaction
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from masterdata.mobile_directory import find_customer
 from masterdata.models import CustomerProfile, CompanyProfile
 from ops.models import TokenNumber, Certificate
 
@@ -178,12 +179,71 @@ from ops.models import TokenNumber, Certificate
 #         }
 
 
-from django.db import transaction
+import copy
+
+from django.db import connection, transaction
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
-from masterdata.models import CustomerProfile, CompanyProfile
-from ops.models import TokenNumber, Certificate
+from masterdata.models import CustomerProfile, CompanyProfile, CERTIFICATE_CUSTOMER_SERIES
+from masterdata.company_cache import get_company_profile
+from ops.models import TokenNumber, Certificate, TOKEN_SERIES
+
+
+class TokenService:
+
+    @staticmethod
+    @transaction.atomic
+    def issue_tokens(business_id, user, count, batch_size=2000):
+        """
+        Issue ``count`` pending tokens for a business.
+
+        The token numbers are reserved as one range from TOKEN_SERIES. Every
+        column except token_no is identical across the batch, so the row values
+        are prepared once and the rows are written with executemany instead of
+        one ORM insert per token.
+        """
+        token_numbers = TOKEN_SERIES.reserve(business_id, count)
+
+        template = TokenNumber(
+            business_id_id=business_id,
+            token_no='',
+            created_by=user,
+            updated_by=user,
+            xstatus='Pending'
+        )
+        fields = [field for field in TokenNumber._meta.concrete_fields if field.column]
+        values = [field.get_db_prep_save(field.pre_save(template, add=True), connection) for field in fields]
+        token_index = [field.name for field in fields].index('token_no')
+
+        sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+            connection.ops.quote_name(TokenNumber._meta.db_table),
+            ", ".join(connection.ops.quote_name(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+        rows = []
+        for token_str in token_numbers:
+            values[token_index] = token_str
+            rows.append(tuple(values))
+
+        with connection.cursor() as cursor:
+            for offset in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[offset:offset + batch_size])
+
+        template._state.adding = False
+        template._state.db = connection.alias
+        tokens = []
+        for token_str in token_numbers:
+            token = copy.copy(template)
+            token.token_no = token_str
+            tokens.append(token)
+
+        return {
+            'tokens': tokens,
+            'first': token_numbers[0] if token_numbers else None,
+            'last': token_numbers[-1] if token_numbers else None,
+            'count': len(tokens),
+        }
 
 
 class CertificateService:
@@ -203,24 +263,8 @@ class CertificateService:
 
     @staticmethod
     def generate_customer_code(business_id):
-        """Generate next customer code for business"""
-        # Get the last customer code for this business
-        last_customer = CustomerProfile.objects.filter(
-            business_id=business_id
-        ).order_by('-customer_code').first()
-
-        if last_customer and last_customer.customer_code:
-            # Extract number from last code (assuming format like CUS-000001)
-            try:
-                last_number = int(last_customer.customer_code.split('-')[-1])
-                next_number = last_number + 1
-            except (ValueError, IndexError):
-                next_number = 1
-        else:
-            next_number = 1
-
-        # Format as CUS-000001
-        return f"CUS-{next_number:06d}"
+        """Generate next customer code for business (CUS-000001, separate from the CRT- codes of customer entry)"""
+        return CERTIFICATE_CUSTOMER_SERIES.next(business_id)
 
     @staticmethod
     def get_or_create_customer(business, xmobile, customer_data):
@@ -228,12 +272,9 @@ class CertificateService:
         if not xmobile:
             raise ValidationError("Mobile number (xmobile) is required.")
 
-        try:
-            # Try to get existing customer for this business and mobile
-            customer = CustomerProfile.objects.get(
-                business_id=business,
-                xmobile=xmobile
-            )
+        # Try to get existing customer for this business and mobile
+        customer = find_customer(business.pk, xmobile)
+        if customer is not None:
             # Update customer data if provided and customer is active
             if customer_data and customer.is_active:
                 for key, value in customer_data.items():
@@ -241,20 +282,20 @@ class CertificateService:
                         setattr(customer, key, value)
                 customer.save()
             return customer, False  # False means not created
-        except CustomerProfile.DoesNotExist:
-            # Generate customer code
-            customer_code = CertificateService.generate_customer_code(business.pk)
 
-            # Create new customer with business_id and generated customer_code
-            customer_data_with_code = {
-                'business_id': business,
-                'customer_code': customer_code,
-                'xmobile': xmobile,
-                **customer_data
-            }
+        # Generate customer code
+        customer_code = CertificateService.generate_customer_code(business.pk)
+
+        # Create new customer with business_id and generated customer_code
+        customer_data_with_code = {
+            'business_id': business,
+            'customer_code': customer_code,
+            'xmobile': xmobile,
+            **customer_data
+        }
 
-            customer = CustomerProfile.objects.create(**customer_data_with_code)
-            return customer, True  # True means created
+        customer = CustomerProfile.objects.create(**customer_data_with_code)
+        return customer, True  # True means created
 
     @staticmethod
     def calculate_amounts(token, validated_data):
@@ -288,7 +329,7 @@ class CertificateService:
 
         # Get business from user profile
         try:
-            business = CompanyProfile.objects.get(pk=user.business_id)
+            business = get_company_profile(user.business_id)
         except CompanyProfile.DoesNotExist:
             raise ValidationError("User business profile not found.")
 
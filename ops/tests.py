@@ -1,3 +1,100 @@
+import math
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import Imtrn, StockBalance
+from masterdata.models import CompanyProfile
+from ops.models import Certificate, Opchallan, Opchalland
+from user.models import CustomUser
+from user.serializers import LoginSerializer
+
+# certificate, imtrn, opchallan, ... are unmanaged, so the test database does not get them from migrations
+UNMANAGED_MODELS = [model for model in apps.get_models()
+                    if not model._meta.managed and model._meta.db_table != 'stock']
+
+
+def insert_batches(model, rows):
+    """INSERT statements bulk_create needs for ``rows`` rows on this backend (SQLite caps query parameters)"""
+    fields = [field for field in model._meta.concrete_fields if field.column]
+    return math.ceil(rows / max(connection.ops.bulk_batch_size(fields, [None] * rows), 1))
+
+
+def setUpModule():
+    with connection.schema_editor() as editor:
+        for model in UNMANAGED_MODELS:
+            editor.create_model(model)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        for model in reversed(UNMANAGED_MODELS):
+            editor.delete_model(model)
+
+
+class DeliveryChallanQueryCountTests(TestCase):
+    """DeliveryChallanCreateView validates stock and writes lines in bulk: its query count does not grow with lines"""
+
+    pockets = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=cls.business.pk, user_role='Staff')
+        for token_no in ('25-00001', '25-00002', '25-00003'):
+            Certificate.objects.create(
+                business_id=cls.business, token_no=token_no, customer_code='CRT-000001', customer_name='Karim',
+                xmobile='01711111111', number_of_sacks=cls.pockets * 10, number_of_empty_sacks=0,
+                rent_per_sack=Decimal('300.00'), posted_by=cls.user.pk,
+            )
+            StockBalance.objects.bulk_create([
+                StockBalance(business_id=cls.business, token_no=token_no, xitem='01-01-001-0001', xunit='U1',
+                             xfloor='1', xpocket=f"P{pocket:02d}", number_of_sacks=10)
+                for pocket in range(cls.pockets)
+            ])
+
+    def setUp(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def post_challan(self, token_no, lines):
+        response = self.client.post('/api/ops/delivery-challan/create/', {
+            'token_no': token_no,
+            'delivery_items': [
+                {'quantity': '2', 'xunit': 'U1', 'xfloor': '1', 'xpocket': f"P{pocket:02d}"}
+                for pocket in range(lines)
+            ],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response
+
+    def count_queries(self, token_no, lines):
+        with CaptureQueriesContext(connection) as queries:
+            self.post_challan(token_no, lines)
+        return len(queries.captured_queries)
+
+    def test_query_count_does_not_depend_on_line_count(self):
+        # Warm the per-process caches (user, company, challan counter) first
+        self.post_challan('25-00001', 1)
+
+        # Lines and their stock out rows are each one bulk INSERT, unless the backend has to split it
+        extra_batches = sum(insert_batches(model, self.pockets) - insert_batches(model, 3)
+                            for model in (Opchalland, Imtrn))
+        self.assertEqual(self.count_queries('25-00002', 3) + extra_batches,
+                         self.count_queries('25-00003', self.pockets))
+
+    def test_lines_and_stock_are_written(self):
+        self.post_challan('25-00001', self.pockets)
 
-# Create your tests here.
+        challan = Opchallan.objects.get(business_id=self.business, token_no='25-00001')
+        self.assertEqual(Opchalland.objects.filter(business_id=self.business, xchlnum=challan.xchlnum).count(),
+                         self.pockets)
+        self.assertEqual(
+            list(StockBalance.objects.filter(business_id=self.business, token_no='25-00001')
+                 .values_list('number_of_sacks', flat=True).distinct()),
+            [8]
+        )
@@ -10,14 +10,17 @@ urlpatterns = [
     path('token/sack_input/<str:token_no>/', views.sack_number_input),
     # Search customer by mobile
     path('customers/search/', views.CustomerSearch.as_view(), name='customer_search'),
+    path('customers/mobile-suggest/', views.CustomerMobileSuggest.as_view(), name='customer_mobile_suggest'),
     # Get customer profile by customer code
     path('customers/<str:customer_code>/', views.CustomerProfileDetail.as_view(), name='customer_detail'),
     # Create booking (automatically handles customer)
     path('bookings/create/', views.BookingCreate.as_view(), name='booking_create'),
     path('bookings/list/', views.BookingList.as_view(), name='booking -list'),
+    path('bookings/export/', views.BookingExport.as_view(), name='booking-export'),
     # Certificate API List
     path('certificates/create/', views.CertificateCreateAPIView.as_view(), name='certificate-create'),
     path('certificates/list/', views.CertificateListAPIView.as_view(), name='certificate-list'),
+    path('certificates/export/', views.CertificateExport.as_view(), name='certificate-export'),
     path('certificates/:<str:token_no>/', views.CertificateDetailAPIView.as_view(), name='certificate-detail'),
     path('certificate-details/create/<str:token_no>/', views.BulkCreateCertificateDetailsView.as_view(), name='bulk-create-certificate-details'),
     path('certificates/ready-list/', views.CertificateReadyList.as_view(), name='certificate-ready-list'),
@@ -26,6 +29,7 @@ urlpatterns = [
     path('certificates-details/manage/<str:token_no>/', views.CertificateDetailManage.as_view(), name='certificate-details-manage'),
     # Delivery Related url
     path('delivery-challan/create/', views.DeliveryChallanCreateView.as_view(), name='create_delivery_challan'),
+    path('delivery-challan/export/', views.ChallanExport.as_view(), name='delivery-challan-export'),
 
 ]
 
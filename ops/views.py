@@ -5,22 +5,24 @@ from django.core.validators import RegexValidator
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.utils import timezone
-from inventory.models import Imtrn, Stock
+from inventory.services import CertificatePosting
 from masterdata.serializers import CustomerProfileResponseSerializer
-from ops.models import TokenNumber, Booking, Certificate, CertificateDetails
+from ops.models import TokenNumber, Booking, Certificate, CertificateDetails, Opchallan
 from ops.serializers import TokenSerializer, BookingSerializer, BookingCreateSerializer, CustomerProfileSerializer, \
     CertificateSerializer, CertificateCreateSerializer, CertificateDetailsBulkCreateSerializer, \
-    CertificateDetailsResponseSerializer, CertificateReadyListSerializer, OpchallanSerializer
+    CertificateDetailsResponseSerializer, CertificateReadyListSerializer, OpchallanSerializer, ChallanListSerializer
 from masterdata.models import CompanyProfile, CustomerProfile  # Make sure import is correct
-from ops.services import CertificateService
-from utils.customlist import CustomListAPIView
+from masterdata.company_cache import get_company_profile, get_request_company
+from masterdata.mobile_directory import find_customer, get_directory
+from ops.services import CertificateService, TokenService
+from utils.customlist import CustomExportMixin, CustomListAPIView
+from utils.pagination import KeysetPagination
 from utils.response import APIResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
 from django.db import transaction
 from django.utils import timezone
-from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,35 +37,17 @@ def token_generate(request):
     except (ValueError, TypeError):
         return Response({"detail": "Invalid number_of_tokens."}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Get current year suffix
-    year_suffix = datetime.now().strftime('%y')  # '25' for 2025
+    # Reserve the number range and insert all tokens in one bulk write
+    issued = TokenService.issue_tokens(request.user.business_id, request.user, count)
 
-    # Get last token number for this year
-    last_token = TokenNumber.objects.filter(token_no__startswith=year_suffix).order_by('-token_no').first()
-    if last_token:
-        last_seq = int(last_token.token_no.split('-')[1])
-    else:
-        last_seq = 0
-
-    business = CompanyProfile.objects.get(pk=request.user.business_id)
-
-    new_tokens = []
-    for i in range(count):
-        sequence_number = last_seq + i + 1
-        token_str = f"{year_suffix}-{sequence_number:05d}"
-
-        token = TokenNumber.objects.create(
-            token_no=token_str,
-            created_by=request.user,
-            updated_by=request.user,
-            business_id=business,
-            xstatus='Pending'
-        )
-        new_tokens.append(token)
-
-    serializer = TokenSerializer(new_tokens, many=True)
+    serializer = TokenSerializer(issued['tokens'], many=True)
     return Response({
         "message": f"{count} tokens generated successfully.",
+        "range": {
+            "first": issued['first'],
+            "last": issued['last'],
+            "count": issued['count'],
+        },
         "tokens": serializer.data
     }, status=status.HTTP_201_CREATED)
 
@@ -73,6 +57,9 @@ class PendingToken(CustomListAPIView):
     serializer_class = TokenSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['token_no',]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('business_id_id', 'token_no')
+    values_serialization = True
 
     def get_success_message(self):
         return "Pending tokens retrieved successfully"
@@ -83,6 +70,9 @@ class CountedToken(CustomListAPIView):
     serializer_class = TokenSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['token_no',]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('business_id_id', 'token_no')
+    values_serialization = True
 
     def get_success_message(self):
         return "Counted tokens retrieved successfully"
@@ -152,7 +142,7 @@ class CustomerSearch(APIView):
 
             # Validate user's business
             try:
-                business = CompanyProfile.objects.get(pk=request.user.business_id)
+                business = get_request_company(request)
             except CompanyProfile.DoesNotExist:
                 return APIResponse.error(
                     message="Business profile not found",
@@ -160,25 +150,20 @@ class CustomerSearch(APIView):
                 )
 
             # Search for customer
-            try:
-                customer = CustomerProfile.objects.get(
-                    business_id=business,
-                    xmobile=mobile
-                )
-
-                serializer = CustomerProfileResponseSerializer(customer)
-
-                return APIResponse.success(
-                    data=serializer.data,
-                    message="Customer profile found"
-                )
-
-            except CustomerProfile.DoesNotExist:
+            customer = find_customer(business.pk, mobile)
+            if customer is None:
                 return APIResponse.success(
                     data=None,
                     message="No customer found with this mobile number. You can create a new customer."
                 )
 
+            serializer = CustomerProfileResponseSerializer(customer)
+
+            return APIResponse.success(
+                data=serializer.data,
+                message="Customer profile found"
+            )
+
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -189,6 +174,52 @@ class CustomerSearch(APIView):
             )
 
 
+class CustomerMobileSuggest(APIView):
+    """
+    Type-ahead for the mobile number field: customers whose mobile starts with ?q=
+    """
+    MIN_PREFIX = 3
+    MAX_LIMIT = 50
+
+    def get(self, request, format=None):
+        try:
+            prefix = (request.query_params.get('q') or '').strip()
+            if len(prefix) < self.MIN_PREFIX or not prefix.isdigit():
+                return APIResponse.error(
+                    message=f"Enter at least {self.MIN_PREFIX} digits of the mobile number",
+                    status_code=400
+                )
+
+            try:
+                limit = min(max(int(request.query_params.get('limit', 10)), 1), self.MAX_LIMIT)
+            except ValueError:
+                return APIResponse.error(message="limit must be a number", status_code=400)
+
+            try:
+                business = get_request_company(request)
+            except CompanyProfile.DoesNotExist:
+                return APIResponse.error(
+                    message="Business profile not found",
+                    status_code=404
+                )
+
+            matches = [
+                {'xmobile': mobile, 'customer_code': code, 'customer_name': name}
+                for mobile, code, name in get_directory(business.pk).prefix(prefix, limit)
+            ]
+            return APIResponse.success(
+                data=matches,
+                message=f"{len(matches)} customer(s) found"
+            )
+
+        except Exception as e:
+            logger.error(f"Customer mobile suggest failed: {str(e)}")
+            return APIResponse.error(
+                message="Failed to search customer. Please try again.",
+                status_code=500
+            )
+
+
 class BookingCreate(APIView):
 
     def post(self, request, format=None):
@@ -196,7 +227,7 @@ class BookingCreate(APIView):
             with transaction.atomic():
                 # Validate user's business
                 try:
-                    business = CompanyProfile.objects.get(pk=request.user.business_id)
+                    business = get_request_company(request)
                 except CompanyProfile.DoesNotExist:
                     return APIResponse.error(
                         message="Business profile not found",
@@ -270,11 +301,18 @@ class BookingList(CustomListAPIView):
     serializer_class = BookingSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['booking_no','xstatus','xmobile',]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('business_id_id', '-booking_no')
+    values_serialization = True
 
     def get_success_message(self):
         return "Pending tokens retrieved successfully"
 
 
+class BookingExport(CustomExportMixin, BookingList):
+    export_filename = 'bookings'
+
+
 class CustomerProfileDetail(APIView):
     """
     Get customer profile by customer code
@@ -284,7 +322,7 @@ class CustomerProfileDetail(APIView):
         try:
             # Validate user's business
             try:
-                business = CompanyProfile.objects.get(pk=request.user.business_id)
+                business = get_request_company(request)
             except CompanyProfile.DoesNotExist:
                 return APIResponse.error(
                     message="Business profile not found",
@@ -326,7 +364,7 @@ class CertificateCreateAPIView(APIView):
     def post(self, request):
         # 1️⃣ Get business from user profile
         try:
-            business = CompanyProfile.objects.get(pk=request.user.business_id)
+            business = get_request_company(request)
         except CompanyProfile.DoesNotExist:
             return APIResponse.error(
                 message="User business profile not found",
@@ -396,11 +434,18 @@ class CertificateListAPIView(CustomListAPIView):
     serializer_class = CertificateSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['xmobile','xstatus','token_no',]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('business_id_id', '-token_no')
+    values_serialization = True
 
     def get_success_message(self):
         return "Certificates retrieved successfully"
 
 
+class CertificateExport(CustomExportMixin, CertificateListAPIView):
+    export_filename = 'certificates'
+
+
 class CertificateReadyList(CustomListAPIView):
     queryset = Certificate.objects.all().order_by('-token_no')
     serializer_class = CertificateReadyListSerializer
@@ -427,7 +472,7 @@ class CertificateDetailAPIView(APIView):
     def get_object(self, token_no, user):
         # 1️⃣ Validate user's business
         try:
-            business = CompanyProfile.objects.get(pk=user.business_id)
+            business = get_company_profile(user.business_id)
         except (CompanyProfile.DoesNotExist, AttributeError):
             return None, "User business profile not found"
 
@@ -500,71 +545,19 @@ class BulkCreateCertificateDetailsView(APIView):
 
                     # 2️⃣ Get certificate and business info for imtrn
                     try:
-                        business = CompanyProfile.objects.get(pk=request.user.business_id)
+                        business = get_request_company(request)
                         certificate = Certificate.objects.get(token_no=token_no, business_id=business)
                     except (CompanyProfile.DoesNotExist, Certificate.DoesNotExist) as e:
                         logger.error(f"Failed to get business or certificate: {str(e)}")
                         raise Exception("Business profile or certificate not found")
 
-                    # 3️⃣ Prepare common values for imtrn entries
-                    entry_date = certificate.created_at.date() if certificate.created_at else timezone.now().date()
-                    current_time = timezone.now().time()
-                    xtime = datetime.combine(entry_date, current_time)
-                    current_datetime = timezone.now()
-
-                    # 4️⃣ Create imtrn entries from the created certificate details
-                    imtrn_entries = []
-
-                    for idx, detail in enumerate(created_details, 1):
-                        # Validate detail data before creating imtrn entry
-                        if not detail.xitem:
-                            logger.warning(f"Certificate detail {detail.id} missing xitem, skipping imtrn entry")
-                            continue
-
-                        if not detail.number_of_sacks or detail.number_of_sacks <= 0:
-                            logger.warning(f"Certificate detail {detail.id} has invalid quantity, skipping imtrn entry")
-                            continue
-
-                        # Create Imtrn entry data
-                        imtrn_entry = Imtrn(
-                            business_id=business,
-                            xunit=detail.xunit,
-                            xfloor=detail.xfloor,
-                            xpocket=detail.xpocket,
-                            xitem=detail.xitem,
-                            xwh=getattr(certificate, 'xwh', None),
-                            xdate=current_datetime,
-                            xyear=current_datetime.year,
-                            xper=(current_datetime.month + 6) % 12 or 12,
-                            xqty=detail.number_of_sacks,
-                            xval=detail.total_rent or 0,
-                            xdocnum=token_no,
-                            token_no=token_no,
-                            xdoctype="ADRE",
-                            xaction="Receipt",
-                            xsign=1,
-                            xdocrow=idx,
-                            xtime=xtime,
-                            created_by=request.user,
-                            created_at=current_datetime,
-                            updated_at=current_datetime,
-                        )
-                        imtrn_entries.append(imtrn_entry)
-
-                    # 5️⃣ Bulk create imtrn entries if we have valid entries
-                    created_imtrn_entries = []
-                    if imtrn_entries:
-                        created_imtrn_entries = Imtrn.objects.bulk_create(imtrn_entries)
-                        logger.info(f"Created {len(created_imtrn_entries)} imtrn entries for certificate {token_no}")
-
-                    # 6️⃣ Optionally update certificate status if needed
-                    # Uncomment if you want to mark certificate as "Posted" when details are created
-                    certificate.xstatus = "Posted"
-                    certificate.posted_at = current_datetime
-                    certificate.posted_by = request.user.id
-                    certificate.save()
-
-                # 7️⃣ Prepare response with both certificate details and imtrn info
+                    # 3️⃣ Post the new details to imtrn/stock_balance and mark the certificate Posted
+                    posting = CertificatePosting(business, request.user)
+                    created_imtrn_entries = posting.post([certificate])[token_no]
+                    current_datetime = posting.posted_at
+                    logger.info(f"Created {len(created_imtrn_entries)} imtrn entries for certificate {token_no}")
+
+                # 4️⃣ Prepare response with both certificate details and imtrn info
                 response_serializer = CertificateDetailsResponseSerializer(
                     created_details,
                     many=True
@@ -609,7 +602,7 @@ class CertificateManage(APIView):
     def get_object(self, token_no, user):
         # 1️⃣ Validate user's business
         try:
-            business = CompanyProfile.objects.get(pk=user.business_id)
+            business = get_company_profile(user.business_id)
         except (CompanyProfile.DoesNotExist, AttributeError):
             return None, "User business profile not found"
 
@@ -699,4 +692,12 @@ class DeliveryChallanCreateView(APIView):
             return APIResponse.error(
                 message=f"Failed to create delivery challan: {str(e)}",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class ChallanExport(CustomExportMixin, CustomListAPIView):
+    queryset = Opchallan.objects.all().order_by('-xchlnum')
+    serializer_class = ChallanListSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['xchlnum', 'token_no', 'xmobile', 'xstatus']
+    export_filename = 'delivery-challans'
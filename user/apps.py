@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        from CropTrack.authentication import _invalidate_on_change
+        from user.models import CustomUser
+
+        post_save.connect(_invalidate_on_change, sender=CustomUser, dispatch_uid='token_user_cache')
+        post_delete.connect(_invalidate_on_change, sender=CustomUser, dispatch_uid='token_user_cache')
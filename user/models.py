@@ -15,4 +15,11 @@ class CustomUser(AbstractUser):
     phone = models.CharField(max_length=20, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
     user_role = models.CharField(max_length=100, choices= user_role)
-    profile_pic = models.ImageField(upload_to='profile_pic', blank=True, null=True)
\ No newline at end of file
+    profile_pic = models.ImageField(upload_to='profile_pic', blank=True, null=True)
+    # Carried in access tokens; bump it to revoke every token issued before
+    token_version = models.PositiveIntegerField(default=0)
+
+    def bump_token_version(self):
+        """Invalidate all access tokens issued to this user so far"""
+        self.token_version += 1
+        self.save(update_fields=['token_version'])
\ No newline at end of file
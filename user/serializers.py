@@ -18,4 +18,5 @@ class LoginSerializer(TokenObtainPairSerializer):
         token['username'] = CustomUser.username
         token['user_role'] = CustomUser.user_role
         token['business_id'] = CustomUser.business_id
+        token['token_version'] = CustomUser.token_version
         return token
@@ -1,3 +1,71 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from CropTrack.authentication import invalidate_user
+from masterdata.models import CompanyProfile
+from user.models import CustomUser
+from user.serializers import LoginSerializer
+
+
+def user_lookups(queries):
+    """Queries that read the user table"""
+    table = connection.ops.quote_name(CustomUser._meta.db_table)
+    return [query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith('SELECT') and table in query['sql']]
+
+
+class SharedJWTAuthenticationTests(TestCase):
+    """Users behind versioned tokens are served from the process cache (CropTrack.authentication)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        business = CompanyProfile.objects.create(business_name='Test Cold Storage', address='Bogura')
+        cls.user = CustomUser.objects.create_user(username='clerk', password='pw',
+                                                  business_id=business.pk, user_role='Staff')
+
+    def setUp(self):
+        invalidate_user()
+
+    def get(self, token):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/masterdata/common-codes/list/', {'xtype': 'BANK'},
+                                       HTTP_AUTHORIZATION=f"Bearer {token}")
+        return response, user_lookups(queries.captured_queries)
+
+    def test_cached_user_costs_no_query(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        response, lookups = self.get(token)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(lookups), 1)
+
+        response, lookups = self.get(token)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(lookups, [])
+
+    def test_bumping_the_token_version_revokes_issued_tokens(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        self.assertEqual(self.get(token)[0].status_code, 200)
+
+        self.user.bump_token_version()
+        self.assertEqual(self.get(token)[0].status_code, 401)
+        self.assertEqual(self.get(LoginSerializer.get_token(self.user).access_token)[0].status_code, 200)
+
+    def test_revocation_in_another_process_applies_after_the_revalidation_window(self):
+        token = LoginSerializer.get_token(self.user).access_token
+        self.assertEqual(self.get(token)[0].status_code, 200)
+
+        # An update that skips post_save, like a save made by another worker, leaves this cache stale
+        CustomUser.objects.filter(pk=self.user.pk).update(token_version=1)
+        self.assertEqual(self.get(token)[0].status_code, 200)
+        with override_settings(JWT_USER_CACHE={'REVALIDATE': 0}):
+            self.assertEqual(self.get(token)[0].status_code, 401)
+
+    def test_token_without_version_loads_the_user_every_time(self):
+        token = AccessToken.for_user(self.user)
+        self.assertNotIn('token_version', token)
+        for _ in range(2):
+            response, lookups = self.get(token)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(len(lookups), 1)
@@ -0,0 +1,44 @@
+# utils/bulk_insert.py
+from django.db import connection
+
+
+def _copy_cursor(cursor):
+    """The psycopg 3 cursor behind a Django cursor when COPY is available, else None"""
+    if connection.vendor != 'postgresql':
+        return None
+    raw = getattr(cursor, 'cursor', None)
+    return raw if hasattr(raw, 'copy') else None
+
+
+def bulk_insert(model, objs, batch_size=2000):
+    """
+    Insert ``objs`` (unsaved ``model`` instances) with COPY ... FROM STDIN on
+    PostgreSQL with psycopg 3, and with bulk_create everywhere else.
+
+    Field defaults and auto_now/auto_now_add values are filled in as
+    bulk_create would (pre_save), and every value is converted with
+    get_db_prep_save. Like bulk_create, no signals are sent and no primary
+    keys are read back, so only use COPY for models whose primary key is
+    supplied. Database errors are raised as Django's exceptions (e.g.
+    IntegrityError) on both paths. Returns the number of rows inserted.
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+
+    with connection.cursor() as cursor:
+        raw = _copy_cursor(cursor)
+        if raw is None:
+            model.objects.bulk_create(objs, batch_size=batch_size)
+            return len(objs)
+
+        fields = [field for field in model._meta.concrete_fields if field.column]
+        quote = connection.ops.quote_name
+        sql = (f"COPY {quote(model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+               f"FROM STDIN")
+        # The raw cursor bypasses Django's error translation; without it a
+        # UniqueViolation would not be caught as django.db.IntegrityError
+        with connection.wrap_database_errors, raw.copy(sql) as copy:
+            for obj in objs:
+                copy.write_row([field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields])
+    return len(objs)
@@ -1,10 +1,29 @@
-from rest_framework import generics
+from rest_framework import generics, serializers
+from rest_framework.exceptions import NotFound
 
 from utils.response import APIResponse
+from utils.streaming import CONTENT_TYPES, streaming_response
+from utils.values_serializer import ValuesSerializer
 
 
 class CustomListAPIView(generics.ListAPIView):
-    """Base class with custom response format"""
+    """
+    Base class with custom response format.
+
+    Lists return every row unless the view sets ``pagination_class =
+    KeysetPagination`` (see utils.pagination); lookup lists such as common
+    codes are read whole by their clients and stay unpaginated.
+    ``keyset_ordering`` overrides the queryset's ordering for the paginator.
+
+    With ``values_serialization = True`` the rows are read with ``.values()``
+    and rendered by utils.values_serializer.ValuesSerializer instead of
+    instantiating models and the serializer per row; the serializer must
+    only expose model columns.
+    """
+    pagination_class = None
+    keyset_ordering = None
+    values_serialization = False
+
     def get_success_message(self):
         """Override this method to provide custom success message"""
         return "Data retrieved successfully"
@@ -23,30 +42,35 @@ class CustomListAPIView(generics.ListAPIView):
             # Apply business filter
             queryset = self.filter_by_business(queryset)
 
+            if self.values_serialization:
+                return self.values_list_response(queryset)
+
             # Handle pagination
             page = self.paginate_queryset(queryset)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
                 paginated_response = self.get_paginated_response(serializer.data)
 
-                return APIResponse.success(
+                pagination = {key: value for key, value in paginated_response.data.items() if key != 'results'}
+
+                return APIResponse.fast_success(
                     data=paginated_response.data.get('results'),
                     message=self.get_success_message(),
-                    meta={
-                        'pagination': {
-                            'count': paginated_response.data.get('count'),
-                            'next': paginated_response.data.get('next'),
-                            'previous': paginated_response.data.get('previous'),
-                        }
-                    }
+                    meta={'pagination': pagination}
                 )
 
-            # Non-paginated response
+            # Non-paginated response; the rows are already loaded, so no COUNT(*)
             serializer = self.get_serializer(queryset, many=True)
-            return APIResponse.success(
+            return APIResponse.fast_success(
                 data=serializer.data,
                 message=self.get_success_message(),
-                meta={'count': queryset.count()}
+                meta={'count': len(serializer.data)}
+            )
+
+        except NotFound as e:
+            return APIResponse.error(
+                message=str(e.detail),
+                status_code=400
             )
 
         except Exception as e:
@@ -54,3 +78,56 @@ class CustomListAPIView(generics.ListAPIView):
                 message="Failed to retrieve data",
                 status_code=500
             )
+
+    def values_list_response(self, queryset):
+        """list() for ``values_serialization``: same envelope, rows rendered from .values()"""
+        serializer = ValuesSerializer.for_serializer(self.get_serializer_class())
+        paginator = self.paginator
+        if paginator is None:
+            data = serializer.serialize(queryset)
+            return APIResponse.fast_success(
+                data=data,
+                message=self.get_success_message(),
+                meta={'count': len(data)}
+            )
+
+        ordering = paginator.get_ordering(queryset, self) if hasattr(paginator, 'get_ordering') else ()
+        page = self.paginate_queryset(serializer.values(queryset, *ordering))
+        paginated_response = self.get_paginated_response(serializer.serialize(page))
+        pagination = {key: value for key, value in paginated_response.data.items() if key != 'results'}
+        return APIResponse.fast_success(
+            data=paginated_response.data.get('results'),
+            message=self.get_success_message(),
+            meta={'pagination': pagination}
+        )
+
+
+class CustomExportMixin:
+    """
+    Streams a CustomListAPIView's filtered list as a file instead of a page.
+
+    Mix in ahead of a list view to export whatever its filters select:
+    ``?output=csv`` (default), ``xlsx`` or ``jsonl``, plus the view's usual
+    filter parameters. Rows are read with ``values_list().iterator()`` and
+    rendered by the view's serializer through ValuesSerializer, so they hold
+    the same values as the list endpoint and memory stays flat however many
+    rows match.
+    """
+    export_chunk_size = 2000
+    export_filename = 'export'
+
+    def list(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'csv')
+        if output not in CONTENT_TYPES:
+            return APIResponse.error(
+                message=f"output must be one of {', '.join(CONTENT_TYPES)}",
+                status_code=400
+            )
+
+        queryset = self.filter_by_business(self.filter_queryset(self.get_queryset()))
+        serializer = ValuesSerializer.for_serializer(self.get_serializer_class())
+        numeric = [name for name, _, field in serializer.fields if isinstance(field, serializers.DecimalField)]
+        return streaming_response(
+            output, serializer.names, serializer.iterate(queryset, chunk_size=self.export_chunk_size),
+            self.export_filename, numeric=numeric
+        )
@@ -0,0 +1,61 @@
+# utils/db_indexes.py
+"""
+Indexes on tables Django does not manage (managed = False).
+
+The legacy tables (certificate, imtrn, ...) are created outside Django, so
+their indexes cannot live in Meta.indexes. Each app lists them as
+UnmanagedIndex entries, and the migration that ships an index keeps its own
+copy of the definition (migrations must not change when models.py does) and
+applies it with ``create_indexes``/``drop_indexes``; the statements are plain
+``CREATE INDEX IF NOT EXISTS`` and are skipped when the table is absent.
+"""
+
+
+class UnmanagedIndex:
+    """
+    One index on an unmanaged table.
+
+    ``include`` columns become a covering INCLUDE list on PostgreSQL and are
+    left out elsewhere; ``condition`` is a raw SQL predicate for a partial index.
+    """
+
+    def __init__(self, name, table, columns, include=(), condition=None):
+        self.name = name
+        self.table = table
+        self.columns = tuple(columns)
+        self.include = tuple(include)
+        self.condition = condition
+
+    def create_sql(self, connection):
+        quote = connection.ops.quote_name
+        sql = "CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (
+            quote(self.name), quote(self.table), ", ".join(quote(column) for column in self.columns)
+        )
+        if self.include and connection.vendor == 'postgresql':
+            sql += " INCLUDE (%s)" % ", ".join(quote(column) for column in self.include)
+        if self.condition:
+            sql += " WHERE %s" % self.condition
+        return sql
+
+    def drop_sql(self, connection):
+        return "DROP INDEX IF EXISTS %s" % connection.ops.quote_name(self.name)
+
+
+def _existing_tables(connection):
+    with connection.cursor() as cursor:
+        return set(connection.introspection.table_names(cursor))
+
+
+def create_indexes(schema_editor, indexes):
+    tables = _existing_tables(schema_editor.connection)
+    for index in indexes:
+        if index.table in tables:
+            schema_editor.execute(index.create_sql(schema_editor.connection))
+
+
+def drop_indexes(schema_editor, indexes):
+    tables = _existing_tables(schema_editor.connection)
+    for index in indexes:
+        if index.table in tables:
+            schema_editor.execute(index.drop_sql(schema_editor.connection))
+
@@ -0,0 +1,167 @@
+# utils/pagination.py
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder that keeps microseconds, so datetime cursors compare exactly"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _config():
+    config = {'PAGE_SIZE': 100, 'MAX_PAGE_SIZE': 1000}
+    config.update(getattr(settings, 'KEYSET_PAGINATION', {}))
+    return config
+
+
+def estimate_count(queryset):
+    """
+    Planner row estimate for ``queryset`` on PostgreSQL; exact COUNT(*) elsewhere.
+
+    Returns (count, is_estimate).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), False
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows']), True
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset (cursor) pagination.
+
+    Rows are ordered by the view's ``keyset_ordering`` (or the queryset's own
+    ordering) completed with the model's primary key columns, so the order is
+    total and stable. The cursor holds the ordering values of the last row
+    served, and the next page is fetched with ``WHERE (ordering) > (cursor)``
+    instead of OFFSET, which keeps every page as cheap as the first.
+
+    No COUNT(*) runs unless the client asks for it with ``?count=approx``
+    (planner estimate on PostgreSQL) or ``?count=exact``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request, view=None):
+        config = _config()
+        page_size = getattr(view, 'page_size', None) or config['PAGE_SIZE']
+        max_page_size = getattr(view, 'max_page_size', None) or config['MAX_PAGE_SIZE']
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        return max(1, min(requested, max_page_size))
+
+    def get_ordering(self, queryset, view=None):
+        """Ordering fields (``-`` prefixed for descending) made unique with the primary key columns"""
+        ordering = list(getattr(view, 'keyset_ordering', None) or queryset.query.order_by)
+        opts = queryset.model._meta
+        names = {field.lstrip('-') for field in ordering}
+        descending = bool(ordering) and ordering[-1].startswith('-')
+        for field in opts.pk_fields:
+            if field.name not in names and field.attname not in names:
+                ordering.append(('-' if descending else '') + field.attname)
+        return ordering
+
+    @staticmethod
+    def _attname(model, name):
+        field = model._meta.get_field(name)
+        return field.attname
+
+    def _position(self, row, model, ordering):
+        names = [field.lstrip('-') for field in ordering]
+        if isinstance(row, dict):
+            return [row[name] if name in row else row[self._attname(model, name)] for name in names]
+        return [getattr(row, self._attname(model, name)) for name in names]
+
+    @staticmethod
+    def _after(ordering, position):
+        """Q for rows strictly after ``position`` in ``ordering``"""
+        condition = Q()
+        for index in range(len(ordering) - 1, -1, -1):
+            field = ordering[index]
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            if index < len(ordering) - 1:
+                step |= Q(**{name: position[index]}) & condition
+            condition = step
+        return condition
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, cls=CursorEncoder, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, size):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != size:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request, view)
+        ordering = self.get_ordering(queryset, view)
+        queryset = queryset.order_by(*ordering)
+
+        self.count, self.count_type = None, None
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == 'exact':
+            self.count, self.count_type = queryset.count(), 'exact'
+        elif count_mode == 'approx':
+            self.count, is_estimate = estimate_count(queryset)
+            self.count_type = 'approximate' if is_estimate else 'exact'
+
+        position = self.decode_cursor(request, len(ordering))
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_cursor = (self.encode_cursor(self._position(rows[-1], queryset.model, ordering))
+                            if self.has_next else None)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_type': self.count_type,
+            'next': self.get_next_link(),
+            'previous': None,
+            'page_size': self.page_size,
+            'results': data,
+        })
@@ -1,8 +1,52 @@
 # utils/response.py
+import json
+
+from django.http import HttpResponse
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
 from typing import Any, Optional, Dict
 
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+# Types orjson does not handle natively (Decimal, lazy strings, querysets, ...) are
+# converted exactly like DRF's JSONRenderer does
+_default = JSONEncoder().default
+
+
+def dumps(value) -> bytes:
+    """
+    ``value`` as compact UTF-8 JSON, matching DRF's JSONRenderer output:
+    Decimal as a number, datetimes in ISO 8601 with UTC as ``Z``, U+2028/U+2029 escaped.
+    """
+    if orjson is not None:
+        try:
+            content = orjson.dumps(value, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the stdlib encoder below copes
+        else:
+            if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+                content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+            return content
+    text = json.dumps(value, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
+
+
+class EnvelopeResponse(HttpResponse):
+    """
+    The APIResponse envelope serialized straight to JSON bytes.
+
+    Skips DRF content negotiation and rendering. ``data`` keeps the envelope
+    dict so callers and test clients can inspect it like a DRF Response.
+    """
+
+    def __init__(self, envelope: Dict, status_code: int):
+        super().__init__(dumps(envelope), content_type='application/json', status=status_code)
+        self.data = envelope
+
 
 class APIResponse:
     """Standardized API Response utility"""
@@ -21,6 +65,20 @@ class APIResponse:
             response_data["meta"] = meta
         return Response(response_data, status=status_code)
 
+    @staticmethod
+    def fast_success(data: Any = None, message: str = "Success", status_code: int = status.HTTP_200_OK,
+                     meta: Optional[Dict] = None):
+        """Same envelope as success(), encoded directly (orjson when installed); for large lists"""
+        response_data = {
+            "success": True,
+            "status_code": status_code,
+            "message": message,
+            "data": data,
+        }
+        if meta:
+            response_data["meta"] = meta
+        return EnvelopeResponse(response_data, status_code)
+
     @staticmethod
     def error(message: str = "Error occurred", status_code: int = status.HTTP_400_BAD_REQUEST,
               errors: Optional[Dict] = None, data: Any = None):
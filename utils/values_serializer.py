@@ -0,0 +1,163 @@
+# utils/values_serializer.py
+import datetime
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation returns database values of these types unchanged
+_PASSTHROUGH = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+_PASSTHROUGH_EXCLUDED = (serializers.ChoiceField, serializers.DecimalField)
+
+_compiled = {}
+
+
+def _datetime_converter(field):
+    """DateTimeField.to_representation with the ISO format and field timezone resolved once"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if type(value) is not datetime.datetime or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        return value.isoformat() if type(value) is datetime.date else field.to_representation(value)
+    return convert
+
+
+def _decimal_converter(field):
+    """DecimalField.to_representation for the default string output, with the quantize context built once"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if type(value) is not decimal.Decimal:
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _converter(field):
+    """Callable rendering a non-None column value as ``field`` would; None when the value passes through"""
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # values() yields the raw key, which is what the field renders from obj.pk
+        return field.pk_field.to_representation if field.pk_field is not None else None
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return _date_converter(field)
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, _PASSTHROUGH) and not isinstance(field, _PASSTHROUGH_EXCLUDED):
+        return None
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Read-only rendering of a ModelSerializer's output from ``.values()`` /
+    ``.values_list()`` rows.
+
+    The serializer's readable fields are compiled once per class into
+    (output name, column, field) triples. Text, integer, boolean and foreign
+    key values pass straight through, dates, datetimes and decimals use
+    converters equivalent to the DRF fields' ISO/string output (the active
+    timezone and decimal context are picked up per call) and any other field
+    keeps its own ``to_representation``, so the JSON is identical to
+    ``ModelSerializer(many=True).data`` without building model instances or
+    bound field copies per row.
+
+    Only fields backed by a concrete column of the model are supported;
+    dotted sources and SerializerMethodFields raise ImproperlyConfigured.
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.serializer_class = serializer_class
+        self.fields = []
+        for field in serializer._readable_fields:
+            source = field.source
+            try:
+                model_field = model._meta.get_field(source) if source != '*' and '.' not in source else None
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or not model_field.concrete:
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{field.field_name} is not a model column; "
+                    f"it cannot be rendered from values()"
+                )
+            self.fields.append((field.field_name, model_field.name, field))
+        self.names = [name for name, _, _ in self.fields]
+        self.columns = [column for _, column, _ in self.fields]
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        """The compiled ValuesSerializer for ``serializer_class`` (compiled on first use)"""
+        compiled = _compiled.get(serializer_class)
+        if compiled is None:
+            compiled = _compiled[serializer_class] = cls(serializer_class)
+        return compiled
+
+    def values(self, queryset, *extra):
+        """``queryset.values()`` with the serializer's columns plus ``extra`` (e.g. keyset ordering)"""
+        columns = list(self.columns)
+        for name in extra:
+            name = name.lstrip('-')
+            if name not in columns:
+                columns.append(name)
+        return queryset.values(*columns)
+
+    def converters(self):
+        """(position, converter) for the fields that do not pass through"""
+        converters = []
+        for index, (_, _, field) in enumerate(self.fields):
+            converter = _converter(field)
+            if converter is not None:
+                converters.append((index, converter))
+        return converters
+
+    def serialize(self, rows):
+        """
+        Render ``rows``: ``values()`` dicts, or a queryset which is then read
+        with ``values_list()`` tuples.
+        """
+        if hasattr(rows, 'values_list'):
+            rows = rows.values_list(*self.columns)
+        else:
+            columns = self.columns
+            rows = ([row[column] for column in columns] for row in rows)
+        return list(self._render(rows))
+
+    def iterate(self, queryset, chunk_size=2000):
+        """Lazily render ``queryset``, read with ``values_list().iterator(chunk_size)``"""
+        return self._render(queryset.values_list(*self.columns).iterator(chunk_size=chunk_size))
+
+    def _render(self, rows):
+        names, converters = self.names, self.converters()
+        for row in rows:
+            row = list(row)
+            for index, converter in converters:
+                value = row[index]
+                if value is not None:
+                    row[index] = converter(value)
+            yield dict(zip(names, row))